@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# Adaptive item weighting from past class results: per-category error rates fitted from a results CSV, turned into
+# alias tables (musicxml_utils.build_alias_table) so generators oversample weak areas with O(1) draws.
+# Tables are cached per class in __pycache__ next to the CSV, keyed by the CSV's hash.
+#
+# Results CSV, one row per answer (correct = 1/0) or per item with an `attempts` column (correct = count):
+#   class,section,item,correct
+#   7a,intervals,M6 down,0
+#   7a,chords,dim second,1
+# Items are space-separated tokens: interval name and direction, chord quality and inversion; a row may also
+# name a single token ("TT", "second").
+import argparse
+import csv
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from musicxml_utils import build_alias_table
+
+PRIOR = 5.0  # pseudo-answers pulling sparse categories toward the next coarser rate
+TRUE = ("1", "true", "yes", "y", "richtig")
+
+def add_adaptive_args(ap):
+    ap.add_argument("--results", default=None, help="Past results CSV (class,section,item,correct[,attempts]); oversample weak items")
+    ap.add_argument("--class-name", default=None, help="Only use this class's rows of --results (default: all rows)")
+    ap.add_argument("--adaptive-mix", type=float, default=0.7, help="0 = uniform .. 1 = proportional to error rate")
+
+def read_counts(path, class_name=None):
+    """{section: {item tokens: [errors, attempts]}} from a results CSV."""
+    counts = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            if class_name and row.get("class") != class_name:
+                continue
+            tokens = tuple(row.get("item", "").split())
+            if not tokens or not row.get("section"):
+                continue
+            if row.get("attempts"):
+                attempts = float(row["attempts"]); errors = attempts - float(row.get("correct") or 0)
+            else:
+                attempts = 1.0; errors = 0.0 if row.get("correct", "").lower() in TRUE else 1.0
+            c = counts.setdefault(row["section"].lower(), {}).setdefault(tokens, [0.0, 0.0])
+            c[0] += errors; c[1] += attempts
+    return counts
+
+def error_rates(counts, candidates):
+    """Smoothed error rate per candidate (tuple of tokens): section mean -> each token's rate -> the full item."""
+    total_e = sum(e for e, _ in counts.values()); total_n = sum(n for _, n in counts.values())
+    mean = total_e / total_n if total_n else 0.5
+    token = {}
+    for tokens, (e, n) in counts.items():
+        for t in tokens:
+            c = token.setdefault(t, [0.0, 0.0]); c[0] += e; c[1] += n
+    smooth = lambda e, n, prior: (e + PRIOR * prior) / (n + PRIOR)
+    rates = []
+    for cand in candidates:
+        prior = sum(smooth(*token.get(t, (0.0, 0.0)), mean) for t in cand) / len(cand)
+        rates.append(smooth(*counts.get(tuple(cand), (0.0, 0.0)), prior))
+    return rates
+
+def sampling_weights(rates, mix):
+    """(1-mix) uniform + mix proportional to the error rate; never zero while mix < 1."""
+    mix = max(0.0, min(1.0, mix)); total = sum(rates)
+    if total <= 0:
+        return [1.0 / len(rates)] * len(rates)
+    return [(1 - mix) / len(rates) + mix * r / total for r in rates]
+
+class AdaptiveTables:
+    """Alias tables for one results file and class; each distinct candidate set is fitted once and cached on disk."""
+    def __init__(self, path, class_name=None, mix=0.7):
+        self.path, self.class_name, self.mix = Path(path), class_name, mix
+        digest = hashlib.sha256(self.path.read_bytes()).hexdigest()
+        self.cache = self.path.parent / "__pycache__" / f"{self.path.name}.{class_name or 'all'}.{digest[:16]}.json"
+        try:
+            with self.cache.open("r", encoding="utf-8") as f:
+                self.tables = json.load(f)
+        except (OSError, ValueError):
+            self.tables = {}
+        self._counts = None
+
+    def table(self, section, candidates):
+        """Alias table over candidates (tuples of tokens, e.g. ("M6", "down")), in the given order."""
+        key = f"{section}|{self.mix}|" + ",".join(" ".join(c) for c in candidates)
+        if key not in self.tables:
+            if self._counts is None:
+                self._counts = read_counts(self.path, self.class_name)
+            rates = error_rates(self._counts.get(section, {}), candidates)
+            self.tables[key] = build_alias_table(sampling_weights(rates, self.mix))
+            self._save()
+        prob, alias = self.tables[key]
+        return prob, alias
+
+    def _save(self):
+        try:
+            self.cache.parent.mkdir(exist_ok=True)
+            tmp = self.cache.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self.tables), encoding="utf-8")
+            os.replace(tmp, self.cache)
+        except OSError:
+            pass  # read-only: fit again next run
+
+def tables_from_args(args):
+    return AdaptiveTables(args.results, args.class_name, args.adaptive_mix) if args.results else None
+
+def main():
+    ap = argparse.ArgumentParser(description="Show fitted error rates and sampling weights from a results CSV.")
+    ap.add_argument("results")
+    ap.add_argument("--class-name", default=None)
+    ap.add_argument("--adaptive-mix", type=float, default=0.7)
+    args = ap.parse_args()
+    for section, counts in sorted(read_counts(args.results, args.class_name).items()):
+        items = sorted(counts)
+        rates = error_rates(counts, items)
+        weights = sampling_weights(rates, args.adaptive_mix)
+        print(f"== {section} ({args.class_name or 'all classes'})")
+        for item, r, w in sorted(zip(items, rates, weights), key=lambda x: -x[1]):
+            e, n = counts[item]
+            print(f"   {' '.join(item):<16} {e:g}/{n:g} wrong  rate {r:.2f}  weight {w:.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# Pregenerate Übungsblatt/Arbeitsblatt variants per profile and seed for index.html.
+# Each section gets one base text (the first variant) and every variant is stored as line edits against it,
+# so the page only fetches the chunk holding the requested seed and reproduces the CLI output byte for byte.
+import argparse
+import copy
+import difflib
+import hashlib
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from uebungsblatt_cli import load_cfg, variant_cfg, section_jobs, section_files, SECTIONS
+
+HERE = Path(__file__).resolve().parent
+FORMAT = 1
+
+def family_of(job):
+    """Hash of a section's generator/Arbeitsblatt options without paths and seed: profiles sharing it share variants."""
+    drop = {"--output", "--seed", "--input"}
+    argv = [a for i, a in enumerate(job["args"]) if a not in drop and (i == 0 or job["args"][i - 1] not in drop)]
+    argv += [a for a in job["arbeitsblatt_args"][:4]]  # --mode/--action
+    return hashlib.sha1(json.dumps([job["section"], argv]).encode("utf-8")).hexdigest()[:12]
+
+def render_variant(cfg, profile, seed, sections=SECTIONS):
+    """{section: (family, sheet, arbeitsblatt)} for one (profile, seed), generated in-process."""
+    cfg = variant_cfg(cfg, profile, seed)
+    families = {job["section"]: family_of(job) for job in section_jobs(cfg, profile or None, Path("."), sections)}
+    files = {}
+    for _, data, meta in section_files(cfg, profile or None, sections=sections):
+        files.setdefault(meta["section"], {})[meta["kind"]] = data.decode("utf-8")
+    return {section: (families[section], f["uebungsblatt"], f["arbeitsblatt"]) for section, f in files.items()}
+
+_BASES = {}
+
+def _init_worker(bases):
+    _BASES.update(bases)
+
+def patch_variant(task):
+    """Worker: render one (profile, seed) and diff it against the section bases; returns (seed, {section: (family, patches)})."""
+    cfg, profile, seed, sections = task
+    out = {}
+    for section, (family, *texts) in render_variant(cfg, profile, seed, sections).items():
+        patches = [line_patch(b, t) for b, t in zip(_BASES[section], texts)]
+        for b, p, t in zip(_BASES[section], patches, texts):
+            if apply_patch(b, p) != t:
+                raise RuntimeError(f"patch does not reproduce {section} profile={profile!r} seed={seed}")
+        out[section] = (family, patches)
+    return seed, out
+
+def line_patch(base_lines, text):
+    """[[i1, i2, [lines]], ...] replacing base_lines[i1:i2]; apply_patch() inverts it."""
+    new = text.split("\n")
+    sm = difflib.SequenceMatcher(None, base_lines, new, autojunk=False)
+    return [[i1, i2, new[j1:j2]] for op, i1, i2, j1, j2 in sm.get_opcodes() if op != "equal"]
+
+def apply_patch(base_lines, patch):
+    out, pos = [], 0
+    for i1, i2, lines in patch:
+        out += base_lines[pos:i1]; out += lines; pos = i2
+    return "\n".join(out + base_lines[pos:])
+
+def template_sha1(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+def _pack(variants):
+    """Replace patch lines by indices into one per-chunk line table (generated lines repeat a lot)."""
+    table, ids = [], {}
+    def ref(line):
+        if line not in ids:
+            ids[line] = len(table); table.append(line)
+        return ids[line]
+    packed = {seed: [[[i1, i2, [ref(l) for l in lines]] for i1, i2, lines in patch] for patch in patches]
+              for seed, patches in variants.items()}
+    return {"lines": table, "variants": packed}
+
+def is_bank(path):
+    """True if path holds a bank written by build() (its index.json has our keys)."""
+    try:
+        index = json.loads((Path(path) / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    return isinstance(index, dict) and {"format", "seeds", "chunk_size", "sections"} <= index.keys()
+
+def build(cfg, profiles, seeds, outdir, chunk_size, workers=None):
+    outdir = Path(outdir)
+    if outdir.exists():
+        # only ever replace a previous bank; --outdir OUT or . must not wipe real data
+        if is_bank(outdir):
+            shutil.rmtree(outdir)
+        elif any(outdir.iterdir()):
+            raise ValueError(f"{outdir} is not empty and holds no web bank (index.json); refusing to overwrite it")
+    families, tasks = {}, []
+    for profile in profiles:
+        jobs = section_jobs(variant_cfg(cfg, profile, seeds[0]), profile or None, outdir)
+        fresh = []
+        for job in jobs:
+            family = family_of(job)
+            if family not in families.get(job["section"], {}).values():
+                fresh.append(job["section"])  # profiles with identical section options share its variants
+            families.setdefault(job["section"], {})[profile] = family
+        if fresh:
+            tasks += [(cfg, profile, s, tuple(fresh)) for s in seeds]
+    # every variant is stored as line edits against the first profile's first seed
+    bases = {section: [t.split("\n") for t in texts]
+             for section, (_, *texts) in render_variant(cfg, profiles[0], seeds[0]).items()}
+    chunks = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bases,)) as pool:
+        for seed, sections in pool.map(patch_variant, tasks, chunksize=4):
+            for section, (family, patches) in sections.items():
+                chunks.setdefault((section, family, (seed - seeds[0]) // chunk_size), {})[str(seed)] = patches
+
+    index = {"format": FORMAT, "seeds": [seeds[0], seeds[-1]], "chunk_size": chunk_size,
+             "profiles": profiles, "sections": {}}
+    inputs = cfg.get("inputs", {}) or {}
+    for section, (sheet, ab) in bases.items():
+        d = outdir / section; d.mkdir(parents=True, exist_ok=True)
+        (d / "base.musicxml").write_bytes("\n".join(sheet).encode("utf-8"))
+        (d / "base_arbeitsblatt.musicxml").write_bytes("\n".join(ab).encode("utf-8"))
+        index["sections"][section] = {"template_sha1": template_sha1(inputs[section]), "families": families[section]}
+    size = 0
+    for (section, family, ci), variants in chunks.items():
+        path = outdir / section / family / f"chunk_{ci:04d}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(_pack(variants), separators=(",", ":"), ensure_ascii=False), encoding="utf-8")
+        size += path.stat().st_size
+    (outdir / "index.json").write_text(json.dumps(index, indent=1, ensure_ascii=False), encoding="utf-8")
+    return len(profiles) * len(seeds), len(chunks), size
+
+def main():
+    ap = argparse.ArgumentParser(description="Pregenerate a chunked variant bank for the browser app (index.html).")
+    ap.add_argument("--config", default=str(HERE / "uebungsblatt.yaml"))
+    ap.add_argument("--profiles", default=None, help="Comma list; '' is the plain config (default: plain + all YAML profiles)")
+    ap.add_argument("--seeds", default="1-100", help="Inclusive seed range, e.g. 1-100")
+    ap.add_argument("--chunk-size", type=int, default=25, help="Seeds per chunk file (the page fetches one chunk per request)")
+    ap.add_argument("--outdir", default=str(HERE / "web_bank"))
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+
+    cfg = load_cfg(Path(args.config))
+    if args.profiles is None:
+        profiles = [""] + list((cfg.get("profiles") or {}).keys())
+    else:
+        profiles = [p.strip() for p in args.profiles.split(",")]
+    lo, _, hi = args.seeds.partition("-")
+    seeds = list(range(int(lo), int(hi or lo) + 1))
+    if not seeds:
+        ap.error("empty --seeds range")
+    try:
+        n, n_chunks, size = build(copy.deepcopy(cfg), profiles, seeds, args.outdir, args.chunk_size, args.workers)
+    except ValueError as e:
+        ap.error(str(e))
+    print(f"Web bank {args.outdir}: {n} variant(s) of {len(SECTIONS)} section(s) in {n_chunks} chunk(s), {size / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    main()
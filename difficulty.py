@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Difficulty model for worksheet items. Scores share one open scale (about 1 = trivial, 8+ = hard);
+# generators score every candidate up front and pick with pick_by_difficulty() instead of rerolling.
+import argparse
+import xml.etree.ElementTree as ET
+
+INTERVAL_SIZE = {"m2":1.0,"M2":1.0,"m3":1.5,"M3":1.5,"P4":2.0,"TT":3.5,"P5":2.0,
+                 "m6":3.0,"M6":3.0,"m7":3.5,"M7":4.0,"P8":1.5}
+CHORD_QUALITY = {"maj":1.0,"min":1.5,"dim":2.5,"aug":3.0,"dom7":3.0,"maj7":3.5,"min7":3.5,"hdim7":4.5,"dim7":4.5}
+CHORD_INVERSION = {"root":0.0,"first":1.0,"second":1.5,"third":2.0}
+
+def accidental_cost(alter):
+    """Sharps cost 0.75, flats 1.0, doubles twice that."""
+    if not alter:
+        return 0.0
+    return (0.75 if alter > 0 else 1.0) * abs(alter)
+
+def interval_difficulty(name, direction, base_alter=0, target_alter=0):
+    size = INTERVAL_SIZE.get(name, 5.0)  # unnamed (augmented/diminished) spellings are hardest
+    return size + (1.0 if direction == "down" else 0.0) + accidental_cost(target_alter) + 0.5 * accidental_cost(base_alter)
+
+def chord_difficulty(quality, inversion, alters=()):
+    return CHORD_QUALITY.get(quality, 5.0) + CHORD_INVERSION.get(inversion, 2.0) + 0.5 * sum(accidental_cost(a) for a in alters)
+
+def rhythm_group_difficulty(base, tokens):
+    """Hand-rated pattern difficulty plus rhythmic density (onsets per beat beyond two)."""
+    beats = float(sum(t[0] for t in tokens)) or 1.0
+    onsets = sum(1 for t in tokens if not t[1])
+    return base + max(0.0, onsets / beats - 2.0) * 0.5
+
+def scale_note_difficulty(alter):
+    return accidental_cost(alter)
+
+def pick_by_difficulty(candidates, scores, rng, mean, spread=0.0):
+    """Index of the candidate closest to a desired score drawn from N(mean, spread); ties broken at random."""
+    if not candidates:
+        return None
+    desired = rng.gauss(mean, spread) if spread > 0 else mean
+    best = min(abs(s - desired) for s in scores)
+    ties = [i for i, s in enumerate(scores) if abs(s - desired) - best < 1e-9]
+    return ties[int(rng.random() * len(ties))]
+
+def score_file(path):
+    """Per-item scores for a generated Übungsblatt, keyed by section (from the file name)."""
+    from musicxml_utils import note_pitch
+    from generate_intervals import collect_events, pair_whole_with_quarter, classify_interval
+    from generate_chords import chord_groups, classify_chord
+    root = ET.parse(path).getroot()
+    name = path.lower(); out = []
+    for part in root.findall("part"):
+        for meas in part.findall("measure"):
+            if "interval" in name:
+                for b, t in pair_whole_with_quarter(collect_events(meas)):
+                    ivl, direc = classify_interval(b["pitch"], t["pitch"])
+                    out.append(interval_difficulty(ivl, direc, b["pitch"][2], t["pitch"][2]))
+            elif "chord" in name:
+                for g in chord_groups(meas):
+                    pitches = [note_pitch(n) for n in g]
+                    c = classify_chord(pitches) if len(g) > 2 else None
+                    if c:
+                        out.append(chord_difficulty(c[2], c[3], [p[1] for p in pitches]))
+            elif "scale" in name:
+                hidden = [n for n in meas.findall("note[pitch]") if n.get("print-object") == "no"]
+                out.append(sum(scale_note_difficulty(note_pitch(n)[1]) for n in hidden))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Report item difficulty for generated Übungsblatt files.")
+    ap.add_argument("paths", nargs="+")
+    args = ap.parse_args()
+    for p in args.paths:
+        scores = score_file(p)
+        if not scores:
+            print(f"{p}: no scorable items"); continue
+        mean = sum(scores) / len(scores)
+        sd = (sum((s - mean) ** 2 for s in scores) / len(scores)) ** 0.5
+        print(f"{p}: {len(scores)} items, total {sum(scores):.1f}, mean {mean:.2f}, spread {sd:.2f}")
+
+if __name__ == "__main__":
+    main()
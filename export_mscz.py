@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# MusicXML -> MuseScore (.mscz) for the subset the worksheet templates use: one or more parts with 1-2 staves,
+# voices via <backup>, chords, rests, dots, tuplets, ties, key/time/clef, line/page breaks, end barlines,
+# staff text and the title credit. Visibility decisions (print-object="no" on notes, rests, accidentals, time
+# signatures; <forward> gaps from rhythm Arbeitsblätter) become MuseScore's own <visible>0</visible>, and the
+# score is saved with "show invisible" off, so nothing needs fixing by hand before printing.
+import argparse
+import io
+import os
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from pathlib import Path
+
+from musicxml_utils import pitch_to_midi, read_tree, is_hidden, to_int
+
+DIVISION = 480  # MuseScore ticks per quarter
+MSCX_VERSION = "3.02"  # read by MuseScore 3.x and 4.x
+TYPE_TICKS = {"breve": 3840, "whole": 1920, "half": 960, "quarter": 480, "eighth": 240,
+              "16th": 120, "32nd": 60, "64th": 30}
+STEP_FIFTHS = {"F": -1, "C": 0, "G": 1, "D": 2, "A": 3, "E": 4, "B": 5}
+ACCIDENTALS = {"sharp": "accidentalSharp", "flat": "accidentalFlat", "natural": "accidentalNatural",
+               "double-sharp": "accidentalDoubleSharp", "sharp-sharp": "accidentalDoubleSharp",
+               "flat-flat": "accidentalDoubleFlat"}
+ALTER_ACCIDENTAL = {-2: "accidentalDoubleFlat", -1: "accidentalFlat", 1: "accidentalSharp", 2: "accidentalDoubleSharp"}
+CONTAINER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<container><rootfiles><rootfile full-path="{name}"/></rootfiles></container>\n')
+
+def _sub(parent, tag, text=None, **attrib):
+    el = ET.SubElement(parent, tag, {k: str(v) for k, v in attrib.items()})
+    if text is not None:
+        el.text = str(text)
+    return el
+
+def tpc(step, alter):
+    """MuseScore tonal pitch class: position on the line of fifths, C = 14."""
+    return 14 + STEP_FIFTHS[step] + 7 * alter
+
+def clef_type(clef):
+    sign = (clef.findtext("sign") or "G").strip()
+    line = to_int(clef.findtext("line"), 2 if sign == "G" else 4 if sign == "F" else 3)
+    octave = to_int(clef.findtext("clef-octave-change"), 0)
+    if sign == "percussion":
+        return "PERC"
+    if sign == "C":
+        return f"C{line}"
+    if sign == "F":
+        return {3: "F_B", 5: "F_C"}.get(line, "F") + ("8vb" if octave == -1 else "")
+    return {1: "G_1"}.get(line, "G") + ("8vb" if octave == -1 else "8va" if octave == 1 else "")
+
+def split_ticks(ticks):
+    """(durationType, dots) values that add up to ticks, longest first (for gaps and <forward>).
+    Ticks are snapped to the 64th grid; MusicXML divisions that cannot express triplets exactly round there."""
+    ticks = round(ticks / TYPE_TICKS["64th"]) * TYPE_TICKS["64th"]
+    out = []
+    for name, t in sorted(TYPE_TICKS.items(), key=lambda kv: -kv[1]):
+        while ticks >= t:
+            if ticks >= t + t // 2 and t // 2 >= TYPE_TICKS["64th"]:
+                out.append((name, 1)); ticks -= t + t // 2
+            else:
+                out.append((name, 0)); ticks -= t
+    return out
+
+class PartEvents:
+    """Events of one MusicXML part, per measure, staff and MuseScore voice (track)."""
+    def __init__(self, part):
+        self.measures = []
+        self.staves = 1
+        self.clefs = {}
+        tracks = {}
+        divisions = 1; beats, beat_type = 4, 4
+        for mi, meas in enumerate(part.findall("measure")):
+            m = {"events": {}, "attributes": [], "texts": [], "break": None, "end_bar": False}
+            at_list = meas.findall("attributes")
+            for at in at_list:
+                divisions = to_int(at.findtext("divisions"), divisions)
+                self.staves = max(self.staves, to_int(at.findtext("staves"), 1))
+                if at.find("time") is not None:
+                    beats = to_int(at.findtext("time/beats"), beats); beat_type = to_int(at.findtext("time/beat-type"), beat_type)
+                m["attributes"].append(at)
+                for clef in at.findall("clef"):
+                    self.clefs.setdefault(to_int(clef.get("number"), 1), clef_type(clef))
+            m["len"] = beats * 4 * DIVISION // beat_type
+            pr = meas.find("print")
+            if pr is not None and mi > 0:
+                if pr.get("new-page") == "yes":
+                    self.measures[-1]["break"] = "page"
+                elif pr.get("new-system") == "yes":
+                    self.measures[-1]["break"] = "line"
+            cursor = 0; last = None
+            for el in meas:
+                if el.tag == "note":
+                    if el.find("grace") is not None:
+                        continue
+                    ticks = Fraction(to_int(el.findtext("duration")) * DIVISION, divisions)
+                    if el.find("chord") is not None and last is not None:
+                        last["notes"].append(el); continue
+                    staff = to_int(el.findtext("staff"), 1)
+                    key = (staff, (el.findtext("voice") or "1").strip())
+                    track = tracks.setdefault(key, min(3, sum(1 for s, _ in tracks if s == staff)))
+                    last = {"onset": cursor, "ticks": ticks, "notes": [el], "rest": el.find("rest") is not None}
+                    m["events"].setdefault((staff, track), []).append(last)
+                    cursor += ticks
+                elif el.tag == "forward":
+                    ticks = Fraction(to_int(el.findtext("duration")) * DIVISION, divisions)
+                    staff = to_int(el.findtext("staff"), 1)
+                    key = (staff, (el.findtext("voice") or "1").strip())
+                    track = tracks.setdefault(key, min(3, sum(1 for s, _ in tracks if s == staff)))
+                    evs = m["events"].setdefault((staff, track), [])
+                    if evs and evs[-1].get("forward") and evs[-1]["onset"] + evs[-1]["ticks"] == cursor:
+                        evs[-1]["ticks"] += ticks  # one gap for consecutive forwards
+                    else:
+                        evs.append({"onset": cursor, "ticks": ticks, "forward": True})
+                    cursor += ticks; last = None
+                elif el.tag == "backup":
+                    cursor = max(0, cursor - Fraction(to_int(el.findtext("duration")) * DIVISION, divisions)); last = None
+                elif el.tag == "direction":
+                    for w in el.findall("direction-type/words"):
+                        if (w.text or "").strip():
+                            m["texts"].append((to_int(el.findtext("staff"), 1), cursor, w.text.strip()))
+                elif el.tag == "barline":
+                    if (el.findtext("bar-style") or "").strip() in ("light-heavy", "heavy"):
+                        m["end_bar"] = True
+            self.measures.append(m)
+
+def _chord(voice, ev, ties, mi):
+    """<Chord>/<Rest> for one event; ties maps (staff, track, midi) -> open tie <Spanner> of the start note."""
+    first = ev["notes"][0]
+    ntype = (first.findtext("type") or "").strip()
+    dots = len(first.findall("dot"))
+    if ev["rest"]:
+        rest = _sub(voice, "Rest")
+        if is_hidden(first):
+            _sub(rest, "visible", 0)
+        r = first.find("rest")
+        if r is not None and r.get("measure") == "yes" or not ntype:
+            _sub(rest, "durationType", "measure"); _sub(rest, "duration", f"{Fraction(ev['ticks'], 4 * DIVISION)}")
+        else:
+            if dots:
+                _sub(rest, "dots", dots)
+            _sub(rest, "durationType", ntype)
+        return
+    chord = _sub(voice, "Chord")
+    if dots:
+        _sub(chord, "dots", dots)
+    _sub(chord, "durationType", ntype or split_ticks(ev["ticks"])[0][0])
+    stem = (first.findtext("stem") or "").strip()
+    if stem in ("up", "down"):
+        _sub(chord, "StemDirection", stem)
+    if all(is_hidden(n) for n in ev["notes"]):
+        _sub(_sub(chord, "Stem"), "visible", 0)
+    for n in ev["notes"]:
+        step = (n.findtext("pitch/step") or "C").strip()
+        alter = to_int(n.findtext("pitch/alter"), 0)
+        octave = to_int(n.findtext("pitch/octave"), 4)
+        midi = pitch_to_midi(step, alter, octave)
+        note = _sub(chord, "Note")
+        if is_hidden(n):
+            _sub(note, "visible", 0)
+        acc = n.find("accidental")
+        subtype = ACCIDENTALS.get((acc.text or "").strip()) if acc is not None else None
+        if subtype is None and is_hidden(n) and alter:
+            subtype = ALTER_ACCIDENTAL.get(alter)  # keep the hidden note's accidental hidden as well
+        if subtype:
+            a = _sub(note, "Accidental")
+            _sub(a, "subtype", subtype)
+            if is_hidden(acc) or is_hidden(n):
+                _sub(a, "visible", 0)
+        key = ev["track_key"] + (midi,)
+        tie_types = {t.get("type") for t in n.findall("tie")} | {t.get("type") for t in n.findall("notations/tied")}
+        if "stop" in tie_types and key in ties:
+            start_sp, start_mi, start_onset = ties.pop(key)
+            dm, df = mi - start_mi, Fraction(ev["onset"] - start_onset, 4 * DIVISION)
+            for sp, sign, tag in ((start_sp, 1, "next"), (_sub(note, "Spanner", type="Tie"), -1, "prev")):
+                loc = _sub(_sub(sp, tag), "location")
+                if dm:
+                    _sub(loc, "measures", sign * dm)
+                if df:
+                    _sub(loc, "fractions", str(sign * df))
+        if "start" in tie_types:
+            sp = _sub(note, "Spanner", type="Tie"); _sub(sp, "Tie")
+            ties[key] = (sp, mi, ev["onset"])
+        _sub(note, "pitch", midi)
+        _sub(note, "tpc", tpc(step, alter))
+
+def _filler(voice, ticks, visible=False):
+    for name, dots in split_ticks(ticks):
+        rest = _sub(voice, "Rest")
+        if not visible:
+            _sub(rest, "visible", 0)
+        if dots:
+            _sub(rest, "dots", dots)
+        _sub(rest, "durationType", name)
+
+def musicxml_to_mscx(root):
+    """<museScore> element for a parsed MusicXML score-partwise root."""
+    ms = ET.Element("museScore", version=MSCX_VERSION)
+    _sub(ms, "programVersion", "3.6.2")
+    score = _sub(ms, "Score")
+    _sub(score, "Division", DIVISION)
+    mm, tenths = root.findtext("defaults/scaling/millimeters"), root.findtext("defaults/scaling/tenths")
+    if mm and tenths:
+        _sub(_sub(score, "Style"), "Spatium", f"{float(mm) * 10 / float(tenths):.4f}")
+    _sub(score, "showInvisible", 0)  # the "keep invisible objects hidden" step
+    _sub(score, "showUnprintable", 1); _sub(score, "showFrames", 1); _sub(score, "showMargins", 0)
+    title = (root.findtext("credit/credit-words") or root.findtext("work/work-title") or "").strip()
+    _sub(score, "metaTag", (root.findtext("work/work-title") or "").strip(), name="workTitle")
+
+    names = {sp.get("id"): (sp.findtext("part-name") or "").strip() for sp in root.findall("part-list/score-part")}
+    parts = [(PartEvents(p), names.get(p.get("id"), "")) for p in root.findall("part")]
+    staff_id = 0
+    for part, name in parts:
+        pe = _sub(score, "Part")
+        for s in range(1, part.staves + 1):
+            st = _sub(pe, "Staff", id=staff_id + s)
+            _sub(_sub(st, "StaffType", group="pitched"), "name", "stdNormal")
+            if s == 1 and part.staves > 1:
+                _sub(st, "bracket", type=1, span=part.staves, col=0)
+        _sub(pe, "trackName", name)
+        inst = _sub(pe, "Instrument")
+        _sub(inst, "longName", name); _sub(inst, "trackName", name)
+        for s in range(1, part.staves + 1):
+            _sub(inst, "clef", part.clefs.get(s, "G"), staff=s)
+        _sub(_sub(inst, "Channel"), "program", value=0)
+        staff_id += part.staves
+
+    staff_id = 0
+    for part, _ in parts:
+        ties = {}
+        for s in range(1, part.staves + 1):
+            st = _sub(score, "Staff", id=staff_id + s)
+            if staff_id == 0 and s == 1 and title:
+                vbox = _sub(st, "VBox"); _sub(vbox, "height", 10)
+                txt = _sub(vbox, "Text"); _sub(txt, "style", "Title"); _sub(txt, "text", title)
+            for mi, m in enumerate(part.measures):
+                me = _sub(st, "Measure")
+                tracks = sorted({t for (ss, t) in m["events"] if ss == s} | {0})
+                for track in tracks:
+                    voice = _sub(me, "voice")
+                    if track == 0:
+                        for at in m["attributes"]:
+                            if mi == 0 or at.find("clef") is not None:
+                                for clef in at.findall("clef"):
+                                    if to_int(clef.get("number"), 1) == s:
+                                        c = _sub(voice, "Clef"); ct = clef_type(clef)
+                                        _sub(c, "concertClefType", ct); _sub(c, "transposingClefType", ct)
+                            if at.find("key") is not None:
+                                _sub(_sub(voice, "KeySig"), "accidental", to_int(at.findtext("key/fifths"), 0))
+                            if at.find("time") is not None:
+                                ts = _sub(voice, "TimeSig")
+                                if is_hidden(at.find("time")):
+                                    _sub(ts, "visible", 0)
+                                _sub(ts, "sigN", at.findtext("time/beats")); _sub(ts, "sigD", at.findtext("time/beat-type"))
+                    events = sorted(m["events"].get((s, track), []), key=lambda e: e["onset"])
+                    texts = sorted((o, t) for ss, o, t in m["texts"] if ss == s) if track == 0 else []
+                    if events and all(e.get("forward") for e in events):
+                        events = []  # nothing printed in this voice: one invisible measure rest
+                        hide_rest = True
+                    else:
+                        hide_rest = track > 0
+                    if not events:
+                        for _, t in texts:
+                            _sub(_sub(voice, "StaffText"), "text", t)
+                        rest = _sub(voice, "Rest")
+                        if hide_rest:
+                            _sub(rest, "visible", 0)
+                        _sub(rest, "durationType", "measure"); _sub(rest, "duration", f"{Fraction(m['len'], 4 * DIVISION)}")
+                    else:
+                        cursor = 0
+                        for ev in events:
+                            if ev["onset"] > cursor:
+                                _filler(voice, ev["onset"] - cursor)
+                                cursor = ev["onset"]
+                            while texts and texts[0][0] <= ev["onset"]:
+                                _sub(_sub(voice, "StaffText"), "text", texts.pop(0)[1])
+                            if ev.get("forward"):
+                                _filler(voice, ev["ticks"])
+                            else:
+                                tup = ev["notes"][0].find("notations/tuplet")
+                                if tup is not None and tup.get("type") == "start":
+                                    tm = ev["notes"][0].find("time-modification")
+                                    te = _sub(voice, "Tuplet")
+                                    _sub(te, "normalNotes", tm.findtext("normal-notes") if tm is not None else 2)
+                                    _sub(te, "actualNotes", tm.findtext("actual-notes") if tm is not None else 3)
+                                    _sub(te, "baseNote", (tm.findtext("normal-type") if tm is not None else None)
+                                         or ev["notes"][0].findtext("type") or "eighth")
+                                    num = _sub(te, "Number"); _sub(num, "style", "Tuplet")
+                                    _sub(num, "text", tm.findtext("actual-notes") if tm is not None else 3)
+                                ev["track_key"] = (s, track)
+                                _chord(voice, ev, ties, mi)
+                                if tup is not None and tup.get("type") == "stop":
+                                    _sub(voice, "endTuplet")
+                            cursor = ev["onset"] + ev["ticks"]
+                        if cursor < m["len"] and track == 0:
+                            _filler(voice, m["len"] - cursor)
+                    if track == 0 and m["end_bar"]:
+                        _sub(_sub(voice, "BarLine"), "subtype", "end")
+                if s == 1 and m["break"]:
+                    _sub(_sub(me, "LayoutBreak"), "subtype", m["break"])
+        staff_id += part.staves
+    ET.indent(ms, space="  ")
+    return ms
+
+def mscz_bytes(root, stem):
+    """A .mscz container (META-INF/container.xml + stem.mscx) for a MusicXML root, as bytes."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("META-INF/container.xml", CONTAINER.format(name=stem + ".mscx"))
+        zf.writestr(stem + ".mscx", ET.tostring(musicxml_to_mscx(root), encoding="utf-8", xml_declaration=True))
+    return buf.getvalue()
+
+def write_mscz(root, path):
+    path = Path(path)
+    path.write_bytes(mscz_bytes(root, path.stem))
+    return path
+
+def convert(task):
+    """Worker: (src, dst) -> (src, dst, error or None)."""
+    src, dst = task
+    try:
+        write_mscz(read_tree(src).getroot(), dst)
+        return src, dst, None
+    except Exception as e:
+        return src, dst, f"{type(e).__name__}: {e}"
+
+def iter_inputs(paths):
+    for p in paths:
+        p = Path(p)
+        if p.is_file():
+            yield p
+            continue
+        for dirpath, _, files in os.walk(p):
+            for fn in sorted(files):
+                if fn.lower().endswith((".musicxml", ".music.xml")):
+                    yield Path(dirpath) / fn
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert generated MusicXML (Übungsblatt/Arbeitsblatt) to MuseScore .mscz, keeping hidden objects hidden.")
+    ap.add_argument("paths", nargs="+", help="Files or output folders")
+    ap.add_argument("--outdir", default=None, help="Where to write .mscz files (default: next to each input)")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    tasks = []
+    for src in iter_inputs(args.paths):
+        name = src.name[:-len(".music.xml")] if src.name.lower().endswith(".music.xml") else src.stem
+        dst = Path(args.outdir) / (name + ".mscz") if args.outdir else src.with_name(name + ".mscz")
+        tasks.append((str(src), str(dst)))
+    if args.outdir:
+        Path(args.outdir).mkdir(parents=True, exist_ok=True)
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for src, dst, err in pool.map(convert, tasks, chunksize=8):
+            if err:
+                failed += 1; print(f"{src}: {err}", file=sys.stderr)
+            else:
+                print(f"Wrote {dst}")
+    print(f"Converted {len(tasks) - failed} of {len(tasks)} file(s).")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
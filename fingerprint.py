@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# Canonical per-item fingerprints for generated variants and a store that rejects exact and near duplicates.
+import argparse
+import copy
+import hashlib
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+from musicxml_utils import note_pitch
+
+def _h(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+def _p(p):
+    return "-" if p is None else f"{p[0]}{p[1]:+d}{p[2]}"
+
+def item_vector(root, section):
+    """One 64-bit hash per exercise item, in score order. Two variants differ by the Hamming distance of these vectors."""
+    from generate_intervals import collect_events, pair_whole_with_quarter
+    from generate_chords import chord_groups
+    out = []
+    for part in root.findall("part"):
+        for meas in part.findall("measure"):
+            if section == "intervals":
+                for b, t in pair_whole_with_quarter(collect_events(meas)):
+                    out.append(_h(_p(note_pitch(b["note"])) + ">" + _p(note_pitch(t["note"]))))
+            elif section == "chords":
+                for g in chord_groups(meas):
+                    if len(g) > 1:
+                        out.append(_h("+".join(_p(note_pitch(n)) for n in g)))
+            elif section in ("scales", "melodies"):
+                out.append(_h(" ".join(_p(note_pitch(n)) for n in meas.findall(".//note[pitch]"))))
+            else:
+                out.append(_h(" ".join(("r" if n.find("rest") is not None else "n") + (n.findtext("duration") or "")
+                                       for n in meas.findall("note"))))
+    return out
+
+def digest(vec):
+    return hashlib.sha256(b"".join(v.to_bytes(8, "big") for v in vec)).hexdigest()
+
+def hamming(a, b):
+    return sum(1 for x, y in zip(a, b) if x != y) + abs(len(a) - len(b))
+
+class FingerprintStore:
+    """Exact-duplicate set plus a pigeonhole block index for Hamming near-duplicates.
+
+    With min_distance d, vectors at distance < d share at least one of d contiguous blocks exactly,
+    so a lookup only compares against variants that match some block instead of the whole store.
+    Optional persistence is an append-only text file: section, digest, comma-separated item hashes.
+    """
+    def __init__(self, path=None, min_distance=1):
+        self.path = path
+        self.min_distance = max(1, int(min_distance))
+        self.exact = set()
+        self.vectors = []
+        self.blocks = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) == 3:
+                        self._index(parts[0], parts[1], [int(x, 16) for x in parts[2].split(",") if x])
+
+    def _block_keys(self, section, vec):
+        d = self.min_distance
+        n = len(vec)
+        for b in range(d):
+            lo, hi = b * n // d, (b + 1) * n // d
+            yield (section, n, b, tuple(vec[lo:hi]))
+
+    def _index(self, section, dig, vec):
+        self.exact.add((section, dig))
+        if self.min_distance > 1:
+            i = len(self.vectors); self.vectors.append(vec)
+            for key in self._block_keys(section, vec):
+                self.blocks.setdefault(key, []).append(i)
+
+    def is_duplicate(self, section, vec):
+        if (section, digest(vec)) in self.exact:
+            return True
+        if self.min_distance <= 1:
+            return False
+        seen = set()
+        for key in self._block_keys(section, vec):
+            for i in self.blocks.get(key, ()):
+                if i not in seen:
+                    seen.add(i)
+                    if hamming(self.vectors[i], vec) < self.min_distance:
+                        return True
+        return False
+
+    def add(self, section, vec):
+        dig = digest(vec)
+        self._index(section, dig, vec)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"{section}\t{dig}\t{','.join(format(v, 'x') for v in vec)}\n")
+        return dig
+
+def add_dedupe_args(ap):
+    ap.add_argument("--fingerprints", default=None, help="Fingerprint store file; re-draw variants already in it (and record new ones)")
+    ap.add_argument("--min-distance", type=int, default=1, help="Re-draw if fewer than N items differ from a stored variant (1 = exact duplicates only)")
+    ap.add_argument("--max-redraws", type=int, default=20)
+    ap.add_argument("--require-unique", action="store_true", help="Fail (exit status 1, nothing written) if every re-draw is still a duplicate")
+
+def generate_unique(tree, section, generate, args):
+    """Run generate(root, salt) on a copy of tree until the variant is new to the store; returns (tree, changed).
+    If every re-draw is still a duplicate, the last one is returned unrecorded with a warning on stderr, or with
+    --require-unique the process exits with status 1."""
+    if not args.fingerprints:
+        return tree, generate(tree.getroot(), args.salt)
+    store = FingerprintStore(args.fingerprints, args.min_distance)
+    for attempt in range(args.max_redraws + 1):
+        work = ET.ElementTree(copy.deepcopy(tree.getroot()))
+        changed = generate(work.getroot(), args.salt + attempt)
+        vec = item_vector(work.getroot(), section)
+        if not store.is_duplicate(section, vec):
+            store.add(section, vec)
+            return work, changed
+        if attempt < args.max_redraws:
+            print(f"{section}: variant collides with a stored one, re-drawing ({attempt + 1}/{args.max_redraws})")
+    msg = f"{section}: still a duplicate after {args.max_redraws} re-draws (min distance {args.min_distance})"
+    if getattr(args, "require_unique", False):
+        sys.exit(f"error: {msg}; nothing written")
+    print(f"warning: {msg}; writing it anyway, not recorded in {args.fingerprints}", file=sys.stderr)
+    return work, changed
+
+def main():
+    ap = argparse.ArgumentParser(description="Print fingerprints of generated variants and flag (near) duplicates among them.")
+    ap.add_argument("--section", required=True, choices=["scales", "intervals", "chords", "rhythms", "melodies"])
+    ap.add_argument("--min-distance", type=int, default=1, help="Variants differing in fewer items count as duplicates")
+    ap.add_argument("paths", nargs="+")
+    args = ap.parse_args()
+    store = FingerprintStore(min_distance=args.min_distance)
+    dups = 0
+    for p in args.paths:
+        vec = item_vector(ET.parse(p).getroot(), args.section)
+        dup = store.is_duplicate(args.section, vec)
+        dups += dup
+        print(f"{digest(vec)[:16]}  {'DUPLICATE ' if dup else ''}{p}")
+        store.add(args.section, vec)
+    print(f"{len(args.paths)} variant(s), {dups} duplicate(s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,142 @@
 
 #!/usr/bin/env python3
-import argparse, random, xml.etree.ElementTree as ET
-from musicxml_utils import first_n_notes_in_measure, note_pitch, set_note_pitch, pitch_to_midi, midi_to_pitch, clone_note_as_chord_tone, write_tree
-TRIADS={"maj":[0,4,7],"min":[0,3,7],"dim":[0,3,6],"aug":[0,4,8]}
-def main():
-    ap=argparse.ArgumentParser(description="Turn first note of each measure into a stacked triad across the entire file.")
+import argparse, xml.etree.ElementTree as ET
+from difficulty import chord_difficulty, pick_by_difficulty
+from fingerprint import add_dedupe_args, generate_unique
+from adaptive import add_adaptive_args, tables_from_args
+from musicxml_utils import first_n_notes_in_measure, note_pitch, set_note_pitch, clone_note_as_chord_tone, write_tree, measure_rng, in_range, load_for_regeneration, alias_draw
+# Chord tones as (diatonic steps, semitones) above the root, so every tone is spelled from the root's letter.
+CHORD_SPELLINGS={
+    "maj":[(0,0),(2,4),(4,7)], "min":[(0,0),(2,3),(4,7)], "dim":[(0,0),(2,3),(4,6)], "aug":[(0,0),(2,4),(4,8)],
+    "dom7":[(0,0),(2,4),(4,7),(6,10)], "maj7":[(0,0),(2,4),(4,7),(6,11)], "min7":[(0,0),(2,3),(4,7),(6,10)],
+    "hdim7":[(0,0),(2,3),(4,6),(6,10)], "dim7":[(0,0),(2,3),(4,6),(6,9)],
+}
+INVERSIONS=["root","first","second","third"]
+STEPS="CDEFGAB"; NAT_SEMITONES=[0,2,4,5,7,9,11]
+
+def _spell(root_step, root_alter, quality, inversion):
+    """Spelled (step, alter, octave offset) tones, bottom-up, or None if an alter would exceed a double accidental."""
+    ri=STEPS.index(root_step); tones=[]
+    for d,semi in CHORD_SPELLINGS[quality]:
+        wraps,si=divmod(ri+d,7)
+        alter=root_alter+semi-(NAT_SEMITONES[si]+12*wraps-NAT_SEMITONES[ri])
+        if alter<-2 or alter>2: return None
+        tones.append((STEPS[si],alter,wraps))
+    n=INVERSIONS.index(inversion)
+    if n>=len(tones): return None
+    if n==0: return tuple(tones)
+    # Inversions keep the root in place and drop the tones from the new bass upward an octave below it.
+    return tuple((s,a,o-1) for s,a,o in tones[n:])+tuple(tones[:n])
+
+CHORD_TABLE={(s,a,q,inv):_spell(s,a,q,inv) for s in STEPS for a in (-1,0,1) for q in CHORD_SPELLINGS for inv in INVERSIONS}
+
+def classify_chord(pitches):
+    """(root step, root alter, quality, inversion) for spelled (step, alter, octave) chord tones, or None."""
+    tones=sorted(pitches,key=lambda p:(p[2],STEPS.index(p[0])))
+    pcs={(s,a) for s,a,_ in tones}
+    for rs,ra,_ in tones:
+        for q,spelling in CHORD_SPELLINGS.items():
+            spelled=CHORD_TABLE.get((rs,ra,q,"root"))
+            if spelled is None or len(spelled)!=len(pcs) or {(s,a) for s,a,_ in spelled}!=pcs: continue
+            bass=(tones[0][0],tones[0][1])
+            inv=[(s,a) for s,a,_ in spelled].index(bass)
+            return rs,ra,q,INVERSIONS[inv]
+    return None
+
+def chord_groups(meas):
+    """Split a measure into [root note, chord tones...] groups; a lone note with no <chord/> tones is its own group."""
+    groups=[]
+    for el in meas:
+        if el.tag!="note" or el.find("rest") is not None: continue
+        if el.find("chord") is not None and groups: groups[-1].append(el)
+        else: groups.append([el])
+    return groups
+
+def respell_group(group, tones):
+    """Write tones onto the group's notes, reusing existing chord tones and cloning only what is missing."""
+    base_oct=note_pitch(group[0])[2]; notes=group[:len(tones)]
+    while len(notes)<len(tones): notes.append(clone_note_as_chord_tone(group[0]))
+    for n,(s,a,o) in zip(notes,tones):
+        set_note_pitch(n,s,a,base_oct+o)
+        for acc in list(n.findall("accidental")): n.remove(acc)
+    return notes, group[len(tones):]
+
+def choose_chord(rng, step, alter, allowed, inversion, target_difficulty=None, spread=0.0, weights=None):
+    """(quality, inversion, tones) for one root: uniform draw, weighted draw from (candidates, alias table),
+    or nearest to a drawn difficulty over all spellable candidates."""
+    if target_difficulty is None:
+        if weights is not None:
+            cands,table=weights; kind,inv=cands[alias_draw(table,rng)]
+        else:
+            kind=rng.choice(allowed); n_tones=len(CHORD_SPELLINGS[kind])
+            inv=inversion if inversion!="random" else rng.choice(INVERSIONS[:n_tones])
+        tones=CHORD_TABLE.get((step,alter,kind,inv))
+        if tones is None: tones=CHORD_TABLE.get((step,alter,kind,"root"))
+        return kind,inv,tones
+    cands=[(q,inv,CHORD_TABLE[(step,alter,q,inv)]) for q in allowed for inv in (INVERSIONS if inversion=="random" else [inversion])
+           if CHORD_TABLE.get((step,alter,q,inv))]
+    i=pick_by_difficulty(cands,[chord_difficulty(q,inv,[a for _,a,_ in t]) for q,inv,t in cands],rng,target_difficulty,spread)
+    return (None,None,None) if i is None else cands[i]
+
+def process_measure(meas, rng, allowed, inversion, target_difficulty=None, spread=0.0, weights=None):
+    """Respell the chords of one measure; returns the number of chords written.
+    Every existing chord is rewritten with its first-listed note as the root; only chordless measures stack a new chord
+    on their first note."""
+    groups=[g for g in chord_groups(meas) if len(g)>1]
+    if not groups:
+        notes=first_n_notes_in_measure(meas,1)
+        groups=[notes] if notes else []
+    assignments=[]
+    for group in groups:
+        p=note_pitch(group[0])
+        if p is None: continue
+        step,alter,_=p
+        _,_,tones=choose_chord(rng,step,alter,allowed,inversion,target_difficulty,spread,weights)
+        if tones is None: continue
+        assignments.append((group,tones))
+    return write_chords(meas,assignments)
+
+def write_chords(meas, assignments):
+    """Apply [(group, tones)] to a measure, rebuilding its children once instead of inserting chord tones one at a time."""
+    replace={}
+    for group,tones in assignments:
+        notes,_=respell_group(group,tones)
+        for n in group[1:]: replace[id(n)]=[]
+        replace[id(group[0])]=notes
+    if replace:
+        children=[]
+        for el in meas:
+            children.extend(replace.get(id(el),[el]))
+        meas[:]=children
+    return len(assignments)
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(description="Respell every chord (or the first note of chordless measures) as a stacked triad/seventh across the entire file.")
     ap.add_argument("--input", required=True); ap.add_argument("--output", required=True)
-    ap.add_argument("--triads", default="maj,min,dim"); ap.add_argument("--inversion", default="random", choices=["root","first","second","random"])
-    ap.add_argument("--seed", type=int, default=None); args=ap.parse_args()
-    if args.seed is not None: random.seed(args.seed)
-    allowed=[t.strip() for t in args.triads.split(",") if t.strip() in TRIADS] or ["maj","min"]
-    tree=ET.parse(args.input); root=tree.getroot()
-    changed=0
-    for part in root.findall("part"):
-        for meas in part.findall("measure"):
-            notes=first_n_notes_in_measure(meas,1)
-            if not notes: continue
-            root_note=notes[0]; p=note_pitch(root_note)
-            if p is None: continue
-            step,alter,octave=p; base=pitch_to_midi(step,alter,octave)
-            kind=random.choice(allowed); ints=TRIADS[kind][:]
-            inv=args.inversion if args.inversion!="random" else random.choice(["root","first","second"])
-            if inv=="first": ints=[ints[1]-12, ints[2]-12, ints[0]]
-            elif inv=="second": ints=[ints[2]-12, ints[0], ints[1]]
-            s0,a0,o0=midi_to_pitch(base+ints[0]); set_note_pitch(root_note,s0,a0,o0)
-            nB=clone_note_as_chord_tone(root_note); nC=clone_note_as_chord_tone(root_note)
-            idx=list(meas).index(root_note); meas.insert(idx+1,nB); meas.insert(idx+2,nC)
-            s1,a1,o1=midi_to_pitch(base+ints[1]); s2,a2,o2=midi_to_pitch(base+ints[2])
-            set_note_pitch(nB,s1,a1,o1); set_note_pitch(nC,s2,a2,o2); changed+=1
+    ap.add_argument("--triads", default="maj,min,dim", help="Comma list among "+",".join(CHORD_SPELLINGS))
+    ap.add_argument("--inversion", default="random", choices=INVERSIONS+["random"])
+    ap.add_argument("--target-difficulty", type=float, default=None, help="Mean chord difficulty to aim for (see difficulty.py)")
+    ap.add_argument("--difficulty-spread", type=float, default=0.0, help="Std. deviation of chord difficulty around the target")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--measures", default=None, help="Only (re)generate measures K-M (1-based, inclusive)")
+    ap.add_argument("--base", default=None, help="Existing output to patch: measures in --measures are regenerated from --input, the rest is kept")
+    ap.add_argument("--salt", type=int, default=0, help="Re-roll the seed stream of the selected measures")
+    add_dedupe_args(ap); add_adaptive_args(ap)
+    args=ap.parse_args(argv)
+    allowed=[t.strip() for t in args.triads.split(",") if t.strip() in CHORD_SPELLINGS] or ["maj","min"]
+    weights=None; tables=tables_from_args(args)
+    if tables:
+        cands=[(q,inv) for q in allowed for inv in (INVERSIONS[:len(CHORD_SPELLINGS[q])] if args.inversion=="random" else [args.inversion])]
+        weights=(cands,tables.table("chords",cands))
+    tree,mrange,_=load_for_regeneration(args.input,args.base,args.measures)
+    def generate(root,salt):
+        changed=0
+        for pi,part in enumerate(root.findall("part")):
+            for mi,meas in enumerate(part.findall("measure")):
+                if not in_range(mrange,mi): continue
+                rng=measure_rng(args.seed,"chords",pi,mi,salt)
+                changed+=process_measure(meas,rng,allowed,args.inversion,args.target_difficulty,args.difficulty_spread,weights)
+        return changed
+    tree,changed=generate_unique(tree,"chords",generate,args)
     write_tree(tree,args.output); print(f"Created/updated {changed} chords. Wrote {args.output}")
 if __name__=='__main__': main()
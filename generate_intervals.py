@@ -1,8 +1,11 @@
 
 #!/usr/bin/env python3
 import argparse
-import random
 import xml.etree.ElementTree as ET
+from musicxml_utils import measure_rng, in_range, load_for_regeneration, write_tree, alias_draw
+from difficulty import interval_difficulty, pick_by_difficulty
+from fingerprint import add_dedupe_args, generate_unique
+from adaptive import add_adaptive_args, tables_from_args
 
 STEP_TO_INDEX = {'C':0,'D':1,'E':2,'F':3,'G':4,'A':5,'B':6}
 INDEX_TO_STEP = {v:k for k,v in STEP_TO_INDEX.items()}
@@ -78,6 +81,18 @@ def required_alter_for_interval(base_step, base_oct, base_alter, ivl_name, direc
         return None, None, None
     return tgt_step, tgt_oct, int(alter)
 
+def classify_interval(base, target):
+    """Name and direction of the interval between two (step, octave, alter) pitches, or (None, dir) if unnamed."""
+    b_idx = STEP_TO_INDEX[base[0]] + 7 * base[1]
+    t_idx = STEP_TO_INDEX[target[0]] + 7 * target[1]
+    semis = midi_of(*target) - midi_of(*base)
+    direction = 'up' if (t_idx, semis) >= (b_idx, 0) else 'down'
+    key = (abs(t_idx - b_idx), abs(semis))
+    for name, val in INTERVAL_TABLE.items():
+        if val == key:
+            return name, direction
+    return None, direction
+
 def duration_val(note):
     d = note.findtext('duration')
     try:
@@ -92,35 +107,35 @@ def voice_id(note):
     v = note.findtext('voice')
     return v.strip() if v else '1'
 
+def collect_events(meas):
+    events = []
+    time = 0
+    for el in list(meas):
+        tag = el.tag
+        if tag == 'note':
+            d = duration_val(el) or 0
+            ev = {
+                'note': el,
+                'onset': time,
+                'dur': d,
+                'type': note_type(el),
+                'voice': voice_id(el),
+                'pitch': get_pitch(el) if note_is_pitched(el) else None
+            }
+            events.append(ev)
+            time += d
+        elif tag == 'forward':
+            d = el.findtext('duration')
+            try: time += int(d) if d is not None else 0
+            except: pass
+        elif tag == 'backup':
+            d = el.findtext('duration')
+            try: time -= int(d) if d is not None else 0
+            except: pass
+    return events
+
 def collect_events_by_measure(part):
-    measures = []
-    for meas in part.findall('measure'):
-        events = []
-        time = 0
-        for el in list(meas):
-            tag = el.tag
-            if tag == 'note':
-                d = duration_val(el) or 0
-                ev = {
-                    'note': el,
-                    'onset': time,
-                    'dur': d,
-                    'type': note_type(el),
-                    'voice': voice_id(el),
-                    'pitch': get_pitch(el) if note_is_pitched(el) else None
-                }
-                events.append(ev)
-                time += d
-            elif tag == 'forward':
-                d = el.findtext('duration')
-                try: time += int(d) if d is not None else 0
-                except: pass
-            elif tag == 'backup':
-                d = el.findtext('duration')
-                try: time -= int(d) if d is not None else 0
-                except: pass
-        measures.append(events)
-    return measures
+    return [collect_events(meas) for meas in part.findall('measure')]
 
 def pair_whole_with_quarter(measure_events):
     pairs = []
@@ -167,7 +182,66 @@ def append_profile_to_credit_words(root, profile_name: str):
     root.insert(0, credit)
     return 1
 
-def main():
+def choose_target(base_pitch, rng, interval_set, directions, allowed_alters, attempts, require_match, weights=None):
+    """Target pitch for one base: shuffled candidates, or with weights=(candidates, alias table) weighted draws."""
+    base_step, base_oct, base_alt = base_pitch
+    chosen = None; tries = 0
+    if weights is not None:
+        cands, table = weights
+        draw = lambda: cands[alias_draw(table, rng)]
+        remaining = attempts
+    else:
+        candidates = [(ivl, d) for ivl in interval_set for d in directions]
+        rng.shuffle(candidates)
+        draw = candidates.pop
+        remaining = min(attempts, len(candidates))
+    while tries < remaining:
+        ivl, direc = draw(); tries += 1
+        tgt = required_alter_for_interval(base_step, base_oct, base_alt, ivl, direc)
+        if tgt == (None, None, None): continue
+        tgt_step, tgt_oct, tgt_alter = tgt
+        if tgt_alter in allowed_alters:
+            chosen = (tgt_step, tgt_oct, tgt_alter); break
+    if chosen is None and not require_match:
+        for ivl in interval_set:
+            for direc in directions:
+                tgt = required_alter_for_interval(base_step, base_oct, base_alt, ivl, direc)
+                if tgt != (None, None, None):
+                    chosen = tgt; break
+            if chosen: break
+    return chosen
+
+def choose_target_by_difficulty(base_pitch, rng, interval_set, directions, allowed_alters, mean, spread):
+    """One pass over all tag-compliant targets, scored up front; returns the one nearest the drawn difficulty."""
+    base_step, base_oct, base_alt = base_pitch
+    cands, scores = [], []
+    for ivl in interval_set:
+        for direc in directions:
+            tgt = required_alter_for_interval(base_step, base_oct, base_alt, ivl, direc)
+            if tgt == (None, None, None) or tgt[2] not in allowed_alters: continue
+            cands.append(tgt); scores.append(interval_difficulty(ivl, direc, base_alt, tgt[2]))
+    i = pick_by_difficulty(cands, scores, rng, mean, spread)
+    return None if i is None else cands[i]
+
+def process_measure(evs, rng, interval_set, directions, allowed_alters, attempts, require_match,
+                    target_difficulty=None, spread=0.0, weights=None):
+    changed = 0
+    for base_ev, tgt_ev in pair_whole_with_quarter(evs):
+        chosen = None
+        if target_difficulty is not None:
+            chosen = choose_target_by_difficulty(base_ev['pitch'], rng, interval_set, directions, allowed_alters,
+                                                 target_difficulty, spread)
+        if chosen is None:
+            chosen = choose_target(base_ev['pitch'], rng, interval_set, directions, allowed_alters, attempts, require_match,
+                                   weights)
+        if chosen is not None:
+            s,o,a = chosen
+            set_pitch(tgt_ev['note'], s,o,a)
+            clear_explicit_accidental(tgt_ev['note'])
+            changed += 1
+    return changed
+
+def main(argv=None):
     ap = argparse.ArgumentParser(description='Intervals generator with tags and profile title.')
     ap.add_argument('--input', required=True)
     ap.add_argument('--output', required=True)
@@ -181,10 +255,14 @@ def main():
     ap.add_argument('--require-tag-match', type=str, default='true')
     ap.add_argument('--seed', type=int, default=None)
     ap.add_argument('--profile-name', default='', help='Append (Profile: NAME) to <credit-words>')
-    args = ap.parse_args()
-
-    if args.seed is not None:
-        random.seed(args.seed)
+    ap.add_argument('--target-difficulty', type=float, default=None, help='Mean item difficulty to aim for (see difficulty.py)')
+    ap.add_argument('--difficulty-spread', type=float, default=0.0, help='Std. deviation of item difficulty around the target')
+    ap.add_argument('--measures', default=None, help='Only (re)generate measures K-M (1-based, inclusive)')
+    ap.add_argument('--base', default=None, help='Existing output to patch: measures in --measures are regenerated from --input, the rest is kept')
+    ap.add_argument('--salt', type=int, default=0, help='Re-roll the seed stream of the selected measures')
+    add_dedupe_args(ap)
+    add_adaptive_args(ap)
+    args = ap.parse_args(argv)
 
     interval_set = [s for s in parse_csv_list(args.set) if s in INTERVAL_TABLE]
     if not interval_set:
@@ -205,42 +283,32 @@ def main():
 
     require_match = (str(args.require_tag_match).strip().lower() in ('1','true','yes','y'))
 
-    tree = ET.parse(args.input); root = tree.getroot()
+    weights = None
+    tables = tables_from_args(args)
+    if tables:
+        cands = [(ivl, d) for ivl in interval_set for d in directions]
+        weights = (cands, tables.table('intervals', cands))
+
+    tree, mrange, _ = load_for_regeneration(args.input, args.base, args.measures); root = tree.getroot()
 
     if args.profile_name:
         append_profile_to_credit_words(root, args.profile_name)
 
-    changed = 0
-    for part in root.findall('part'):
-        measures = collect_events_by_measure(part)
-        for evs in measures:
-            pairs = pair_whole_with_quarter(evs)
-            for base_ev, tgt_ev in pairs:
-                base_step, base_oct, base_alt = base_ev['pitch']
-                candidates = [(ivl, d) for ivl in interval_set for d in directions]
-                random.shuffle(candidates)
-                chosen = None; tries = 0
-                while candidates and tries < args.resample_attempts:
-                    ivl, direc = candidates.pop(); tries += 1
-                    tgt = required_alter_for_interval(base_step, base_oct, base_alt, ivl, direc)
-                    if tgt == (None, None, None): continue
-                    tgt_step, tgt_oct, tgt_alter = tgt
-                    if tgt_alter in allowed_alters:
-                        chosen = (tgt_step, tgt_oct, tgt_alter); break
-                if chosen is None and not require_match:
-                    for ivl in interval_set:
-                        for direc in directions:
-                            tgt = required_alter_for_interval(base_step, base_oct, base_alt, ivl, direc)
-                            if tgt != (None, None, None):
-                                chosen = tgt; break
-                        if chosen: break
-                if chosen is not None:
-                    s,o,a = chosen
-                    set_pitch(tgt_ev['note'], s,o,a)
-                    clear_explicit_accidental(tgt_ev['note'])
-                    changed += 1
-
-    tree.write(args.output, encoding='utf-8', xml_declaration=True)
+    def generate(root, salt):
+        changed = 0
+        for pi, part in enumerate(root.findall('part')):
+            for mi, meas in enumerate(part.findall('measure')):
+                if not in_range(mrange, mi):
+                    continue
+                rng = measure_rng(args.seed, 'intervals', pi, mi, salt)
+                changed += process_measure(collect_events(meas), rng, interval_set, directions,
+                                           allowed_alters, args.resample_attempts, require_match,
+                                           args.target_difficulty, args.difficulty_spread, weights)
+        return changed
+
+    tree, changed = generate_unique(tree, 'intervals', generate, args)
+
+    write_tree(tree, args.output)
     print(f'Intervals: wrote {args.output}; changed {changed} targets with tag/position-compliant accidentals.')
 
 if __name__ == '__main__':
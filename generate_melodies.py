@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import argparse, re, xml.etree.ElementTree as ET
+from functools import lru_cache
+from fingerprint import add_dedupe_args, generate_unique
+from musicxml_utils import pitch_to_midi, set_note_pitch, write_tree, _deepcopy, build_alias_table, alias_draw, measure_rng, in_range, load_for_regeneration
+
+STEPS="CDEFGAB"
+FIFTHS_OF_STEP={"F":-1,"C":0,"G":1,"D":2,"A":3,"E":4,"B":5}  # position on the line of fifths
+SHARP_ORDER="FCGDAEB"
+# Base weight of a move by its size in scale steps (0 = repeated note); sevenths and leaps beyond the octave never occur.
+MOVE_WEIGHT={0:0.3,1:6.0,2:3.0,3:1.5,4:1.2,5:0.6,7:0.5}
+MAX_LEAP={1:2,2:4,3:5,4:7}  # widest move in scale steps by rounded difficulty
+REDRAWS=8
+
+def parse_key(name):
+    """(fifths, mode) for a key name: upper case = major (C, Bb, F#), lower case = minor (a, c#, eb)."""
+    m=re.fullmatch(r"\s*([A-Ga-g])(#|b)?\s*",name or "")
+    if not m: raise ValueError(f"bad key: {name!r}")
+    step=m.group(1); alter={"#":1,"b":-1}.get(m.group(2),0)
+    minor=step.islower()
+    fifths=FIFTHS_OF_STEP[step.upper()]+7*alter-(3 if minor else 0)
+    if not -7<=fifths<=7: raise ValueError(f"key {name!r} needs more than 7 accidentals")
+    return fifths, "minor" if minor else "major"
+
+def tonic_of(fifths, mode):
+    """(step, alter) of the tonic for a key signature."""
+    lof=fifths+(3 if mode=="minor" else 0)
+    step=next(s for s in STEPS if (lof-FIFTHS_OF_STEP[s])%7==0)
+    return step,(lof-FIFTHS_OF_STEP[step])//7
+
+def key_name(fifths, mode):
+    step,alter=tonic_of(fifths,mode)
+    name=step+("#" if alter>0 else "b"*-alter)
+    return f"{name} major" if mode=="major" else f"{name.lower()} minor"
+
+def parse_range(spec):
+    """'C4-G5' -> (low, high) diatonic indices (octave*7 + letter)."""
+    m=re.fullmatch(r"\s*([A-Ga-g])(-?\d)\s*-\s*([A-Ga-g])(-?\d)\s*",spec or "")
+    if not m: raise ValueError(f"bad range: {spec!r} (expected e.g. C4-G5)")
+    lo=int(m.group(2))*7+STEPS.index(m.group(1).upper()); hi=int(m.group(4))*7+STEPS.index(m.group(3).upper())
+    if hi-lo<4: raise ValueError(f"range {spec!r} is narrower than a fifth")
+    return lo,hi
+
+def key_pitch(d, fifths, mode):
+    """(step, alter, octave) of diatonic index d in the key; minor raises the leading tone (harmonic minor)."""
+    step=STEPS[d%7]
+    signed=SHARP_ORDER[:fifths] if fifths>0 else SHARP_ORDER[::-1][:-fifths]
+    alter=(1 if fifths>0 else -1) if step in signed else 0
+    tstep,_=tonic_of(fifths,mode)
+    if mode=="minor" and (d-STEPS.index(tstep))%7==6: alter+=1
+    return step,alter,d//7
+
+@lru_cache(maxsize=None)
+def transition_table(fifths, mode, lo, hi, difficulty):
+    """Step/leap transition tables for one key, range and difficulty.
+
+    Returns (states, reach, tonics, starts): states maps (position, last leap direction -1/0/1) to
+    (next positions, alias table); reach is the widest move; tonics and starts are the tonic and opening positions.
+    """
+    level=max(1,min(4,round(difficulty))); reach=MAX_LEAP[level]
+    pitch={d:key_pitch(d,fifths,mode) for d in range(lo,hi+1)}
+    midi={d:pitch_to_midi(*p) for d,p in pitch.items()}
+    t0=STEPS.index(tonic_of(fifths,mode)[0]); degree=lambda d:(d-t0)%7
+    states={}
+    for d in range(lo,hi+1):
+        for last in (-1,0,1):
+            nxt=[]; w=[]
+            for e in range(max(lo,d-reach),min(hi,d+reach)+1):
+                s=e-d; x=MOVE_WEIGHT.get(abs(s),0.0)
+                if not x: continue
+                if abs(s)>=2:
+                    x*=(difficulty/2.5)**(abs(s)-1)  # easy levels rarely leap, hard ones often do
+                    if degree(e) in (0,2,4): x*=1.5  # leaps land on tonic-triad tones
+                semis=abs(midi[e]-midi[d])
+                if semis%12==6 or (abs(s)==1 and semis==3):  # tritone, augmented second
+                    x*=0.05 if level<3 else 0.5
+                if last and s:  # after a leap, turn back by step (gap fill)
+                    x*=3.0 if s*last<0 and abs(s)<=2 else (0.3 if s*last>0 else 1.0)
+                nxt.append(e); w.append(x)
+            states[(d,last)]=(nxt,build_alias_table(w))
+    tonics=[d for d in range(lo,hi+1) if degree(d)==0]
+    starts=[d for d in range(lo,hi+1) if degree(d)==0 or (level>1 and degree(d) in (2,4))]
+    return states,reach,tonics,starts
+
+def draw_melody(rng, n, table):
+    """n diatonic positions: opens on a tonic(-triad) tone and closes on the nearest tonic, reached by step
+    (two notes are just that step). Moves come from the transition table; draws that could no longer reach
+    the close in time are rejected, and the penultimate note is always a step from the close."""
+    states,reach,tonics,starts=table
+    if not tonics: return []
+    d=rng.choice(starts); close=min(tonics,key=lambda t:(abs(t-d),t))
+    if n<=1: return [close][:n]
+    pen=[p for p in (close-1,close+1) if (p,0) in states] or [close]
+    near_pen=lambda d:min(pen,key=lambda p:(abs(p-d),p))
+    if n==2: return [near_pen(d),close]
+    out=[d]; last=0
+    for k in range(1,n-1):
+        left=n-2-k  # moves still to come before the penultimate note
+        nxt,tab=states[(d,last)]
+        far=lambda e:min(abs(e-p) for p in pen)
+        for _ in range(REDRAWS):
+            e=nxt[alias_draw(tab,rng)]
+            if far(e)<=left*reach: break
+        else:
+            e=min(nxt,key=lambda e:(far(e),e)) if left else near_pen(d)  # out of reach: leap onto the step
+        last=1 if e-d>=2 else (-1 if e-d<=-2 else 0); d=e; out.append(d)
+    out.append(close)
+    return out
+
+def attack_groups(meas):
+    """Pitched notes of one measure grouped by attack: a note plus the notes tied onto it."""
+    groups=[]
+    for n in meas.findall("note"):
+        if n.find("pitch") is None or n.find("chord") is not None or n.find("grace") is not None: continue
+        if groups and n.find("tie[@type='stop']") is not None: groups[-1].append(n)
+        else: groups.append([n])
+    return groups
+
+def process_measure(meas, rng, fifths, mode, table):
+    """Write one melody over the measure's rhythm; returns the number of attacks pitched."""
+    groups=attack_groups(meas)
+    melody=draw_melody(rng,len(groups),table)
+    for group,d in zip(groups,melody):
+        step,alter,octave=key_pitch(d,fifths,mode)
+        for n in group:
+            set_note_pitch(n,step,alter,octave)
+            for el in n.findall("accidental")+n.findall("stem"): n.remove(el)  # notation software re-derives both
+            n.attrib.pop("default-y",None)
+    return len(melody)
+
+def set_key(root, fifths, mode):
+    for k in root.iter("key"):
+        f=k.find("fifths")
+        if f is not None: f.text=str(fifths)
+        m=k.find("mode")
+        if m is not None: m.text=mode
+
+def add_words(root, text):
+    """Add text as a new <words> direction after the template's first one, which stays: it marks the section."""
+    meas=root.find("part/measure")
+    if meas is None: return
+    first=next((d for d in meas.findall("direction") if d.find("direction-type/words") is not None),None)
+    if first is None:
+        d=ET.Element("direction",{"placement":"above"}); ET.SubElement(ET.SubElement(d,"direction-type"),"words")
+        kids=list(meas); notes=meas.findall("note")
+        meas.insert(kids.index(notes[0]) if notes else len(kids),d)
+    else:
+        d=_deepcopy(first); meas.insert(list(meas).index(first)+1,d)
+    words=d.find("direction-type/words"); words.text=text; words.attrib.pop("default-y",None)
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(description="Write a short melody (one per measure) over the template's rhythm: opens on a tonic-triad tone, closes on the tonic, moves drawn from precomputed step/leap transition tables.")
+    ap.add_argument("--input", required=True); ap.add_argument("--output", required=True)
+    ap.add_argument("--key", default=None, help="Key name, upper case major (C, G, Bb), lower case minor (a, e, d); default: the template's key")
+    ap.add_argument("--range", default="C4-G5", help="Lowest-highest note letter, e.g. C4-G5")
+    ap.add_argument("--difficulty", type=float, default=2.0, help="1 (stepwise, short leaps) .. 4 (frequent leaps up to an octave)")
+    ap.add_argument("--words", default="", help="Instruction added as a new <words> direction after the template's first one (which is kept)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--measures", default=None, help="Only (re)generate measures K-M (1-based, inclusive)")
+    ap.add_argument("--base", default=None, help="Existing output to patch: measures in --measures are regenerated from --input, the rest is kept")
+    ap.add_argument("--salt", type=int, default=0, help="Re-roll the seed stream of the selected measures")
+    add_dedupe_args(ap)
+    args=ap.parse_args(argv)
+    try:
+        lo,hi=parse_range(args.range)
+        key=parse_key(args.key) if args.key else None
+    except ValueError as e:
+        ap.error(str(e))
+    tree,mrange,_=load_for_regeneration(args.input,args.base,args.measures); root=tree.getroot()
+    if key is None:
+        k=root.find(".//key")
+        key=(int(k.findtext("fifths") or 0),(k.findtext("mode") or "major").strip()) if k is not None else (0,"major")
+        if key[1] not in ("major","minor"): key=(key[0],"major")
+    fifths,mode=key
+    table=transition_table(fifths,mode,lo,hi,max(1.0,min(4.0,args.difficulty)))
+    if not table[2]: ap.error(f"range {args.range} holds no tonic of {key_name(fifths,mode)}")
+    set_key(root,fifths,mode)
+    if args.words: add_words(root,args.words)
+    def generate(root,salt):
+        changed=0
+        for pi,part in enumerate(root.findall("part")):
+            for mi,meas in enumerate(part.findall("measure")):
+                if not in_range(mrange,mi): continue
+                changed+=process_measure(meas,measure_rng(args.seed,"melodies",pi,mi,salt),fifths,mode,table)
+        return changed
+    tree,changed=generate_unique(tree,"melodies",generate,args)
+    write_tree(tree,args.output); print(f"Pitched {changed} melody notes in {key_name(fifths,mode)}. Wrote {args.output}")
+if __name__=='__main__': main()
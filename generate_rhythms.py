@@ -1,26 +1,249 @@
 
 #!/usr/bin/env python3
-import argparse, random, xml.etree.ElementTree as ET
-from musicxml_utils import write_tree
-def main():
-    ap=argparse.ArgumentParser(description="Randomize note/rest patterns across the entire file while preserving durations.")
+import argparse, xml.etree.ElementTree as ET
+from fractions import Fraction as F
+from functools import lru_cache
+from math import lcm
+from difficulty import rhythm_group_difficulty
+from musicxml_utils import write_tree, build_alias_table, alias_draw, _deepcopy, measure_rng, in_range, load_for_regeneration, parse_template
+
+# Beat-group patterns as (tokens, difficulty, beats spanned). Token lengths are in beats;
+# "r" = rest, "t" = triplet member, trailing "~" = tied into the next token.
+SIMPLE_PATTERNS = [
+    ("1",1,1), ("r1",1,1), ("1/2 1/2",1,1), ("1/2 r1/2",2,1), ("r1/2 1/2",3,1),
+    ("1/2 1/4 1/4",2,1), ("1/4 1/4 1/2",2,1), ("1/4 1/4 1/4 1/4",2,1), ("3/4 1/4",3,1),
+    ("t1/3 t1/3 t1/3",3,1), ("1/4 3/4",4,1), ("1/4 1/2 1/4",4,1), ("r1/4 1/4 1/4 1/4",4,1),
+    ("2",1,2), ("r2",1,2), ("3/2 1/2",2,2), ("1/2 1 1/2",4,2), ("1/2 1/2~ 1/2 1/2",4,2),
+    ("3",1,3), ("4",1,4),
+]
+COMPOUND_PATTERNS = [
+    ("1",1,1), ("r1",1,1), ("2/3 1/3",1,1), ("1/3 1/3 1/3",1,1), ("2/3 r1/3",2,1),
+    ("1/3 2/3",3,1), ("1/2 1/6 1/3",3,1), ("1/6 1/6 1/6 1/6 1/6 1/6",2,1), ("1/3 1/6 1/6 1/3",3,1),
+    ("2",1,2),
+]
+TYPES = [(F(4),"whole"),(F(2),"half"),(F(1),"quarter"),(F(1,2),"eighth"),(F(1,4),"16th"),(F(1,8),"32nd")]
+BEAM_LEVEL = {"eighth":1,"16th":2,"32nd":3}
+
+def parse_tokens(spec):
+    out=[]
+    for tok in spec.split():
+        rest=tok.startswith("r"); trip=tok.startswith("t"); tie=tok.endswith("~")
+        out.append((F(tok.strip("rt~")), rest, trip, tie))
+    return tuple(out)
+
+def type_for(ql):
+    """(type, dots) for a quarter length, or None if it needs a tie."""
+    for base,name in TYPES:
+        if ql==base: return name,0
+        if ql==base*F(3,2): return name,1
+    return None
+
+def meter_of(beats, beat_type):
+    """(beats per measure, quarter length per beat, compound?) for a <time> signature."""
+    if beat_type>=8 and beats%3==0 and beats>3:
+        return beats//3, F(4,beat_type)*3, True
+    return beats, F(4,beat_type), False
+
+def _group_ok(tokens, beat_ql, divisions):
+    """Every token has a notated type and a whole number of divisions (no rounded or zero <duration>)."""
+    return all(type_for(ln*beat_ql*(F(3,2) if trip else 1)) is not None and (ln*beat_ql*divisions).denominator==1
+               for ln,_,trip,_ in tokens)
+
+@lru_cache(maxsize=None)
+def pattern_index(n_beats, beat_ql, compound, difficulty, note_prob, divisions):
+    """Per-span alias tables over beat-group patterns plus an alias table over measure segmentations,
+    or None when no pattern fits the template's <divisions>.
+
+    A segmentation's weight is the product of its slots' total weights, so drawing a segmentation and
+    then each group independently is the same as drawing whole measures by product weight.
+    """
+    groups={}
+    for spec,diff,span in (COMPOUND_PATTERNS if compound else SIMPLE_PATTERNS):
+        tokens=parse_tokens(spec)
+        if span>n_beats or not _group_ok(tokens, beat_ql, divisions): continue
+        w=2.0**(-abs(rhythm_group_difficulty(diff,tokens)-difficulty)) * (1-note_prob if any(t[1] for t in tokens) else note_prob)
+        groups.setdefault(span,[]).append((tokens,w))
+    def segmentations(pos):
+        if pos==n_beats: return [()]
+        out=[]
+        for span in groups:
+            # Groups longer than a beat start on a strong beat and never straddle the bar's middle.
+            if span>1 and (pos%2 or pos+span>n_beats or (span>2 and pos)): continue
+            out += [(span,)+rest for rest in segmentations(pos+span)]
+        return out
+    totals={span:sum(w for _,w in g) for span,g in groups.items()}
+    segs=segmentations(0)
+    if not segs: return None
+    seg_w=[1.0]*len(segs)
+    for i,seg in enumerate(segs):
+        for span in seg: seg_w[i]*=totals[span]
+    tables={span:([t for t,_ in g], build_alias_table([w for _,w in g])) for span,g in groups.items()}
+    return segs, build_alias_table(seg_w), tables
+
+def sample_measure(index, rng=None):
+    segs, seg_table, tables = index
+    out=[]
+    for span in segs[alias_draw(seg_table,rng)]:
+        pats, tab = tables[span]
+        out.append(pats[alias_draw(tab,rng)])
+    return out
+
+def _beams(events):
+    """Beam values per level for each note event in one beat group."""
+    beams=[{} for _ in events]
+    for level in (1,2,3):
+        run=[]
+        for i,ev in enumerate(events+[None]):
+            ok = ev is not None and not ev["rest"] and BEAM_LEVEL.get(ev["type"],0)>=level
+            if ok: run.append(i); continue
+            if len(run)==1 and level>1 and beams[run[0]].get(1):
+                j=run[0]; beams[j][level]="backward hook" if beams[j][1]=="end" else "forward hook"
+            elif len(run)>1:
+                for k,j in enumerate(run):
+                    beams[j][level]="begin" if k==0 else ("end" if k==len(run)-1 else "continue")
+            run=[]
+    return beams
+
+def build_notes(groups, beat_ql, divisions, proto):
+    """Expand sampled beat groups into <note> elements modelled on the template's first note."""
+    notes=[]; pos=F(0); tie_open=False
+    for tokens in groups:
+        events=[]
+        for ln,rest,trip,tie in tokens:
+            ql=ln*beat_ql; shown=ql*F(3,2) if trip else ql
+            typ,dots=type_for(shown)
+            events.append({"ql":ql,"rest":rest,"trip":trip,"tie":tie,"type":typ,"dots":dots})
+        beams=_beams(events)
+        trips=[i for i,e in enumerate(events) if e["trip"]]
+        for i,ev in enumerate(events):
+            n=ET.Element("note", proto["attrib"])
+            if ev["rest"]: ET.SubElement(n,"rest")
+            else: n.append(_deepcopy(proto["pitch"]))
+            start=round(pos*divisions); pos+=ev["ql"]
+            ET.SubElement(n,"duration").text=str(round(pos*divisions)-start)
+            tie_types=(["stop"] if tie_open and not ev["rest"] else [])+(["start"] if ev["tie"] else [])
+            for tt in tie_types: ET.SubElement(n,"tie",{"type":tt})
+            if proto["instrument"] is not None: n.append(_deepcopy(proto["instrument"]))
+            ET.SubElement(n,"voice").text=proto["voice"]
+            ET.SubElement(n,"type").text=ev["type"]
+            for _ in range(ev["dots"]): ET.SubElement(n,"dot")
+            if ev["trip"]:
+                tm=ET.SubElement(n,"time-modification")
+                ET.SubElement(tm,"actual-notes").text="3"; ET.SubElement(tm,"normal-notes").text="2"
+                ET.SubElement(tm,"normal-type").text=ev["type"]
+            if not ev["rest"]: ET.SubElement(n,"stem").text=proto["stem"]
+            ET.SubElement(n,"staff").text=proto["staff"]
+            for level,val in sorted(beams[i].items()):
+                ET.SubElement(n,"beam",{"number":str(level)}).text=val
+            marks=[("tied",{"type":tt}) for tt in tie_types]
+            if ev["trip"] and i in (trips[0],trips[-1]):
+                marks.append(("tuplet",{"type":"start" if i==trips[0] else "stop","bracket":"no","number":"1"}))
+            if marks:
+                nt=ET.SubElement(n,"notations")
+                for tag,attrib in marks: ET.SubElement(nt,tag,attrib)
+            tie_open=ev["tie"]
+            notes.append(n)
+    return notes
+
+def prototype_of(meas, fallback):
+    for n in meas.findall("note"):
+        p=n.find("pitch")
+        if p is None: continue
+        return {"attrib":{k:v for k,v in n.attrib.items() if k in ("color","print-object")}, "pitch":p,
+                "instrument":n.find("instrument"), "voice":(n.findtext("voice") or "1").strip(),
+                "stem":(n.findtext("stem") or "up").strip(), "staff":(n.findtext("staff") or "1").strip()}
+    return fallback
+
+def divisions_factor(divisions, meters):
+    """Smallest factor that gives every notatable library token a whole number of divisions in these meters."""
+    f=1
+    for beats,beat_type in meters:
+        n_beats,beat_ql,compound=meter_of(beats,beat_type)
+        for spec,_,span in (COMPOUND_PATTERNS if compound else SIMPLE_PATTERNS):
+            tokens=parse_tokens(spec)
+            if span>n_beats: continue
+            for ln,_,trip,_ in tokens:
+                if type_for(ln*beat_ql*(F(3,2) if trip else 1)) is not None:
+                    f=lcm(f,(ln*beat_ql*divisions).denominator)
+    return f
+
+def scale_divisions(part, factor):
+    """Multiply <divisions> and every <duration> of one part (notes, forwards, backups) by factor."""
+    if factor==1: return
+    for el in part.iter("divisions"): el.text=str(int(el.text)*factor)
+    for el in part.iter("duration"): el.text=str(int(el.text)*factor)
+
+def running_divisions(measures):
+    """<divisions> in effect at each measure."""
+    out=[]; d=1
+    for m in measures:
+        d=int(m.findtext("attributes/divisions") or d); out.append(d)
+    return out
+
+def rescale_spliced(root, template_root, spliced):
+    """Bring measures spliced in from the template to the base's (possibly raised) <divisions>: every duration
+    (notes, forwards, backups) is scaled, since measures that are not refilled keep them. False if the base's
+    divisions are not a multiple of the template's."""
+    tparts=template_root.findall("part")
+    for pi,part in enumerate(root.findall("part")):
+        olds={new:old for p,_,old,new in spliced if p==pi}
+        if not olds: continue
+        measures=part.findall("measure")
+        base=running_divisions([olds.get(m,m) for m in measures]); tmpl=running_divisions(tparts[pi].findall("measure"))
+        for mi,meas in enumerate(measures):
+            if meas not in olds: continue
+            f=F(base[mi],tmpl[mi])
+            if f.denominator!=1: return False
+            d=meas.find("attributes/divisions")
+            if d is not None: d.text=str(base[mi])
+            for el in meas.iter("duration"): el.text=str(int(el.text)*f.numerator)
+    return True
+
+def process_measure(meas, rng, divisions, beats, beat_type, proto, difficulty, note_prob):
+    """Refill one single-voice measure; returns 1 if it was rewritten."""
+    notes=meas.findall("note")
+    if not notes or meas.find("backup") is not None: return 0
+    n_beats,beat_ql,compound=meter_of(beats,beat_type)
+    if (n_beats*beat_ql*divisions).denominator!=1: return 0
+    index=pattern_index(n_beats,beat_ql,compound,difficulty,note_prob,divisions)
+    if index is None: return 0
+    new_notes=build_notes(sample_measure(index,rng),beat_ql,divisions,proto)
+    kids=list(meas); first=kids.index(notes[0])
+    head=[el for el in kids[:first] if el.tag!="forward"]
+    tail=[el for el in kids[first:] if el.tag not in ("note","forward")]
+    meas[:]=head+new_notes+tail
+    return 1
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(description="Fill every measure with beat-grouped rhythm patterns sampled from a precomputed library for the template's time signature.")
     ap.add_argument("--input", required=True); ap.add_argument("--output", required=True)
-    ap.add_argument("--note-prob", type=float, default=0.7)
-    ap.add_argument("--seed", type=int, default=None); args=ap.parse_args()
-    if args.seed is not None: random.seed(args.seed)
-    tree=ET.parse(args.input); root=tree.getroot(); changed=0
-    for part in root.findall("part"):
-        for meas in part.findall("measure"):
-            for n in list(meas.findall("note")):
-                if random.random()<args.note_prob:
-                    r=n.find("rest")
-                    if r is not None: n.remove(r)
-                    if n.find("pitch") is None:
-                        p=ET.SubElement(n,"pitch"); ET.SubElement(p,"step").text="G"; ET.SubElement(p,"octave").text="4"
-                else:
-                    p=n.find("pitch")
-                    if p is not None: n.remove(p)
-                    if n.find("rest") is None: ET.SubElement(n,"rest")
-                changed+=1
-    write_tree(tree,args.output); print(f"Randomized {changed} rhythm slots. Wrote {args.output}")
+    ap.add_argument("--note-prob", type=float, default=0.7, help="Preference for rest-free beat groups (0..1)")
+    ap.add_argument("--difficulty", type=float, default=2.0, help="Target pattern difficulty 1 (plain) .. 4 (syncopated)")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--measures", default=None, help="Only (re)generate measures K-M (1-based, inclusive)")
+    ap.add_argument("--base", default=None, help="Existing output to patch: measures in --measures are regenerated from --input, the rest is kept")
+    ap.add_argument("--salt", type=int, default=0, help="Re-roll the seed stream of the selected measures")
+    args=ap.parse_args(argv)
+    note_prob=max(0.05,min(0.95,args.note_prob))
+    tree,mrange,spliced=load_for_regeneration(args.input,args.base,args.measures); root=tree.getroot(); changed=0
+    if spliced and not rescale_spliced(root,parse_template(args.input).getroot(),spliced):
+        ap.error("--base has <divisions> that are not a multiple of the template's; regenerate it in full")
+    fallback_pitch=ET.Element("pitch"); ET.SubElement(fallback_pitch,"step").text="G"; ET.SubElement(fallback_pitch,"octave").text="4"
+    for pi,part in enumerate(root.findall("part")):
+        # Raise <divisions> so 16ths and triplets get exact durations (e.g. 256 -> 768 for triplets)
+        meters={(int(t.findtext("beats") or 4),int(t.findtext("beat-type") or 4)) for t in part.iter("time")} or {(4,4)}
+        scale_divisions(part,lcm(*[divisions_factor(int(d.text),meters) for d in part.iter("divisions")]))
+        divisions=1; beats,beat_type=4,4
+        proto={"attrib":{},"pitch":fallback_pitch,"instrument":None,"voice":"1","stem":"up","staff":"1"}
+        for mi,meas in enumerate(part.findall("measure")):
+            at=meas.find("attributes")
+            if at is not None:
+                divisions=int(at.findtext("divisions") or divisions)
+                if at.find("time") is not None:
+                    beats=int(at.findtext("time/beats") or beats); beat_type=int(at.findtext("time/beat-type") or beat_type)
+            proto=prototype_of(meas, proto)
+            if not in_range(mrange,mi): continue
+            rng=measure_rng(args.seed,"rhythms",pi,mi,args.salt)
+            changed+=process_measure(meas,rng,divisions,beats,beat_type,proto,args.difficulty,note_prob)
+    write_tree(tree,args.output); print(f"Filled {changed} measures from the rhythm pattern library. Wrote {args.output}")
 if __name__=='__main__': main()
@@ -1,8 +1,10 @@
 
 #!/usr/bin/env python3
 import argparse
-import random
 import xml.etree.ElementTree as ET
+from musicxml_utils import measure_rng, in_range, load_for_regeneration, write_tree, anchor_indices
+from difficulty import scale_note_difficulty
+from fingerprint import add_dedupe_args, generate_unique
 
 TAG2ALTER = {"natural": 0, "sharp": 1, "flat": -1}
 STEP_TO_INDEX = {'C':0,'D':1,'E':2,'F':3,'G':4,'A':5,'B':6}
@@ -76,7 +78,26 @@ def append_profile_to_credit_words(root, profile_name: str):
     root.insert(0, credit)
     return 1
 
-def main():
+def pick_anchors(meas, anchor_kinds):
+    """First/last/apex pitched notes of one measure (de-duplicated, in that order)."""
+    notes = [n for n in list(meas) if n.tag == "note" and is_pitched_note(n)]
+    return [notes[i] for i in anchor_indices([midi_of_note(n) for n in notes], anchor_kinds)]
+
+def stratified_quota(order, strata, keys, k):
+    """k of the key-sorted indices in `order`, split over strata in proportion to their size (largest remainder,
+    ties by the stratum's lowest key); each stratum takes its lowest keys."""
+    members = {}
+    for i in order:
+        members.setdefault(strata[i], []).append(i)
+    if not order:
+        return []
+    share = {s: k * len(m) / len(order) for s, m in members.items()}
+    quota = {s: int(v) for s, v in share.items()}
+    for s in sorted(members, key=lambda s: (quota[s] - share[s], keys[members[s][0]]))[:k - sum(quota.values())]:
+        quota[s] += 1
+    return [i for s, m in members.items() for i in m[:quota[s]]]
+
+def main(argv=None):
     ap = argparse.ArgumentParser(
         description="Scales per-bar anchors: keep first/apex/last visible per measure; alter only hidden notes. Non-selected hidden notes are forced natural."
     )
@@ -90,6 +111,9 @@ def main():
     # Quota across all hidden, non-anchor notes in the whole score
     ap.add_argument("--alter-count", type=int, default=None, help="Exact number of eligible hidden notes to alter")
     ap.add_argument("--alter-ratio", type=float, default=None, help="0..1 ratio of eligible hidden notes to alter (ignored if --alter-count set)")
+    ap.add_argument("--stratify", default="none", choices=["none","measure","phrase"],
+                    help="Split the quota over measures or phrases in proportion to their eligible notes (none: lowest draws score-wide)")
+    ap.add_argument("--phrase-measures", type=int, default=4, help="Measures per phrase for --stratify phrase")
 
     # Optional: restrict eligible hidden notes by step+oct name (E4,F4,...) after anchors/visibility applied
     ap.add_argument("--placeholders", default="", help="Comma list of names among HIDDEN notes; empty=all hidden non-anchors")
@@ -102,11 +126,14 @@ def main():
     ap.add_argument("--hide-articulations", type=str, default="true", help="true|false: set print-object='no' on all articulations")
     ap.add_argument("--profile-name", default="", help="Profile label to append in <credit-words>")
 
+    ap.add_argument("--target-difficulty", type=float, default=None, help="Per-bar difficulty to aim for (see difficulty.py); overrides --alter-count/--alter-ratio")
+    ap.add_argument("--difficulty-spread", type=float, default=0.0, help="Std. deviation of per-bar difficulty around the target")
     ap.add_argument("--seed", type=int, default=None)
-    args = ap.parse_args()
-
-    if args.seed is not None:
-        random.seed(args.seed)
+    ap.add_argument("--measures", default=None, help="Only (re)generate measures K-M (1-based, inclusive)")
+    ap.add_argument("--base", default=None, help="Existing output to patch: measures in --measures are regenerated from --input, the rest is kept")
+    ap.add_argument("--salt", type=int, default=0, help="Re-roll the seed stream of the selected measures")
+    add_dedupe_args(ap)
+    args = ap.parse_args(argv)
 
     tags = parse_csv_list(args.accidental_tags) or parse_csv_list(args.accidentals)
     allowed_alters = []
@@ -119,7 +146,7 @@ def main():
     placeholders = set(parse_csv_list(args.placeholders))
     anchor_kinds = set(t.strip().lower() for t in parse_csv_list(args.anchors)) or {"first","last","apex"}
 
-    tree = ET.parse(args.input)
+    tree, mrange, spliced = load_for_regeneration(args.input, args.base, args.measures)
     root = tree.getroot()
 
     # Hide articulations if requested
@@ -135,84 +162,89 @@ def main():
     if args.profile_name:
         append_profile_to_credit_words(root, args.profile_name)
 
-    # Pass 1: set all pitched notes to hidden by default
-    all_pitched = root.findall(".//note[pitch]")
-    for n in all_pitched:
-        set_visible(n, yes=False)
-
-    # Pass 2: per-measure anchors
-    anchors = []
-    for part in root.findall("part"):
-        for meas in part.findall("measure"):
-            notes = [n for n in list(meas) if n.tag == "note" and is_pitched_note(n)]
-            if not notes:
-                continue
-            first = notes[0]
-            last  = notes[-1]
-            apex  = max(notes, key=lambda nn: midi_of_note(nn))
-            selected = []
-            if "first" in anchor_kinds: selected.append(first)
-            if "last"  in anchor_kinds: selected.append(last)
-            if "apex"  in anchor_kinds: selected.append(apex)
-            # de-dup
-            seen = set(); sel_unique = []
-            for n in selected:
-                i = id(n)
-                if i not in seen:
-                    sel_unique.append(n); seen.add(i)
-            for n in sel_unique:
-                set_visible(n, yes=True)
-            anchors.extend(sel_unique)
-
-    # Optionally force anchors to natural
-    if str(args.force_anchors_natural).strip().lower() in ("1","true","yes","y"):
-        for n in anchors:
-            set_alter(n, 0)
-            clear_explicit_accidental(n)
-
-    # Pool = all currently HIDDEN pitched notes (non-anchors), optionally filtered by placeholders
-    def name_of(note):
-        so = get_step_oct_alter(note)
-        if not so: return None
-        step, octv, _ = so
-        return f"{step}{octv}"
-
-    pool = []
-    for n in all_pitched:
-        if is_visible(n):
-            continue
-        nm = name_of(n)
-        if placeholders and (nm not in placeholders):
-            continue
-        pool.append(n)
-
-    total_eligible = len(pool)
-
-    # Decide how many to alter
-    if args.alter_count is not None:
-        k = max(0, min(args.alter_count, total_eligible))
-    elif args.alter_ratio is not None:
-        ratio = max(0.0, min(1.0, float(args.alter_ratio)))
-        k = int(round(ratio * total_eligible))
-    else:
-        k = total_eligible
-
-    to_alter = set(random.sample(pool, k)) if k > 0 else set()
-
-    changed = 0
-    for n in pool:
-        if n in to_alter:
-            alter = random.choice(allowed_alters)
-            set_alter(n, alter)
-            clear_explicit_accidental(n)
-            changed += 1
+    def generate(root, salt):
+        # One pass over the pitched notes in range: hide them, keep each measure's anchors visible and collect the
+        # eligible notes as parallel columns (draw key, drawn alter, stratum). Each eligible note draws from its own
+        # measure's stream, so a measure's choices do not depend on how many notes other measures have.
+        force_natural = str(args.force_anchors_natural).strip().lower() in ("1","true","yes","y")
+        pool, keys, alters, strata = [], [], [], []
+        by_measure = {}; n_anchors = 0
+        for pi, part in enumerate(root.findall("part")):
+            for mi, meas in enumerate(part.findall("measure")):
+                if not in_range(mrange, mi):
+                    continue
+                notes = meas.findall(".//note[pitch]")
+                pitches = [get_step_oct_alter(n) for n in notes]
+                anchors = set(anchor_indices([midi_of(*p) if p else -999 for p in pitches], anchor_kinds))
+                rng = measure_rng(args.seed, "scales", pi, mi, salt)
+                for i, (n, p) in enumerate(zip(notes, pitches)):
+                    set_visible(n, yes=i in anchors)
+                    if i in anchors:
+                        n_anchors += 1
+                        if force_natural:
+                            set_alter(n, 0)
+                            clear_explicit_accidental(n)
+                    elif not placeholders or (p and f"{p[0]}{p[1]}" in placeholders):
+                        by_measure.setdefault((pi, mi), []).append(len(pool))
+                        pool.append(n); keys.append(rng.random()); alters.append(rng.choice(allowed_alters))
+                        strata.append((pi, mi if args.stratify == "measure" else mi // max(1, args.phrase_measures)))
+
+        total_eligible = len(pool)
+
+        # Decide how many to alter
+        if args.alter_count is not None:
+            k = max(0, min(args.alter_count, total_eligible))
+        elif args.alter_ratio is not None:
+            ratio = max(0.0, min(1.0, float(args.alter_ratio)))
+            k = int(round(ratio * total_eligible))
+        else:
+            k = total_eligible
+
+        order = sorted(range(total_eligible), key=keys.__getitem__)
+        if args.target_difficulty is not None:
+            # One greedy pass per measure: take notes in key order while they move the bar's score toward its drawn target.
+            to_alter = set()
+            for (pi, mi), local in by_measure.items():
+                rng = measure_rng(args.seed, "scales-difficulty", pi, mi, salt)
+                desired = rng.gauss(args.target_difficulty, args.difficulty_spread) if args.difficulty_spread > 0 else args.target_difficulty
+                score = 0.0
+                for i in sorted(local, key=keys.__getitem__):
+                    cost = scale_note_difficulty(alters[i])
+                    if cost and abs(score + cost - desired) < abs(score - desired):
+                        to_alter.add(i); score += cost
+        elif spliced:
+            # Partial regeneration keeps each measure's number of accidentals from the existing output, whatever the
+            # configured count or ratio would give for the (usually few) notes in range.
+            to_alter = set()
+            for pi, mi, old, _ in spliced:
+                local = by_measure.get((pi, mi), [])
+                k_local = sum(1 for n in old.findall(".//note[pitch]")
+                              if not is_visible(n) and (get_step_oct_alter(n) or (0,0,0))[2] != 0)
+                chosen = sorted(local, key=keys.__getitem__)[:k_local]
+                # a chosen note that drew "natural" would not count as an accidental: re-draw it among the others
+                nonzero = [a for a in allowed_alters if a]
+                rng = measure_rng(args.seed, "scales-regenerate", pi, mi, salt)
+                for i in chosen:
+                    if alters[i] == 0 and nonzero:
+                        alters[i] = rng.choice(nonzero)
+                to_alter.update(chosen)
+        elif args.stratify != "none":
+            to_alter = set(stratified_quota(order, strata, keys, k))
         else:
-            # FORCE non-selected hidden notes to NATURAL to prevent leftover flats/sharps from the template
-            set_alter(n, 0)
+            to_alter = set(order[:k])
+
+        changed = 0
+        for i, n in enumerate(pool):
+            # non-selected hidden notes are FORCED natural to prevent leftover flats/sharps from the template
+            set_alter(n, alters[i] if i in to_alter else 0)
             clear_explicit_accidental(n)
+            changed += i in to_alter
+        return changed, n_anchors, total_eligible
+
+    tree, (changed, n_anchors, total_eligible) = generate_unique(tree, "scales", generate, args)
 
-    tree.write(args.output, encoding='utf-8', xml_declaration=True)
-    print(f"Per-bar anchors kept visible: {len(anchors)}; changed {changed} / {total_eligible} hidden notes. Wrote {args.output}")
+    write_tree(tree, args.output)
+    print(f"Per-bar anchors kept visible: {n_anchors}; changed {changed} / {total_eligible} hidden notes. Wrote {args.output}")
 
 if __name__ == "__main__":
     main()
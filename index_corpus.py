@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sqlite3
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from musicxml_utils import find_sections_by_words, note_pitch, pitch_to_midi
+from generate_intervals import collect_events, pair_whole_with_quarter, classify_interval
+from generate_chords import chord_groups, classify_chord
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_ROOTS = [HERE / "fertigeTests", HERE / "sibelius"]
+EXTENSIONS = (".musicxml", ".xml", ".mxl")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime REAL NOT NULL, size INTEGER NOT NULL, indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS measures (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE, part INTEGER NOT NULL, measure INTEGER NOT NULL,
+    section TEXT, notes INTEGER NOT NULL, accidentals INTEGER NOT NULL, low INTEGER, high INTEGER
+);
+CREATE TABLE IF NOT EXISTS intervals (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE, part INTEGER NOT NULL, measure INTEGER NOT NULL,
+    name TEXT, direction TEXT NOT NULL, base_step TEXT NOT NULL, base_alter INTEGER NOT NULL, target_alter INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chords (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE, part INTEGER NOT NULL, measure INTEGER NOT NULL,
+    root_step TEXT NOT NULL, root_alter INTEGER NOT NULL, quality TEXT NOT NULL, inversion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_measures_file ON measures(file_id);
+CREATE INDEX IF NOT EXISTS ix_measures_section ON measures(section);
+CREATE INDEX IF NOT EXISTS ix_intervals_file ON intervals(file_id);
+CREATE INDEX IF NOT EXISTS ix_intervals_q ON intervals(name, direction, base_alter);
+CREATE INDEX IF NOT EXISTS ix_chords_file ON chords(file_id);
+CREATE INDEX IF NOT EXISTS ix_chords_q ON chords(quality, inversion, root_alter);
+"""
+
+def read_score(path):
+    """Parse .musicxml/.xml directly, or the root file named in a compressed .mxl container."""
+    if not str(path).lower().endswith(".mxl"):
+        return ET.parse(path).getroot()
+    with zipfile.ZipFile(path) as zf:
+        container = ET.fromstring(zf.read("META-INF/container.xml"))
+        rootfile = next(el.get("full-path") for el in container.iter() if el.tag.endswith("rootfile"))
+        return ET.fromstring(zf.read(rootfile))
+
+def extract_features(path):
+    """Per-measure rows for one file: (measures, intervals, chords). Runs in worker processes."""
+    try:
+        root = read_score(path)
+    except Exception as e:
+        return path, None, str(e)
+    labels = {}
+    for label, pi, mi in find_sections_by_words(root):
+        labels.setdefault((pi, mi), label)
+    measures, intervals, chords = [], [], []
+    for pi, part in enumerate(root.findall("part")):
+        section = None
+        for mi, meas in enumerate(part.findall("measure")):
+            section = labels.get((pi, mi), section)
+            pitches = [p for p in (note_pitch(n) for n in meas.findall("note")) if p is not None]
+            midis = [pitch_to_midi(*p) for p in pitches]
+            measures.append((pi, mi, section, len(pitches), sum(1 for p in pitches if p[1]),
+                             min(midis) if midis else None, max(midis) if midis else None))
+            for base_ev, tgt_ev in pair_whole_with_quarter(collect_events(meas)):
+                b, t = base_ev["pitch"], tgt_ev["pitch"]
+                name, direction = classify_interval(b, t)
+                intervals.append((pi, mi, name, direction, b[0], b[2], t[2]))
+            for group in chord_groups(meas):
+                if len(group) < 3:
+                    continue
+                c = classify_chord([note_pitch(n) for n in group])
+                if c is not None:
+                    chords.append((pi, mi) + c)
+    return path, (measures, intervals, chords), None
+
+def iter_corpus(roots):
+    for r in roots:
+        r = Path(r)
+        if r.is_file():
+            yield r
+            continue
+        for dirpath, _, files in os.walk(r):
+            for fn in files:
+                if fn.lower().endswith(EXTENSIONS):
+                    yield Path(dirpath) / fn
+
+def connect(db_path):
+    con = sqlite3.connect(str(db_path))
+    con.execute("PRAGMA foreign_keys = ON")
+    con.execute("PRAGMA journal_mode = WAL")
+    con.executescript(SCHEMA)
+    return con
+
+def update_index(con, roots, workers=None):
+    """Re-extract files whose mtime/size changed, drop rows for files under roots that disappeared.
+    Returns (indexed, removed, errors)."""
+    known = {p: (m, s) for p, m, s in con.execute("SELECT path, mtime, size FROM files")}
+    seen, todo = set(), []
+    for path in iter_corpus(roots):
+        st = path.stat(); key = str(path.resolve())
+        seen.add(key)
+        if known.get(key) != (st.st_mtime, st.st_size):
+            todo.append((key, st.st_mtime, st.st_size))
+    # only paths under the roots just scanned can have disappeared; the rest of the corpus stays indexed
+    scanned = [Path(r).resolve() for r in roots]
+    removed = [p for p in known if p not in seen and any(r == Path(p) or r in Path(p).parents for r in scanned)]
+    con.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+    stats = {key: (m, s) for key, m, s in todo}
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, rows, err in pool.map(extract_features, list(stats), chunksize=8):
+            con.execute("DELETE FROM files WHERE path = ?", (path,))  # an unreadable file's old rows are stale too
+            if rows is None:
+                errors.append((path, err)); continue
+            mtime, size = stats[path]
+            fid = con.execute("INSERT INTO files(path, mtime, size, indexed_at) VALUES (?,?,?,?)",
+                              (path, mtime, size, time.time())).lastrowid
+            measures, intervals, chords = rows
+            con.executemany("INSERT INTO measures VALUES (?,?,?,?,?,?,?,?)", [(fid,) + r for r in measures])
+            con.executemany("INSERT INTO intervals VALUES (?,?,?,?,?,?,?,?)", [(fid,) + r for r in intervals])
+            con.executemany("INSERT INTO chords VALUES (?,?,?,?,?,?,?)", [(fid,) + r for r in chords])
+    con.commit()
+    return len(todo) - len(errors), len(removed), errors
+
+def query(con, kind, **where):
+    """Rows (path, part, measure, ...) matching column=value filters on the intervals or chords table."""
+    cols = {"intervals": ("name", "direction", "base_step", "base_alter", "target_alter"),
+            "chords": ("root_step", "root_alter", "quality", "inversion")}[kind]
+    clauses, params = [], []
+    for k, v in where.items():
+        if v is None:
+            continue
+        if k not in cols:
+            raise ValueError(f"unknown {kind} filter: {k}")
+        clauses.append(f"t.{k} = ?"); params.append(v)
+    sql = (f"SELECT f.path, t.part, t.measure, {', '.join('t.' + c for c in cols)} FROM {kind} t "
+           f"JOIN files f ON f.id = t.file_id" + (" WHERE " + " AND ".join(clauses) if clauses else "") +
+           " ORDER BY f.path, t.part, t.measure")
+    return con.execute(sql, params).fetchall()
+
+def main():
+    ap = argparse.ArgumentParser(description="Index finished tests and templates into SQLite for fast item/template lookup.")
+    ap.add_argument("--db", default=str(HERE / "corpus_index.sqlite"))
+    ap.add_argument("--roots", nargs="*", default=None, help="Files/folders to index (default: fertigeTests, sibelius)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--no-update", action="store_true", help="Query the existing index without rescanning")
+    ap.add_argument("--intervals", action="store_true", help="Query intervals (filters: --name --direction --base-step --base-alter --target-alter)")
+    ap.add_argument("--chords", action="store_true", help="Query chords (filters: --quality --inversion --root-step --root-alter)")
+    ap.add_argument("--name"); ap.add_argument("--direction", choices=["up", "down"])
+    ap.add_argument("--base-step"); ap.add_argument("--base-alter", type=int); ap.add_argument("--target-alter", type=int)
+    ap.add_argument("--quality"); ap.add_argument("--inversion")
+    ap.add_argument("--root-step"); ap.add_argument("--root-alter", type=int)
+    args = ap.parse_args()
+
+    con = connect(args.db)
+    if not args.no_update:
+        roots = args.roots or [r for r in DEFAULT_ROOTS if r.exists()]
+        t0 = time.perf_counter()
+        n, removed, errors = update_index(con, roots, args.workers)
+        for path, err in errors:
+            print(f"skipped {path}: {err}", file=sys.stderr)
+        print(f"Index {args.db}: {n} file(s) (re)indexed, {removed} removed in {time.perf_counter() - t0:.2f}s")
+
+    if args.intervals:
+        rows = query(con, "intervals", name=args.name, direction=args.direction, base_step=args.base_step,
+                     base_alter=args.base_alter, target_alter=args.target_alter)
+    elif args.chords:
+        rows = query(con, "chords", quality=args.quality, inversion=args.inversion,
+                     root_step=args.root_step, root_alter=args.root_alter)
+    else:
+        return
+    for row in rows:
+        path, pi, mi, *rest = row
+        print(f"{path}\tpart {pi + 1}\tmeasure {mi + 1}\t" + " ".join(str(x) for x in rest))
+    print(f"{len(rows)} match(es)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+import argparse
+import hashlib
+import json
+import random
+import sqlite3
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from musicxml_utils import note_pitch, set_note_pitch, write_tree, measure_rng
+from difficulty import interval_difficulty, chord_difficulty, scale_note_difficulty
+from generate_intervals import INTERVAL_TABLE, required_alter_for_interval, collect_events, pair_whole_with_quarter
+from generate_chords import CHORD_TABLE, chord_groups, write_chords
+from generate_scales import pick_anchors, set_visible, set_alter, clear_explicit_accidental
+
+HERE = Path(__file__).resolve().parent
+ACC_TAG = {-2: "doubleflat", -1: "flat", 0: "natural", 1: "sharp", 2: "doublesharp"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,          -- interval | chord | scale_bar
+    name TEXT,                       -- interval name or chord quality
+    direction TEXT,                  -- interval direction
+    inversion TEXT,
+    step TEXT, alter_ INTEGER, octave INTEGER,   -- base note / chord root
+    base_acc TEXT, target_acc TEXT,
+    template TEXT, measure INTEGER, n_altered INTEGER,
+    difficulty REAL NOT NULL,
+    payload TEXT NOT NULL            -- JSON pitches used to fill a template slot
+);
+CREATE INDEX IF NOT EXISTS ix_interval ON items(category, name, direction, base_acc, target_acc);
+CREATE INDEX IF NOT EXISTS ix_chord ON items(category, name, inversion, step, alter_);
+CREATE INDEX IF NOT EXISTS ix_scale ON items(category, template, measure, n_altered);
+CREATE INDEX IF NOT EXISTS ix_difficulty ON items(category, difficulty);
+"""
+COLUMNS = ("category", "name", "direction", "inversion", "step", "alter_", "octave", "base_acc", "target_acc",
+           "template", "measure", "n_altered", "difficulty", "payload")
+FILTERS = {"name", "direction", "inversion", "step", "alter_", "octave", "base_acc", "target_acc", "n_altered"}
+
+def template_key(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()[:16]
+
+def interval_items(octaves):
+    for step in "CDEFGAB":
+        for alter in (-1, 0, 1):
+            for octave in octaves:
+                for ivl in INTERVAL_TABLE:
+                    for direc in ("up", "down"):
+                        tgt = required_alter_for_interval(step, octave, alter, ivl, direc)
+                        if tgt == (None, None, None):
+                            continue
+                        t_step, t_oct, t_alt = tgt
+                        yield dict(category="interval", name=ivl, direction=direc, step=step, alter_=alter, octave=octave,
+                                   base_acc=ACC_TAG[alter], target_acc=ACC_TAG[t_alt],
+                                   difficulty=interval_difficulty(ivl, direc, alter, t_alt),
+                                   payload=json.dumps([[step, alter, octave], [t_step, t_alt, t_oct]]))
+
+def chord_items(octaves):
+    for (step, alter, quality, inv), tones in CHORD_TABLE.items():
+        if tones is None:
+            continue
+        for octave in octaves:
+            yield dict(category="chord", name=quality, inversion=inv, step=step, alter_=alter, octave=octave,
+                       base_acc=ACC_TAG[alter], difficulty=chord_difficulty(quality, inv, [a for _, a, _ in tones]),
+                       payload=json.dumps([[s, a, octave + o] for s, a, o in tones]))
+
+def scale_bar_items(template, samples, allowed_alters, max_altered, seed):
+    """Sampled bar variants per template measure: anchors visible and natural, k hidden notes altered."""
+    root = ET.parse(template).getroot(); key = template_key(template)
+    for pi, part in enumerate(root.findall("part")):
+        for mi, meas in enumerate(part.findall("measure")):
+            notes = meas.findall(".//note[pitch]")
+            anchors = {id(n) for n in pick_anchors(meas, {"first", "last", "apex"})}
+            hidden = [i for i, n in enumerate(notes) if id(n) not in anchors]
+            if not notes:
+                continue
+            rng = measure_rng(seed, "bank-scales", pi, mi)
+            seen = set()
+            for k in range(0, min(max_altered, len(hidden)) + 1):
+                for _ in range(samples if k else 1):
+                    chosen = dict((i, rng.choice(allowed_alters)) for i in rng.sample(hidden, k))
+                    bar = tuple((id(n) in anchors, chosen.get(i, 0)) for i, n in enumerate(notes))
+                    if bar in seen:
+                        continue
+                    seen.add(bar)
+                    yield dict(category="scale_bar", template=key, measure=mi, n_altered=k,
+                               target_acc=",".join(sorted({ACC_TAG[a] for _, a in bar if a})) or "natural",
+                               difficulty=sum(scale_note_difficulty(a) for _, a in bar),
+                               payload=json.dumps(bar))
+
+def connect(db_path):
+    con = sqlite3.connect(str(db_path))
+    con.executescript(SCHEMA)
+    return con
+
+def insert(con, rows):
+    sql = f"INSERT INTO items({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+    n = 0
+    for batch in _batches(rows, 5000):
+        con.executemany(sql, [tuple(r.get(c) for c in COLUMNS) for r in batch]); n += len(batch)
+    con.commit()
+    return n
+
+def _batches(it, size):
+    batch = []
+    for x in it:
+        batch.append(x)
+        if len(batch) >= size:
+            yield batch; batch = []
+    if batch:
+        yield batch
+
+def parse_where(spec):
+    """'name=M6,direction=down,base_acc=sharp|flat' -> {column: [values]}; 'alter' is accepted for 'alter_'."""
+    out = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        k, _, v = part.partition("=")
+        k = k.strip(); k = "alter_" if k == "alter" else k
+        if k not in FILTERS:
+            raise ValueError(f"unknown filter {k!r}; use one of {sorted(FILTERS)}")
+        out[k] = [x.strip() for x in v.split("|") if x.strip()]
+    return out
+
+def select_ids(con, category, where, template=None, measure=None, difficulty=None):
+    """Ids matching the filters via the category indexes; the caller samples from this list."""
+    clauses, params = ["category = ?"], [category]
+    for k, vals in where.items():
+        clauses.append(f"{k} IN ({', '.join('?' * len(vals))})"); params += vals
+    if template is not None:
+        clauses.append("template = ? AND measure = ?"); params += [template, measure]
+    if difficulty is not None:
+        clauses.append("difficulty BETWEEN ? AND ?"); params += list(difficulty)
+    return [r[0] for r in con.execute(f"SELECT id FROM items WHERE {' AND '.join(clauses)}", params)]
+
+def payload(con, item_id):
+    return json.loads(con.execute("SELECT payload FROM items WHERE id = ?", (item_id,)).fetchone()[0])
+
+def slot_ids(con, category, where, octave, cache, difficulty=None):
+    """Ids in one slot's register: items whose base note (chord root) lies in the template note's octave.
+    An octave filter in where then only selects which slots are filled. Cached per octave."""
+    if octave not in cache:
+        wanted = "octave" not in where or str(octave) in where["octave"]
+        cache[octave] = select_ids(con, category, dict(where, octave=[octave]), difficulty=difficulty) if wanted else []
+    return cache[octave]
+
+def fill_intervals(con, root, where, rng, difficulty=None):
+    cache = {}
+    filled = 0
+    for part in root.findall("part"):
+        for meas in part.findall("measure"):
+            for base_ev, tgt_ev in pair_whole_with_quarter(collect_events(meas)):
+                ids = slot_ids(con, "interval", where, note_pitch(base_ev["note"])[2], cache, difficulty)
+                if not ids:
+                    continue
+                (bs, ba, bo), (ts, ta, to) = payload(con, rng.choice(ids))
+                for ev, (s, a, o) in ((base_ev, (bs, ba, bo)), (tgt_ev, (ts, ta, to))):
+                    set_note_pitch(ev["note"], s, a, o)
+                    clear_explicit_accidental(ev["note"])
+                filled += 1
+    return filled
+
+def fill_chords(con, root, where, rng, difficulty=None):
+    cache = {}
+    filled = 0
+    for part in root.findall("part"):
+        for meas in part.findall("measure"):
+            assignments = []
+            for group in chord_groups(meas):
+                if len(group) < 2:
+                    continue
+                base_oct = note_pitch(group[0])[2]
+                ids = slot_ids(con, "chord", where, base_oct, cache, difficulty)
+                if not ids:
+                    continue
+                assignments.append((group, [(s, a, o - base_oct) for s, a, o in payload(con, rng.choice(ids))]))
+            filled += write_chords(meas, assignments)
+    return filled
+
+def fill_scales(con, root, where, rng, template, difficulty=None):
+    key = template_key(template); filled = 0
+    for part in root.findall("part"):
+        for mi, meas in enumerate(part.findall("measure")):
+            ids = select_ids(con, "scale_bar", where, template=key, measure=mi, difficulty=difficulty)
+            notes = meas.findall(".//note[pitch]")
+            if not ids or not notes:
+                continue
+            for n, (visible, alter) in zip(notes, payload(con, rng.choice(ids))):
+                set_visible(n, yes=visible); set_alter(n, alter); clear_explicit_accidental(n)
+            filled += 1
+    return filled
+
+def main():
+    ap = argparse.ArgumentParser(description="Build an indexed item bank and assemble sheets from it by sampling.")
+    ap.add_argument("--db", default=str(HERE / "item_bank.sqlite"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="(Re)build the bank")
+    b.add_argument("--octaves", default="3,4,5", help="Base/root octaves to enumerate")
+    b.add_argument("--scales-template", default=str(HERE / "sibelius" / "Hoeren_scales.musicxml"))
+    b.add_argument("--scale-samples", type=int, default=50, help="Sampled bar variants per measure and altered-note count")
+    b.add_argument("--scale-max-altered", type=int, default=4)
+    b.add_argument("--scale-accidentals", default="sharp,flat")
+    b.add_argument("--seed", type=int, default=0)
+
+    f = sub.add_parser("fill", help="Fill a template from the bank")
+    f.add_argument("--section", required=True, choices=["intervals", "chords", "scales"])
+    f.add_argument("--input", required=True); f.add_argument("--output", required=True)
+    f.add_argument("--where", default="", help="e.g. name=M6,direction=down,base_acc=sharp  or  name=dim,inversion=second,step=F,alter=1")
+    f.add_argument("--difficulty", default=None, help="LO-HI difficulty band, e.g. 2-4")
+    f.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    con = connect(args.db)
+    if args.cmd == "build":
+        octaves = [int(x) for x in args.octaves.split(",") if x.strip()]
+        alters = [{"natural": 0, "sharp": 1, "flat": -1}[t.strip()] for t in args.scale_accidentals.split(",") if t.strip()]
+        con.execute("DELETE FROM items")
+        n = insert(con, interval_items(octaves))
+        n += insert(con, chord_items(octaves))
+        if Path(args.scales_template).exists():
+            n += insert(con, scale_bar_items(args.scales_template, args.scale_samples, alters, args.scale_max_altered, args.seed))
+        con.execute("ANALYZE")
+        print(f"Item bank {args.db}: {n} items")
+        return
+
+    rng = random.Random(args.seed)
+    band = tuple(float(x) for x in args.difficulty.split("-", 1)) if args.difficulty else None
+    tree = ET.parse(args.input); root = tree.getroot()
+    where = parse_where(args.where)
+    if args.section == "intervals":
+        n = fill_intervals(con, root, where, rng, band)
+    elif args.section == "chords":
+        n = fill_chords(con, root, where, rng, band)
+    else:
+        n = fill_scales(con, root, where, rng, args.input, band)
+    if n == 0:
+        print("No bank items match; nothing written.", file=sys.stderr)
+        sys.exit(1)
+    write_tree(tree, args.output)
+    print(f"Filled {n} {args.section} slot(s) from {args.db}. Wrote {args.output}")
+
+if __name__ == "__main__":
+    main()
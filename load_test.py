@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Sustained-throughput check for serve.py: N requests from C concurrent clients, random seeds/sections.
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def fetch(url, timeout):
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            size = len(r.read()); status = r.status
+    except urllib.error.HTTPError as e:
+        size, status = 0, e.code
+    except Exception:
+        size, status = 0, None
+    return status, size, time.perf_counter() - t0
+
+def percentile(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))] if xs else 0.0
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure sustained throughput and latency of a running serve.py.")
+    ap.add_argument("--url", default="http://127.0.0.1:8765")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--endpoint", default="generate", choices=["generate", "bundle"])
+    ap.add_argument("--profiles", default=None, help="Comma list to sample from (default: all the server reports)")
+    ap.add_argument("--seed", type=int, default=0, help="Seed for the request mix")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    args = ap.parse_args()
+
+    with urllib.request.urlopen(args.url + "/health", timeout=args.timeout) as r:
+        health = json.load(r)
+    profiles = args.profiles.split(",") if args.profiles is not None else [""] + health["profiles"]
+    rng = random.Random(args.seed)
+    urls = []
+    for _ in range(args.requests):
+        q = f"profile={rng.choice(profiles)}&seed={rng.randrange(1_000_000)}"
+        if args.endpoint == "generate":
+            q += f"&section={rng.choice(health['sections'])}"
+        urls.append(f"{args.url}/{args.endpoint}?{q}")
+
+    lat, statuses, nbytes = [], {}, 0
+    lock = threading.Lock()
+    def one(url):
+        nonlocal nbytes
+        status, size, dt = fetch(url, args.timeout)
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            nbytes += size
+            if status == 200:
+                lat.append(dt)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, urls))
+    wall = time.perf_counter() - t0
+
+    print(f"{args.requests} {args.endpoint} request(s), concurrency {args.concurrency}, "
+          f"server {health['workers']} worker(s) / {health['max_inflight']} in flight")
+    print(f"  status: {', '.join(f'{k}: {v}' for k, v in sorted(statuses.items(), key=str))}")
+    print(f"  throughput: {len(lat) / wall:.1f} ok req/s, {nbytes / wall / 1e6:.2f} MB/s over {wall:.1f}s")
+    if lat:
+        print(f"  latency: p50 {percentile(lat, 50) * 1e3:.0f} ms, p95 {percentile(lat, 95) * 1e3:.0f} ms, "
+              f"max {max(lat) * 1e3:.0f} ms")
+
+if __name__ == "__main__":
+    main()
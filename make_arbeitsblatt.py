@@ -3,56 +3,78 @@
 import argparse
 import xml.etree.ElementTree as ET
 
+from musicxml_utils import write_tree, read_tree, Overlay
+
+# Every mode records its edits in an Overlay instead of changing the tree, so one parsed Übungsblatt can be written
+# as several sheets (see write_outputs); apply_mode() applies them in place for single-output callers.
+
 def save(tree, path):
-    tree.write(path, encoding="utf-8", xml_declaration=True)
+    write_tree(tree, path)
+
+def _accidental_text(alt):
+    try:
+        a = int(float(str(alt).strip()))
+    except Exception:
+        return None
+    return {-2:"flat-flat", -1:"flat", 0:"natural", 1:"sharp", 2:"sharp-sharp"}.get(a)
 
 # ----- Scales: hide *all* accidentals (keep playback) -----
-def scales_hide(root):
+def scales_hide(root, ov):
     """Make all accidentals invisible. If a pitch has <alter> but no <accidental>, add an invisible one."""
-    def accidental_text_from_alter(alt):
-        try:
-            a = int(float(str(alt).strip()))
-        except Exception:
-            return None
-        return {-2:"flat-flat", -1:"flat", 0:"natural", 1:"sharp", 2:"sharp-sharp"}.get(a)
-
     changed = 0
     for note in root.findall(".//note"):
         had = False
-        for acc in list(note.findall("accidental")):
-            acc.set("print-object", "no"); had = True; changed += 1
+        for acc in note.findall("accidental"):
+            ov.set(acc, "print-object", "no"); had = True; changed += 1
         if not had:
             p = note.find("pitch")
             if p is not None:
                 alt = p.find("alter")
                 if alt is not None and (alt.text or "").strip() != "":
-                    txt = accidental_text_from_alter(alt.text)
+                    txt = _accidental_text(alt.text)
                     if txt is not None and txt != "natural":
-                        acc = ET.SubElement(note, "accidental", {"print-object": "no"})
-                        acc.text = txt; changed += 1
+                        acc = ET.Element("accidental", {"print-object": "no"})
+                        acc.text = txt; ov.insert(note, acc); changed += 1
     return changed
 
-def scales_delete(root):
+def scales_delete(root, ov):
     # Not meaningful; behave same as hide.
-    return scales_hide(root)
+    return scales_hide(root, ov)
+
+def scales_solution(root, ov):
+    """Lösungsblatt: print the hidden scale notes and their accidentals."""
+    shown = 0
+    for note in root.findall(".//note[pitch]"):
+        if note.get("print-object") == "no":
+            ov.set(note, "print-object", "yes"); shown += 1
+        accs = note.findall("accidental")
+        for acc in accs:
+            if acc.get("print-object") == "no":
+                ov.set(acc, "print-object", "yes")
+        txt = _accidental_text(note.findtext("pitch/alter") or 0)
+        if not accs and txt not in (None, "natural"):
+            acc = ET.Element("accidental"); acc.text = txt
+            later = [c for c in note if c.tag in ("time-modification", "stem", "notehead", "staff", "beam", "notations", "lyric")]
+            ov.insert(note, acc, before=later[0] if later else None)
+    return shown
 
 # ----- Intervals -----
-def intervals_hide(root):
+def intervals_hide(root, ov):
     hidden = 0
     for note in root.findall(".//note"):
         typ = (note.findtext("type") or "").strip().lower()
         if typ == "quarter":
-            note.set("print-object", "no"); hidden += 1
+            ov.set(note, "print-object", "no"); hidden += 1
     return hidden
 
-def intervals_delete(root):
+def intervals_delete(root, ov):
     removed = 0
     for part in root.findall("part"):
         for meas in part.findall("measure"):
-            for note in list(meas.findall("note")):
+            for note in meas.findall("note"):
                 typ = (note.findtext("type") or "").strip().lower()
                 if typ == "quarter":
-                    meas.remove(note); removed += 1
+                    ov.remove(meas, note); removed += 1
     return removed
 
 # ----- Chords -----
@@ -60,50 +82,50 @@ def _staff_num(note):
     s = note.findtext("staff")
     return int(s) if s and s.isdigit() else None
 
-def chords_hide(root):
+def chords_hide(root, ov):
     saw_staff = False; hidden = 0
     for note in root.findall(".//note"):
         sn = _staff_num(note)
         if sn is not None:
             saw_staff = True
             if sn == 1:
-                note.set("print-object", "no"); hidden += 1
+                ov.set(note, "print-object", "no"); hidden += 1
     if not saw_staff:
         for note in root.findall(".//note"):
             if note.find("chord") is not None:
-                note.set("print-object", "no"); hidden += 1
+                ov.set(note, "print-object", "no"); hidden += 1
     return hidden
 
-def chords_delete(root):
+def chords_delete(root, ov):
     saw_staff = False; removed = 0
     for part in root.findall("part"):
         for meas in part.findall("measure"):
-            for note in list(meas.findall("note")):
+            for note in meas.findall("note"):
                 sn = _staff_num(note)
                 if sn is not None:
                     saw_staff = True
                     if sn == 1:
-                        meas.remove(note); removed += 1
+                        ov.remove(meas, note); removed += 1
     if not saw_staff:
         for part in root.findall("part"):
             for meas in part.findall("measure"):
-                for note in list(meas.findall("note")):
+                for note in meas.findall("note"):
                     if note.find("chord") is not None:
-                        meas.remove(note); removed += 1
+                        ov.remove(meas, note); removed += 1
     return removed
 
 # ----- Rhythms -----
-def _strip_visual_children(note):
+def _strip_visual_children(note, ov):
     for tag in ["beam","flag","stem","notehead","accidental","dot"]:
-        for el in list(note.findall(tag)):
-            note.remove(el)
-    for el in list(note.findall("tie")):
-        note.remove(el)
+        for el in note.findall(tag):
+            ov.remove(note, el)
+    for el in note.findall("tie"):
+        ov.remove(note, el)
     notations = note.find("notations")
     if notations is not None:
-        note.remove(notations)
+        ov.remove(note, notations)
 
-def rhythms_hide(root):
+def rhythms_hide(root, ov):
     """
     Render nothing in rhythm Arbeitsblatt:
       - Remove all <backup> (no multi-voice rewinds).
@@ -113,53 +135,177 @@ def rhythms_hide(root):
     for part in root.findall("part"):
         for meas in part.findall("measure"):
             # Remove any voice rewinds to avoid corrupt timing
-            for b in list(meas.findall("backup")):
-                meas.remove(b)
+            for b in meas.findall("backup"):
+                ov.remove(meas, b)
 
             # Replace notes with forward (same duration)
-            for note in list(meas.findall("note")):
+            for note in meas.findall("note"):
                 dur_el = note.find("duration")
                 fwd = ET.Element("forward")
                 d = ET.SubElement(fwd, "duration")
                 # Use the note's duration if present; fallback to '1'
                 d.text = (dur_el.text if dur_el is not None and (dur_el.text or "").strip() else "1")
-                idx = list(meas).index(note)
-                meas.insert(idx, fwd)
-                meas.remove(note)
+                ov.replace(meas, note, fwd)
                 changed += 1
     return changed
 
-def rhythms_delete(root):
+def rhythms_delete(root, ov):
     changed = 0
     for note in root.findall(".//note"):
         p = note.find("pitch")
         if p is not None:
-            note.remove(p)
+            ov.remove(note, p)
             if note.find("rest") is None:
-                ET.SubElement(note, "rest")
-            _strip_visual_children(note); changed += 1
+                ov.insert(note, ET.Element("rest"))
+            _strip_visual_children(note, ov); changed += 1
     return changed
 
+# ----- Melodies: keep the first/last/apex notes of each measure as anchors -----
+MELODY_ANCHORS = ("first", "last", "apex")
+
+def _melody_hidden(meas):
+    """Notes of the non-anchor attacks (tied continuations included) and the anchor notes of one measure."""
+    from generate_melodies import attack_groups
+    from musicxml_utils import anchor_indices, note_pitch, pitch_to_midi
+    groups = attack_groups(meas)
+    anchors = set(anchor_indices([pitch_to_midi(*note_pitch(g[0])) for g in groups], MELODY_ANCHORS))
+    hidden = [n for i, g in enumerate(groups) if i not in anchors for n in g]
+    kept = [n for i, g in enumerate(groups) if i in anchors for n in g]
+    return hidden, kept
+
+def melodies_hide(root, ov):
+    hidden = 0
+    for meas in root.iter("measure"):
+        for note in _melody_hidden(meas)[0]:
+            ov.set(note, "print-object", "no"); hidden += 1
+    return hidden
+
+def melodies_delete(root, ov):
+    """Non-anchor notes become <forward>s of equal duration; the anchors lose their (now dangling) beams."""
+    removed = 0
+    for meas in root.iter("measure"):
+        notes, kept = _melody_hidden(meas)
+        for note in notes:
+            fwd = ET.Element("forward")
+            ET.SubElement(fwd, "duration").text = note.findtext("duration") or "1"
+            ov.replace(meas, note, fwd); removed += 1
+        for note in kept:
+            for beam in note.findall("beam"):
+                ov.remove(note, beam)
+    return removed
+
 # ----- Dispatch -----
+ACTIONS = ("hide", "delete", "solution")
+MODES = {
+    ("scales", "hide"): scales_hide, ("scales", "delete"): scales_delete, ("scales", "solution"): scales_solution,
+    ("intervals", "hide"): intervals_hide, ("intervals", "delete"): intervals_delete,
+    ("chords", "hide"): chords_hide, ("chords", "delete"): chords_delete,
+    ("rhythms", "hide"): rhythms_hide, ("rhythms", "delete"): rhythms_delete,
+    ("melodies", "hide"): melodies_hide, ("melodies", "delete"): melodies_delete,
+}
+PAGES = ("scales", "intervals", "chords", "rhythms", "melodies")
+
+def overlay_for(root, page, action):
+    """(Overlay, number of changed elements) for one page/action, recorded against the untouched tree.
+    'solution' is the Übungsblatt itself except for scales, whose hidden notes it prints."""
+    if page not in PAGES or action not in ACTIONS:
+        raise ValueError("unknown page" )
+    ov = Overlay()
+    fn = MODES.get((page, action))
+    return ov, (fn(root, ov) if fn else 0)
+
 def apply_mode(root, page, action):
-    if page == "scales": return (scales_hide if action=="hide" else scales_delete)(root)
-    if page == "intervals": return (intervals_hide if action=="hide" else intervals_delete)(root)
-    if page == "chords": return (chords_hide if action=="hide" else chords_delete)(root)
-    if page == "rhythms": return (rhythms_hide if action=="hide" else rhythms_delete)(root)
-    raise ValueError("unknown page" )
+    ov, n = overlay_for(root, page, action)
+    ov.apply()
+    return n
 
-def main():
+def write_outputs(tree, page, outputs):
+    """Write [(action, path), ...] from one parsed tree: every action's overlay is applied only while writing."""
+    root = tree.getroot()
+    overlays = [(action, path) + overlay_for(root, page, action) for action, path in outputs]  # all recorded on the original
+    for action, path, ov, _ in overlays:
+        with ov.applied():
+            save(tree, path)
+    return [(action, path, n) for action, path, _, n in overlays]
+
+# ----- Answer key (from the Übungsblatt, before hiding) -----
+def _name(step, alter, octave):
+    return f"{step}{'#' * alter if alter > 0 else 'b' * -alter}{octave}"
+
+def _rhythm_name(note):
+    """e.g. 'dotted eighth', 'triplet 16th', 'rest quarter', 'half tied' (tied into the next note)."""
+    words = ["rest"] if note.find("rest") is not None else []
+    words += ["dotted"] * len(note.findall("dot"))
+    tm = note.find("time-modification")
+    if tm is not None:
+        actual, normal = tm.findtext("actual-notes", "").strip(), tm.findtext("normal-notes", "").strip()
+        words.append("triplet" if (actual, normal) == ("3", "2") else f"{actual}:{normal}")
+    words.append(note.findtext("type") or "?")
+    if note.find("tie[@type='start']") is not None:
+        words.append("tied")
+    return " ".join(words)
+
+def answer_key(root, page):
+    """One line per measure that holds an exercise item, e.g. 'm. 3: C4 -> A4 M6 up'."""
+    from musicxml_utils import note_pitch
+    lines = []
+    for pi, part in enumerate(root.findall("part")):
+        for mi, meas in enumerate(part.findall("measure")):
+            items = []
+            if page == "intervals":
+                from generate_intervals import collect_events, pair_whole_with_quarter, classify_interval
+                for b, t in pair_whole_with_quarter(collect_events(meas)):
+                    ivl, direc = classify_interval(b["pitch"], t["pitch"])
+                    (bs, bo, ba), (ts, to, ta) = b["pitch"], t["pitch"]
+                    items.append(f"{_name(bs, ba, bo)} -> {_name(ts, ta, to)} {ivl or '?'} {direc}")
+            elif page == "chords":
+                from generate_chords import chord_groups, classify_chord
+                for g in chord_groups(meas):
+                    c = classify_chord([note_pitch(n) for n in g]) if len(g) > 2 else None
+                    if c:
+                        items.append(f"{_name(c[0], c[1], '').strip()} {c[2]} {c[3]}")
+            elif page == "scales":
+                altered = [note_pitch(n) for n in meas.findall(".//note[pitch]")
+                           if n.get("print-object") == "no" and note_pitch(n)[1]]
+                if altered:
+                    items.append(", ".join(_name(*p) for p in altered))
+            elif page == "rhythms":
+                notes = [_rhythm_name(n) for n in meas.findall("note") if n.find("chord") is None and n.find("grace") is None]
+                if notes:
+                    items.append(" | ".join(notes))
+            elif page == "melodies":
+                from generate_melodies import attack_groups
+                notes = [_name(*note_pitch(g[0])) for g in attack_groups(meas)]
+                if notes:
+                    items.append(" ".join(notes))
+            if items:
+                lines.append(f"{'part ' + str(pi + 1) + ' ' if pi else ''}m. {mi + 1}: " + "; ".join(items))
+    return lines
+
+def main(argv=None):
     ap = argparse.ArgumentParser(description="Create worksheet/Arbeitsblatt variants (hide or delete)." )
-    ap.add_argument("--mode", required=True, choices=["scales","intervals","chords","rhythms"])
-    ap.add_argument("--action", default="hide", choices=["hide","delete"])
+    ap.add_argument("--mode", required=True, choices=list(PAGES))
+    ap.add_argument("--action", default="hide", choices=list(ACTIONS), help="solution: the Lösungsblatt (answers printed)")
     ap.add_argument("--input", required=True)
     ap.add_argument("--output", required=True)
-    args = ap.parse_args()
+    ap.add_argument("--also", action="append", default=[], metavar="ACTION=PATH",
+                    help="Write another variant from the same parse, e.g. --also delete=ab_delete.musicxml (repeatable)")
+    ap.add_argument("--answers", default=None, help="Also write a plain-text answer key to this path")
+    args = ap.parse_args(argv)
+
+    outputs = [(args.action, args.output)]
+    for spec in args.also:
+        action, _, path = spec.partition("=")
+        if action not in ACTIONS or not path:
+            ap.error(f"--also expects ACTION=PATH with ACTION in {','.join(ACTIONS)}")
+        outputs.append((action, path))
 
-    tree = ET.parse(args.input); root = tree.getroot()
-    n = apply_mode(root, args.mode, args.action)
-    save(tree, args.output)
-    print(f"Arbeitsblatt ({args.mode}, {args.action}): changed {n} elements. Wrote {args.output}")
+    tree = read_tree(args.input); root = tree.getroot()
+    if args.answers:
+        with open(args.answers, "w", encoding="utf-8") as f:
+            f.write("\n".join(answer_key(root, args.mode)) + "\n")
+    for action, path, n in write_outputs(tree, args.mode, outputs):
+        print(f"Arbeitsblatt ({args.mode}, {action}): changed {n} elements. Wrote {path}")
 
 if __name__ == "__main__":
     main()
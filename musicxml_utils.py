@@ -1,4 +1,10 @@
 
+import contextlib
+import copy
+import hashlib
+import io
+import os
+import random
 import xml.etree.ElementTree as ET
 from typing import List, Tuple, Optional
 
@@ -87,6 +93,16 @@ def note_pitch(note:ET.Element):
     octave = int(p.findtext("octave"))
     return step, alter, octave
 
+def is_hidden(el:Optional[ET.Element])->bool:
+    """True for an element with print-object="no"."""
+    return el is not None and (el.get("print-object") or "").strip().lower() == "no"
+
+def to_int(text, default:int=0)->int:
+    try:
+        return int(str(text).strip())
+    except (TypeError, ValueError):
+        return default
+
 def set_note_pitch(note:ET.Element, step:str, alter:int, octave:int):
     p = note.find("pitch")
     if p is None:
@@ -160,5 +176,411 @@ def extract_section_as_new_score(root:ET.Element, start:int, end:Optional[int])-
             new_part.append(m_copy)
     return ET.ElementTree(new_root)
 
+_CAPTURED = None
+
+@contextlib.contextmanager
+def captured_outputs():
+    """Inside the block write_tree() keeps files as bytes in the yielded dict (keyed by path) and read_tree() reads them back."""
+    global _CAPTURED
+    prev, _CAPTURED = _CAPTURED, {}
+    try:
+        yield _CAPTURED
+    finally:
+        _CAPTURED = prev
+
 def write_tree(tree:ET.ElementTree, path:str):
+    if _CAPTURED is not None:
+        buf = io.BytesIO()
+        tree.write(buf, encoding="utf-8", xml_declaration=True)
+        _CAPTURED[str(path)] = buf.getvalue()
+        return
     tree.write(path, encoding="utf-8", xml_declaration=True)
+
+def read_tree(path:str)->ET.ElementTree:
+    if _CAPTURED is not None and str(path) in _CAPTURED:
+        return ET.parse(io.BytesIO(_CAPTURED[str(path)]))
+    return ET.parse(path)
+
+class Overlay:
+    """Edits to a shared tree, recorded instead of applied: attribute sets, removed and inserted children.
+    Any number of overlays can be recorded against one unmodified tree; applied() patches the tree only while
+    the block runs (e.g. one write_tree) and restores it exactly afterwards."""
+    def __init__(self):
+        self.ops = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def set(self, el:ET.Element, key:str, value:str):
+        self.ops.append(("set", el, key, value))
+
+    def remove(self, parent:ET.Element, el:ET.Element):
+        self.ops.append(("remove", parent, el))
+
+    def insert(self, parent:ET.Element, el:ET.Element, before:Optional[ET.Element]=None):
+        """Insert el before the child `before` (append when None)."""
+        self.ops.append(("insert", parent, el, before))
+
+    def replace(self, parent:ET.Element, old:ET.Element, new:ET.Element):
+        self.insert(parent, new, before=old)
+        self.remove(parent, old)
+
+    def apply(self)->list:
+        """Apply the edits to the tree; returns the undo log for revert()."""
+        undo = []
+        for op in self.ops:
+            if op[0] == "set":
+                _, el, key, value = op
+                undo.append(("set", el, key, el.get(key)))
+                el.set(key, value)
+            elif op[0] == "remove":
+                _, parent, el = op
+                undo.append(("insert", parent, el, list(parent).index(el)))
+                parent.remove(el)
+            else:
+                _, parent, el, before = op
+                parent.insert(list(parent).index(before) if before is not None else len(parent), el)
+                undo.append(("remove", parent, el))
+        return undo
+
+    @staticmethod
+    def revert(undo:list):
+        for op in reversed(undo):
+            if op[0] == "set":
+                _, el, key, old = op
+                if old is None:
+                    el.attrib.pop(key, None)
+                else:
+                    el.set(key, old)
+            elif op[0] == "insert":
+                _, parent, el, index = op
+                parent.insert(index, el)
+            else:
+                op[1].remove(op[2])
+
+    @contextlib.contextmanager
+    def applied(self):
+        undo = self.apply()
+        try:
+            yield
+        finally:
+            self.revert(undo)
+
+def anchor_indices(midis, anchor_kinds):
+    """Indices of the first/last/apex notes of one measure given its MIDI pitches (de-duplicated, in that order)."""
+    if not midis:
+        return []
+    selected = []
+    if "first" in anchor_kinds: selected.append(0)
+    if "last"  in anchor_kinds: selected.append(len(midis) - 1)
+    if "apex"  in anchor_kinds: selected.append(max(range(len(midis)), key=midis.__getitem__))
+    return list(dict.fromkeys(selected))
+
+def build_alias_table(weights:List[float])->Tuple[List[float],List[int]]:
+    """Vose alias table for O(1) weighted draws with alias_draw()."""
+    n = len(weights)
+    total = float(sum(weights))
+    if n == 0 or total <= 0:
+        raise ValueError("alias table needs at least one positive weight")
+    prob = [w*n/total for w in weights]
+    alias = [0]*n
+    small = [i for i,p in enumerate(prob) if p < 1.0]
+    large = [i for i,p in enumerate(prob) if p >= 1.0]
+    while small and large:
+        s = small.pop(); l = large.pop()
+        alias[s] = l
+        prob[l] = prob[l] + prob[s] - 1.0
+        (small if prob[l] < 1.0 else large).append(l)
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+def alias_draw(table:Tuple[List[float],List[int]], rng=None)->int:
+    rng = rng or random
+    prob, alias = table
+    i = int(rng.random()*len(prob))
+    return i if rng.random() < prob[i] else alias[i]
+
+def measure_seed(seed:int, section:str, part_index:int, measure_index:int, salt:int=0)->int:
+    """Stable per-measure seed so one measure can be re-rolled without moving any other."""
+    key = f"{seed}:{section}:{part_index}:{measure_index}:{salt}".encode("utf-8")
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big")
+
+def measure_rng(seed:Optional[int], section:str, part_index:int, measure_index:int, salt:int=0)->random.Random:
+    if seed is None:
+        return random.Random()
+    return random.Random(measure_seed(seed, section, part_index, measure_index, salt))
+
+def parse_measure_range(spec:Optional[str])->Optional[Tuple[int,int]]:
+    """'3-5' or '7' (1-based, inclusive) -> (start, end) as 0-based half-open measure positions."""
+    if not spec:
+        return None
+    lo, _, hi = spec.partition("-")
+    lo = int(lo); hi = int(hi) if hi.strip() else lo
+    if lo < 1 or hi < lo:
+        raise ValueError(f"bad measure range: {spec!r}")
+    return lo-1, hi
+
+def in_range(rng:Optional[Tuple[int,int]], measure_index:int)->bool:
+    return rng is None or rng[0] <= measure_index < rng[1]
+
+def splice_measures(base_root:ET.Element, template_root:ET.Element, rng:Tuple[int,int]):
+    """Replace measures rng[0]..rng[1]-1 of every part in base_root with fresh copies from the template.
+    Returns [(part_index, measure_index, old_measure, new_measure)]."""
+    out = []
+    tparts = template_root.findall("part")
+    for pi, part in enumerate(base_root.findall("part")):
+        if pi >= len(tparts):
+            break
+        tmeas = tparts[pi].findall("measure")
+        for mi, meas in enumerate(part.findall("measure")):
+            if not in_range(rng, mi) or mi >= len(tmeas):
+                continue
+            new = _deepcopy(tmeas[mi])
+            idx = list(part).index(meas)
+            part.remove(meas); part.insert(idx, new)
+            out.append((pi, mi, meas, new))
+    return out
+
+_TEMPLATES = {}
+
+def warm_templates(paths)->int:
+    """Keep parsed templates resident; parse_template() then hands out copies instead of re-reading the file."""
+    for p in paths:
+        _TEMPLATES[os.path.realpath(p)] = ET.parse(p).getroot()
+    return len(_TEMPLATES)
+
+def parse_template(path:str)->ET.ElementTree:
+    root = _TEMPLATES.get(os.path.realpath(path))
+    if root is None:
+        return ET.parse(path)
+    return ET.ElementTree(copy.deepcopy(root))
+
+def load_for_regeneration(input_path:str, base_path:Optional[str], measures:Optional[str]):
+    """Parse the template; with a base output, splice the template's measures in range into it.
+    Returns (tree, measure_range, spliced)."""
+    tree = parse_template(input_path)
+    rng = parse_measure_range(measures)
+    if not base_path:
+        return tree, rng, []
+    if rng is None:
+        raise ValueError("--base needs --measures")
+    base = read_tree(base_path)
+    spliced = splice_measures(base.getroot(), tree.getroot(), rng)
+    return base, rng, spliced
+
+# ---------- ScoreMatrix: notes as NumPy columns for analytics (numpy is imported on first use only) ----------
+
+STEP_INDEX = {s: i for i, s in enumerate("CDEFGAB")}
+NOTE_COLUMNS = (("midi","int16"), ("step","int8"), ("alter","int8"), ("octave","int8"), ("onset","float64"),
+                ("offset","float64"), ("duration","float64"), ("voice","int16"), ("staff","int8"), ("part","int16"),
+                ("measure","int32"), ("visible","bool"), ("accidental","int8"), ("rest","bool"), ("chord","bool"),
+                ("file","int32"))
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("ScoreMatrix needs numpy: pip install numpy") from None
+    return numpy
+
+def score_columns(root:ET.Element)->dict:
+    """{column: list} with one entry per <note> in document order (see ScoreMatrix)."""
+    cols = {name: [] for name, _ in NOTE_COLUMNS}
+    for pi, part in enumerate(root.findall("part")):
+        divisions, start = 1, 0.0
+        for mi, meas in enumerate(part.findall("measure")):
+            at = meas.find("attributes/divisions")
+            if at is not None:
+                divisions = to_int(at.text, divisions) or 1
+            cursor = end = prev = 0
+            for el in meas:
+                if el.tag == "note":
+                    dur = to_int(el.findtext("duration"))
+                    chord = el.find("chord") is not None
+                    onset = prev if chord else cursor
+                    p = el.find("pitch")
+                    if p is None:
+                        p = el.find("unpitched")
+                        step, octave = (p.findtext("display-step"), p.findtext("display-octave")) if p is not None else (None, None)
+                        alter = 0
+                    else:
+                        step, octave, alter = p.findtext("step"), p.findtext("octave"), to_int(p.findtext("alter"))
+                    step = (step or "").strip()
+                    pitched = step in STEP_INDEX
+                    acc = el.find("accidental")
+                    cols["midi"].append(pitch_to_midi(step, alter, to_int(octave, 4)) if pitched else -1)
+                    cols["step"].append(STEP_INDEX[step] if pitched else -1)
+                    cols["alter"].append(alter)
+                    cols["octave"].append(to_int(octave, 0) if pitched else 0)
+                    cols["onset"].append(start + onset / divisions)
+                    cols["offset"].append(onset / divisions)
+                    cols["duration"].append(dur / divisions)
+                    cols["voice"].append(to_int(el.findtext("voice"), 1))
+                    cols["staff"].append(to_int(el.findtext("staff"), 1))
+                    cols["part"].append(pi)
+                    cols["measure"].append(mi)
+                    cols["visible"].append(not is_hidden(el))
+                    cols["accidental"].append(0 if acc is None else -1 if is_hidden(acc) else 1)
+                    cols["rest"].append(el.find("rest") is not None)
+                    cols["chord"].append(chord)
+                    cols["file"].append(0)
+                    if not chord and el.find("grace") is None:
+                        prev = cursor; cursor += dur
+                elif el.tag == "forward":
+                    cursor += to_int(el.findtext("duration"))
+                elif el.tag == "backup":
+                    cursor = max(0, cursor - to_int(el.findtext("duration")))
+                end = max(end, cursor)
+            start += end / divisions
+    return cols
+
+def _file_columns(path:str)->dict:
+    """Worker for ScoreMatrix.load_dir: one file's columns as arrays (cheap to pickle)."""
+    np = _numpy()
+    cols = score_columns(ET.parse(path).getroot())
+    return {name: np.asarray(cols[name], dtype=dt) for name, dt in NOTE_COLUMNS}
+
+def musicxml_files(directory:str)->List[str]:
+    out = []
+    for dirpath, _, files in os.walk(directory):
+        out += [os.path.join(dirpath, f) for f in files if f.lower().endswith((".musicxml", ".music.xml"))]
+    return sorted(out)
+
+class ScoreMatrix:
+    """Every <note> of one or more scores as NumPy columns (attributes named as in NOTE_COLUMNS).
+
+    midi/step are -1 for rests; alter is the written <alter>; onset counts quarter notes from the start of the
+    part and offset from the start of the measure; part/measure are 0-based; visible is False for
+    print-object="no"; accidental is 0 without an <accidental>, 1 printed, -1 hidden; file indexes self.files.
+    """
+    def __init__(self, columns:dict, files:List[str]):
+        np = _numpy()
+        self.files = list(files)
+        self.columns = {name: np.asarray(columns[name], dtype=dt) for name, dt in NOTE_COLUMNS}
+
+    def __getattr__(self, name):
+        cols = self.__dict__.get("columns") or {}
+        if name in cols:
+            return cols[name]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return len(self.columns["midi"])
+
+    @classmethod
+    def from_root(cls, root:ET.Element, name:str="")->"ScoreMatrix":
+        return cls(score_columns(root), [name])
+
+    @classmethod
+    def from_file(cls, path:str)->"ScoreMatrix":
+        return cls(score_columns(read_tree(path).getroot()), [str(path)])
+
+    @classmethod
+    def concat(cls, matrices)->"ScoreMatrix":
+        np = _numpy()
+        parts, files = {name: [] for name, _ in NOTE_COLUMNS}, []
+        for m in matrices:
+            for name, _ in NOTE_COLUMNS:
+                parts[name].append(m.columns[name] + len(files) if name == "file" else m.columns[name])
+            files += m.files
+        return cls({name: np.concatenate(v) if v else [] for name, v in parts.items()}, files)
+
+    @classmethod
+    def load_dir(cls, directory:str, workers:Optional[int]=None, cache:Optional[str]=None)->"ScoreMatrix":
+        """All MusicXML files under directory, parsed in a process pool. With cache (an .npz path) the arrays are
+        reused while no file was added, removed or modified since they were saved."""
+        np = _numpy()
+        files = musicxml_files(directory)
+        sig = hashlib.sha1("\n".join(f"{os.path.relpath(f, directory)}:{os.stat(f).st_size}:{os.stat(f).st_mtime_ns}"
+                                     for f in files).encode("utf-8")).hexdigest()
+        if cache and not str(cache).endswith(".npz"):
+            cache = str(cache) + ".npz"  # savez_compressed appends it; check the same file we save
+        if cache and os.path.exists(cache):
+            with np.load(cache, allow_pickle=False) as z:
+                if str(z["signature"]) == sig:
+                    return cls({name: z["col_" + name] for name, _ in NOTE_COLUMNS}, [str(f) for f in z["files"]])
+        if workers == 1 or len(files) < 8:
+            per_file = [_file_columns(f) for f in files]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                per_file = list(pool.map(_file_columns, files, chunksize=max(1, len(files) // (4 * (workers or os.cpu_count() or 1)))))
+        m = cls.concat([cls(cols, [f]) for cols, f in zip(per_file, files)]) if files else cls({n: [] for n, _ in NOTE_COLUMNS}, [])
+        if cache:
+            np.savez_compressed(cache, signature=np.array(sig), files=np.array(m.files, dtype=str),
+                                **{"col_" + name: col for name, col in m.columns.items()})
+        return m
+
+    # --- vectorized queries; mask arguments are boolean arrays over the rows ---
+
+    def mask(self, **where):
+        """Rows whose columns equal the given values (a list/tuple/set matches any of them)."""
+        np = _numpy()
+        out = np.ones(len(self), dtype=bool)
+        for name, value in where.items():
+            col = self.columns[name]
+            out &= np.isin(col, list(value)) if isinstance(value, (list, tuple, set)) else col == value
+        return out
+
+    def pitched(self):
+        return self.columns["midi"] >= 0
+
+    def subset(self, mask)->"ScoreMatrix":
+        return ScoreMatrix({name: col[mask] for name, col in self.columns.items()}, self.files)
+
+    def histogram(self, column:str, mask=None)->dict:
+        np = _numpy()
+        col = self.columns[column] if mask is None else self.columns[column][mask]
+        values, counts = np.unique(col, return_counts=True)
+        return {v.item(): int(c) for v, c in zip(values, counts)}
+
+    def _groups(self, keys, mask):
+        """(sorted row indices, group start positions) for rows in mask grouped by the given columns."""
+        np = _numpy()
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return rows, rows
+        order = rows[np.lexsort([self.columns[k][rows] for k in reversed(keys)])]
+        change = np.zeros(len(order), dtype=bool); change[0] = True
+        for k in keys:
+            col = self.columns[k][order]
+            change[1:] |= col[1:] != col[:-1]
+        return order, np.flatnonzero(change)
+
+    def harmonic_intervals(self, mask=None):
+        """Semitones between the lowest and highest pitch sounding at each onset (file, part, measure)."""
+        np = _numpy()
+        sel = self.pitched() if mask is None else self.pitched() & mask
+        order, starts = self._groups(("file", "part", "onset"), sel)
+        if not len(order):
+            return np.zeros(0, dtype=np.int16)
+        midi = self.columns["midi"][order]
+        sizes = np.diff(np.append(starts, len(order)))
+        spans = np.maximum.reduceat(midi, starts) - np.minimum.reduceat(midi, starts)
+        return spans[sizes > 1]
+
+    def melodic_intervals(self, mask=None):
+        """Signed semitones between consecutive notes of each voice (chord tones skipped, rests ignored).
+        The grouping sort is stable, so rows stay in document order, which is time order within a voice."""
+        np = _numpy()
+        sel = self.pitched() & ~self.columns["chord"]
+        sel = sel if mask is None else sel & mask
+        order, starts = self._groups(("file", "part", "staff", "voice"), sel)
+        if len(order) < 2:
+            return np.zeros(0, dtype=np.int16)
+        midi = self.columns["midi"][order]
+        same = np.ones(len(order) - 1, dtype=bool)
+        same[starts[1:] - 1] = False
+        return (midi[1:] - midi[:-1])[same]
+
+    def pitch_range(self, by:str="file", mask=None)->dict:
+        """{group value: (lowest midi, highest midi)} over pitched rows."""
+        np = _numpy()
+        sel = self.pitched() if mask is None else self.pitched() & mask
+        order, starts = self._groups((by,), sel)
+        if not len(order):
+            return {}
+        midi = self.columns["midi"][order]
+        lo, hi = np.minimum.reduceat(midi, starts), np.maximum.reduceat(midi, starts)
+        return {k.item(): (int(a), int(b)) for k, a, b in zip(self.columns[by][order][starts], lo, hi)}
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# Content-addressed output store: every generated file lives once under OUTDIR/.store/<sha256>, written to a temp
+# name and renamed into place; the readable names in OUTDIR are hard links (or symlinks, or copies) swapped in
+# atomically; each run records exactly what it produced in OUTDIR/.runs/<run>.json.
+# Concurrent runs never see half-written files, and unchanged outputs cost no writes.
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+class OutputStore:
+    def __init__(self, outdir):
+        self.outdir = Path(outdir)
+        self.objects = self.outdir / ".store"
+        self.runs = self.outdir / ".runs"
+
+    def _tmp(self, path: Path) -> Path:
+        return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    def object_path(self, digest: str, suffix: str) -> Path:
+        return self.objects / digest[:2] / (digest + suffix)
+
+    def put(self, data: bytes, suffix: str = "") -> tuple:
+        """Store data under its hash; returns (digest, object path, newly written)."""
+        digest = hashlib.sha256(data).hexdigest()
+        obj = self.object_path(digest, suffix)
+        try:
+            with open(obj, "rb") as f:  # a linked name may have been edited in place: trust the bytes, not the name
+                if hashlib.sha256(f.read()).hexdigest() == digest:
+                    return digest, obj, False
+        except OSError:
+            pass
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp(obj)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, obj)
+        return digest, obj, True
+
+    def link(self, name: str, obj: Path) -> bool:
+        """Point OUTDIR/name at obj; False when it already does."""
+        dest = self.outdir / name
+        try:
+            if os.path.samefile(dest, obj):
+                return False
+        except OSError:
+            pass
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp(dest)
+        try:
+            os.link(obj, tmp)
+        except OSError:  # no hard links here (e.g. some network/FAT drives)
+            try:
+                os.symlink(os.path.relpath(obj, dest.parent), tmp)
+            except OSError:
+                shutil.copyfile(obj, tmp)
+        os.replace(tmp, dest)
+        return True
+
+    def publish(self, name: str, data: bytes, **meta) -> dict:
+        """put() + link(); returns the manifest entry."""
+        digest, obj, new = self.put(data, Path(name).suffix)
+        relinked = self.link(name, obj)
+        return dict(name=name, sha256=digest, size=len(data), written=new, relinked=relinked, **meta)
+
+    def run_manifests(self) -> list:
+        return sorted(self.runs.glob("*.json")) if self.runs.is_dir() else []
+
+    def _load(self, path: Path) -> dict:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def commit_run(self, entries: list, partial: bool = False, **meta) -> Path:
+        """Write this run's manifest. Unless partial, names the previous run produced but this one did not are removed
+        from OUTDIR, if nothing else has replaced them since (the store keeps their content either way)."""
+        previous = self.run_manifests()
+        if previous and not partial:
+            produced = {e["name"] for e in entries}
+            for e in self._load(previous[-1]).get("files", []):
+                dest = self.outdir / e["name"]
+                try:
+                    if e["name"] not in produced and os.path.samefile(dest, self.object_path(e["sha256"], Path(e["name"]).suffix)):
+                        dest.unlink()
+                except OSError:
+                    pass
+        self.runs.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        path = self.runs / f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1e6):06d}-{os.getpid()}.json"
+        tmp = self._tmp(path)
+        tmp.write_text(json.dumps(dict(meta, partial=partial, files=entries), indent=1, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    def prune(self, keep_runs: int) -> tuple:
+        """Drop all but the newest keep_runs manifests and every object no kept manifest or OUTDIR name refers to.
+        Returns (manifests removed, objects removed). Not safe while another run is writing to the same OUTDIR."""
+        manifests = self.run_manifests()
+        old, kept = manifests[:max(0, len(manifests) - keep_runs)], manifests[max(0, len(manifests) - keep_runs):]
+        live = {e["sha256"] for m in kept for e in self._load(m).get("files", [])}
+        linked = set()  # (device, inode) of every file reachable under a readable name
+        for p in self.outdir.rglob("*"):
+            if self.objects not in p.parents and self.runs not in p.parents and p.is_file():
+                st = p.stat()
+                linked.add((st.st_dev, st.st_ino))
+        for m in old:
+            m.unlink()
+        removed = 0
+        for obj in self.objects.glob("*/*") if self.objects.is_dir() else []:
+            st = obj.stat()
+            if obj.name.split(".")[0] not in live and (st.st_dev, st.st_ino) not in linked:
+                obj.unlink()
+                removed += 1
+        return len(old), removed
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or prune the content-addressed store of an output folder.")
+    ap.add_argument("outdir", nargs="?", default="OUT")
+    ap.add_argument("--prune", type=int, default=None, metavar="N", help="Keep the newest N run manifests and the files they (or OUTDIR) use")
+    args = ap.parse_args()
+    store = OutputStore(args.outdir)
+    if args.prune is not None:
+        runs, objects = store.prune(args.prune)
+        print(f"Removed {runs} run manifest(s) and {objects} stored file(s)")
+    manifests = store.run_manifests()
+    n = sum(1 for _ in store.objects.glob("*/*")) if store.objects.is_dir() else 0
+    print(f"{args.outdir}: {n} stored file(s), {len(manifests)} run(s)" + (f", latest {manifests[-1].name}" if manifests else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,870 @@
+#!/usr/bin/env python3
+# MusicXML -> SVG / PDF for the notation the worksheet templates use: 1-2 staves per part, clefs, key and time
+# signatures, whole to 16th notes and rests, dots, chords, accidentals, ledger lines, beams, tuplet numbers, ties,
+# barlines, staff text and the title. Hidden objects (print-object="no") and <forward> gaps keep their space and
+# print nothing, so Arbeitsblätter come out blank where the students write.
+# Standard library only: every symbol is an outline in one atlas built once per process and referenced per use
+# (<use> in SVG, a shared form XObject in PDF), so a class set renders in seconds without fonts or a notation program.
+import argparse
+import math
+import sys
+import unicodedata
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import lru_cache
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from musicxml_utils import pitch_to_midi, read_tree, is_hidden, to_int
+from export_mscz import PartEvents, DIVISION, iter_inputs
+
+SP = 10.0  # tenths per staff space
+STEPS = "CDEFGAB"
+FLAGS = {"eighth": 1, "16th": 2, "32nd": 3}
+HEADS = {"breve": "noteheadWhole", "whole": "noteheadWhole", "half": "noteheadHalf"}
+HEAD_HALF_WIDTH = {"noteheadWhole": 8.2, "noteheadHalf": 6.0, "noteheadBlack": 6.0}
+RESTS = {"breve": "restWhole", "whole": "restWhole", "half": "restHalf", "quarter": "restQuarter",
+         "eighth": "rest8th", "16th": "rest16th", "32nd": "rest16th"}
+ACC_GLYPH = {-2: "accidentalDoubleFlat", -1: "accidentalFlat", 0: "accidentalNatural", 1: "accidentalSharp",
+             2: "accidentalDoubleSharp"}
+ACC_TEXT = {"sharp": 1, "flat": -1, "natural": 0, "double-sharp": 2, "sharp-sharp": 2, "flat-flat": -2}
+ACC_EXTENT = {"accidentalSharp": (-5, 5), "accidentalFlat": (-4, 6), "accidentalNatural": (-3, 3),
+              "accidentalDoubleSharp": (-4.5, 4.5), "accidentalDoubleFlat": (-7.5, 9)}
+SHARP_ORDER, FLAT_ORDER = "FCGDAEB", "BEADGCF"
+KEY_SHARPS = (38, 35, 39, 36, 33, 37, 34)  # treble-clef diatonic positions: F5 C5 G5 D5 A4 E5 B4
+KEY_FLATS = (34, 37, 33, 36, 32, 35, 31)   # B4 E5 A4 D5 G4 C5 F4
+LINE_WIDTHS = {"stem": 1.25, "beam": 5.0, "staff": 0.94, "light barline": 1.56, "heavy barline": 5.0, "leger": 1.56,
+               "enclosure": 1.56}
+STEM = 35.0
+FONTS = {"sans": ("F1", "Helvetica", 'font-family="Helvetica, Arial, sans-serif"'),
+         "bold": ("F2", "Times-Bold", 'font-family="Times New Roman, Times, serif" font-weight="bold"'),
+         "italic": ("F3", "Times-Italic", 'font-family="Times New Roman, Times, serif" font-style="italic"')}
+_HELVETICA = dict(zip(
+    " !\"#$%&'()*+,-./0123456789:;<=>?@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_`abcdefghijklmnopqrstuvwxyz{|}~",
+    [278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278] + [556] * 10
+    + [278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+       667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556, 333, 556, 556, 500, 556, 556,
+       278, 556, 556, 222, 222, 500, 222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334,
+       260, 334, 584]))
+
+# ---------- symbol atlas: outlines in staff spaces, y down, origin on the reference line ----------
+_K = 0.5523
+
+def _ellipse(cx, cy, rx, ry, deg=0.0):
+    c, s = math.cos(math.radians(deg)), math.sin(math.radians(deg))
+    pts = [(rx, 0), (rx, _K * ry), (_K * rx, ry), (0, ry), (-_K * rx, ry), (-rx, _K * ry), (-rx, 0),
+           (-rx, -_K * ry), (-_K * rx, -ry), (0, -ry), (_K * rx, -ry), (rx, -_K * ry), (rx, 0)]
+    pts = [(cx + x * c - y * s, cy + x * s + y * c) for x, y in pts]
+    return [("M", pts[0])] + [("C", pts[i], pts[i + 1], pts[i + 2]) for i in range(1, 13, 3)] + [("Z",)]
+
+def _poly(*pts):
+    return [("M", pts[0])] + [("L", p) for p in pts[1:]] + [("Z",)]
+
+def _smooth(*pts):
+    """Catmull-Rom curve through pts as cubic Béziers (open)."""
+    out = [("M", pts[0])]
+    for i in range(len(pts) - 1):
+        p0, p1, p2 = pts[max(0, i - 1)], pts[i], pts[i + 1]
+        p3 = pts[min(len(pts) - 1, i + 2)]
+        c1 = (p1[0] + (p2[0] - p0[0]) / 6, p1[1] + (p2[1] - p0[1]) / 6)
+        c2 = (p2[0] - (p3[0] - p1[0]) / 6, p2[1] - (p3[1] - p1[1]) / 6)
+        out.append(("C", c1, c2, p2))
+    return out
+
+def _shift(path, dx=0.0, dy=0.0):
+    return [(op,) + tuple((x + dx, y + dy) for x, y in pts) for op, *pts in path]
+
+def _bar(x0, x1, yc, rise, thick):
+    """Parallelogram from x0 to x1 centred on yc, rising by `rise` to the right."""
+    h = thick / 2
+    return _poly((x0, yc + rise / 2 + h), (x1, yc - rise / 2 + h), (x1, yc - rise / 2 - h), (x0, yc + rise / 2 - h))
+
+def _flat(dx=0.0):
+    bowl = [("M", (-0.3, 0.55)), ("C", (0.25, 0.2), (0.75, -0.25), (0.45, -0.55)),
+            ("C", (0.2, -0.8), (-0.15, -0.55), (-0.3, -0.3)), ("Z",),
+            ("M", (-0.3, 0.3)), ("C", (0.05, 0.05), (0.45, -0.3), (0.3, -0.45)),
+            ("C", (0.15, -0.6), (-0.1, -0.4), (-0.3, -0.15)), ("Z",)]
+    return [(_shift(_poly((-0.38, -1.8), (-0.27, -1.8), (-0.27, 0.55), (-0.38, 0.55)), dx), "fill"),
+            (_shift(bowl, dx), "fill")]
+
+def _flag(dy=0.0):
+    return _shift([("M", (0, 0)), ("L", (0.13, 0)), ("C", (0.25, 0.95), (1.3, 1.25), (0.95, 2.9)),
+                   ("C", (1.05, 1.95), (0.55, 1.45), (0, 1.35)), ("Z",)], 0, dy)
+
+@lru_cache(maxsize=None)
+def glyphs():
+    """{name: [(path, "fill" | stroke width), ...]}; each component is filled even-odd or stroked on its own."""
+    return {
+        "noteheadBlack": [(_ellipse(0, 0, 0.59, 0.42, -20), "fill")],
+        "noteheadHalf": [(_ellipse(0, 0, 0.59, 0.42, -20) + _ellipse(0, 0, 0.5, 0.2, -35), "fill")],
+        "noteheadWhole": [(_ellipse(0, 0, 0.8, 0.48) + _ellipse(0, 0, 0.4, 0.26, 55), "fill")],
+        "accidentalSharp": [(_poly((-0.3, -1.1), (-0.18, -1.1), (-0.18, 1.4), (-0.3, 1.4)), "fill"),
+                            (_poly((0.18, -1.4), (0.3, -1.4), (0.3, 1.1), (0.18, 1.1)), "fill"),
+                            (_bar(-0.5, 0.5, -0.45, 0.3, 0.28), "fill"), (_bar(-0.5, 0.5, 0.45, 0.3, 0.28), "fill")],
+        "accidentalNatural": [(_poly((-0.3, -1.3), (-0.2, -1.3), (-0.2, 0.55), (-0.3, 0.55)), "fill"),
+                              (_poly((0.2, -0.55), (0.3, -0.55), (0.3, 1.3), (0.2, 1.3)), "fill"),
+                              (_bar(-0.3, 0.3, -0.3, 0.15, 0.24), "fill"), (_bar(-0.3, 0.3, 0.3, 0.15, 0.24), "fill")],
+        "accidentalFlat": _flat(),
+        "accidentalDoubleFlat": _flat(-0.35) + _flat(0.3),
+        "accidentalDoubleSharp": [(_poly((-0.35, -0.35), (0.35, 0.35)), 0.16), (_poly((-0.35, 0.35), (0.35, -0.35)), 0.16)],
+        "augmentationDot": [(_ellipse(0, 0, 0.2, 0.2), "fill")],
+        "restWhole": [(_poly((-0.6, 0), (0.6, 0), (0.6, 0.5), (-0.6, 0.5)), "fill")],
+        "restHalf": [(_poly((-0.6, -0.5), (0.6, -0.5), (0.6, 0), (-0.6, 0)), "fill")],
+        "restQuarter": [([("M", (-0.25, -1.45)), ("L", (0.35, -0.75)), ("L", (-0.15, -0.1)), ("L", (0.35, 0.55)),
+                          ("C", (-0.25, 0.35), (-0.35, 0.85), (0.0, 1.35))], 0.26)],
+        "rest8th": [(_ellipse(-0.25, -0.5, 0.2, 0.2), "fill"),
+                    ([("M", (-0.35, -0.38)), ("C", (-0.1, -0.15), (0.2, -0.3), (0.4, -0.65)), ("L", (-0.05, 1.0))], 0.12)],
+        "rest16th": [(_ellipse(-0.1, -0.5, 0.2, 0.2), "fill"), (_ellipse(-0.4, 0.5, 0.2, 0.2), "fill"),
+                     ([("M", (-0.2, -0.38)), ("C", (0.0, -0.2), (0.35, -0.3), (0.5, -0.65)), ("L", (-0.15, 1.95))], 0.12),
+                     ([("M", (-0.5, 0.62)), ("C", (-0.3, 0.8), (0.05, 0.7), (0.25, 0.35))], 0.12)],
+        "flag8th": [(_flag(), "fill")],
+        "flag16th": [(_flag(), "fill"), (_flag(0.8), "fill")],
+        "flag32nd": [(_flag(), "fill"), (_flag(0.8), "fill"), (_flag(1.6), "fill")],
+        "gClef": [(_smooth((0.25, 0.5), (-0.15, 0.2), (0.05, -0.45), (0.65, -0.5), (1.0, 0.1), (0.75, 0.95),
+                           (0.0, 1.15), (-0.75, 0.8), (-0.9, -0.1), (-0.45, -1.0), (0.3, -1.9), (0.65, -2.9),
+                           (0.55, -3.9), (0.25, -4.3), (-0.05, -3.7), (-0.1, -2.8), (0.15, -0.9), (0.4, 1.0),
+                           (0.45, 1.9), (0.15, 2.35), (-0.3, 2.2)), 0.16),
+                  (_smooth((0.65, -0.5), (1.0, 0.1), (0.75, 0.95), (0.0, 1.15), (-0.75, 0.8), (-0.9, -0.1)), 0.28),
+                  (_ellipse(-0.3, 1.95, 0.28, 0.28), "fill")],
+        "fClef": [(_ellipse(0.1, 0, 0.3, 0.3), "fill"),
+                  (_smooth((0.0, -0.1), (0.35, -0.85), (1.1, -1.0), (1.65, -0.3), (1.55, 0.7), (0.95, 1.7), (0.0, 2.5)), 0.18),
+                  (_smooth((1.1, -1.0), (1.65, -0.3), (1.55, 0.7), (0.95, 1.7)), 0.3),
+                  (_ellipse(2.15, -0.5, 0.14, 0.14), "fill"), (_ellipse(2.15, 0.5, 0.14, 0.14), "fill")],
+        # unit height (0..1); drawn scaled to the height of the staff group
+        "brace": [([("M", (0, 0)), ("C", (-0.06, 0.05), (-0.01, 0.35), (-0.08, 0.5)),
+                    ("C", (-0.01, 0.65), (-0.06, 0.95), (0, 1)), ("C", (-0.035, 0.93), (0.005, 0.65), (-0.065, 0.5)),
+                    ("C", (0.005, 0.35), (-0.035, 0.07), (0, 0)), ("Z",)], "fill")],
+    }
+
+def _num(v):
+    return f"{v:.3f}".rstrip("0").rstrip(".") or "0"
+
+def _svg_d(path):
+    return " ".join(op + " ".join(f"{_num(x)} {_num(y)}" for x, y in pts) for op, *pts in path)
+
+def _pdf_ops(path):
+    ops = {"M": "m", "L": "l", "C": "c", "Z": "h"}
+    return " ".join(" ".join(f"{_num(x)} {_num(y)}" for x, y in pts) + (" " if pts else "") + ops[op]
+                    for op, *pts in path)
+
+@lru_cache(maxsize=None)
+def svg_atlas():
+    """<defs> with one <g id=...> per glyph; pages reference them with <use>."""
+    out = ["<defs>"]
+    for name, comps in glyphs().items():
+        out.append(f'<g id="{name}">')
+        for path, mode in comps:
+            if mode == "fill":
+                out.append(f'<path fill-rule="evenodd" d="{_svg_d(path)}"/>')
+            else:
+                out.append(f'<path fill="none" stroke="#000" stroke-width="{mode}" stroke-linecap="round" '
+                           f'stroke-linejoin="round" d="{_svg_d(path)}"/>')
+        out.append("</g>")
+    out.append("</defs>")
+    return "".join(out)
+
+@lru_cache(maxsize=None)
+def pdf_atlas():
+    """{glyph: form XObject content stream}; each PDF embeds a glyph once however often pages draw it."""
+    out = {}
+    for name, comps in glyphs().items():
+        ops = []
+        for path, mode in comps:
+            ops.append(_pdf_ops(path) + (" f*" if mode == "fill" else f" {_num(mode)} w 1 J 1 j S"))
+        out[name] = "\n".join(ops).encode("ascii")
+    return out
+
+def text_width(text, font, size):
+    if font != "sans":
+        return 0.5 * size * len(text)  # Times digits and tuplet numbers
+    base = (unicodedata.normalize("NFD", ch)[0] for ch in text)
+    return size * sum(_HELVETICA.get(ch, 556) for ch in base) / 1000.0
+
+# ---------- engraving: MusicXML -> pages of display items in tenths, y down ----------
+
+class Canvas:
+    """Display list of one page: ("line"|"fill"|"use"|"rect"|"text", ...) items in tenths."""
+    def __init__(self, width, height, mm_per_tenth):
+        self.page = {"width": width, "height": height, "mm": mm_per_tenth, "items": []}
+        self.items = self.page["items"]
+
+    def line(self, x1, y1, x2, y2, width):
+        self.items.append(("line", x1, y1, x2, y2, width))
+
+    def fill(self, path):
+        self.items.append(("fill", path))
+
+    def use(self, glyph, x, y, sx=1.0, sy=None):
+        self.items.append(("use", glyph, x, y, sx, sx if sy is None else sy))
+
+    def rect(self, x, y, w, h, width):
+        self.items.append(("rect", x, y, w, h, width))
+
+    def text(self, x, y, size, text, font="sans", anchor="start"):
+        self.items.append(("text", x, y, size, text, font, anchor))
+
+def dia(step, octave):
+    return octave * 7 + STEPS.index(step)
+
+def clef_info(clef):
+    """(glyph, reference line y offset from the staff top, diatonic position of the bottom line)."""
+    sign = (clef.findtext("sign") or "G").strip()
+    line = to_int(clef.findtext("line"), {"F": 4, "C": 3}.get(sign, 2))
+    octave = to_int(clef.findtext("clef-octave-change"), 0)
+    if sign == "F":
+        return "fClef", 40 - 10 * (line - 1), dia("F", 3) - 2 * (line - 1) + 7 * octave
+    if sign == "C":
+        return "gClef", 30, dia("C", 4) - 2 * (line - 1) + 7 * octave  # no C clef glyph: drawn as treble
+    line = line if sign == "G" else 2  # percussion/TAB templates read as treble
+    return "gClef", 40 - 10 * (line - 1), dia("G", 4) - 2 * (line - 1) + 7 * octave
+
+def key_alters(fifths):
+    order = SHARP_ORDER if fifths > 0 else FLAT_ORDER
+    return {s: (1 if fifths > 0 else -1) for s in order[:abs(fifths)]}
+
+def note_position(note):
+    """(step, alter, octave) of a pitched or unpitched note, None for rests."""
+    p = note.find("pitch")
+    if p is not None:
+        return (p.findtext("step") or "C").strip(), to_int(p.findtext("alter"), 0), to_int(p.findtext("octave"), 4)
+    u = note.find("unpitched")
+    if u is not None:
+        return (u.findtext("display-step") or "B").strip(), 0, to_int(u.findtext("display-octave"), 4)
+    return None
+
+def _layout(root):
+    d = root.find("defaults")
+    mm, tenths = root.findtext("defaults/scaling/millimeters"), root.findtext("defaults/scaling/tenths")
+    lay = {"mm": float(mm) / float(tenths) if mm and tenths else 7.0 / 40,
+           "width": float(root.findtext("defaults/page-layout/page-width") or 1233),
+           "height": float(root.findtext("defaults/page-layout/page-height") or 1596),
+           "widths": dict(LINE_WIDTHS)}
+    margins = root.find("defaults/page-layout/page-margins")
+    for side in ("left", "right", "top", "bottom"):
+        lay[side] = float(margins.findtext(f"{side}-margin") or 72) if margins is not None else 72.0
+    lay["system"] = _system_layout(d.find("system-layout") if d is not None else None, {
+        "left": 0.0, "right": 0.0, "distance": 100.0, "top": 120.0 if root.find("credit") is not None else 70.0})
+    lay["staff_distance"] = float(root.findtext("defaults/staff-layout/staff-distance") or 60)
+    for lw in root.findall("defaults/appearance/line-width"):
+        try:
+            lay["widths"][lw.get("type")] = float(lw.text)
+        except (TypeError, ValueError):
+            pass
+    return lay
+
+def _system_layout(el, base):
+    out = dict(base)
+    if el is not None:
+        for key, path in (("left", "system-margins/left-margin"), ("right", "system-margins/right-margin"),
+                          ("distance", "system-distance"), ("top", "top-system-distance")):
+            if el.findtext(path) is not None:
+                out[key] = float(el.findtext(path))
+    return out
+
+class _PartState:
+    """Per-measure clef/key/time/staff settings of one part, plus its events."""
+    def __init__(self, part):
+        self.events = PartEvents(part)
+        self.elements = part.findall("measure")
+        self.staves = self.events.staves
+        self.settings = []
+        clefs, fifths, time, staff_vis, lines = {}, 0, None, {}, {}
+        for meas in self.elements:
+            shown_time = None
+            for at in meas.findall("attributes"):
+                for clef in at.findall("clef"):
+                    clefs[to_int(clef.get("number"), 1)] = clef_info(clef)
+                if at.find("key") is not None:
+                    fifths = to_int(at.findtext("key/fifths"), 0)
+                t = at.find("time")
+                if t is not None:
+                    time = (t.findtext("beats") or "4", t.findtext("beat-type") or "4")
+                    shown_time = None if is_hidden(t) else time
+                for sd in at.findall("staff-details"):
+                    n = to_int(sd.get("number"), 1)
+                    staff_vis[n] = not is_hidden(sd)
+                    if sd.findtext("staff-lines"):
+                        lines[n] = to_int(sd.findtext("staff-lines"), 5)
+            self.settings.append({"clefs": dict(clefs), "fifths": fifths, "time": shown_time,
+                                  "visible": dict(staff_vis), "lines": dict(lines)})
+
+    def clef(self, mi, staff):
+        return self.settings[mi]["clefs"].get(staff) or ("gClef", 30, dia("E", 4))
+
+def _accidentals(ps, mi):
+    """{id(note): glyph} for the accidentals a reader needs in measure mi (key, earlier notes in the bar,
+    explicit <accidental>); hidden notes neither show nor set one."""
+    key = key_alters(ps.settings[mi]["fifths"])
+    out = {}
+    m = ps.events.measures[mi]
+    for staff in range(1, ps.staves + 1):
+        state = {}
+        evs = sorted((e for (s, _), evs in m["events"].items() if s == staff for e in evs if e.get("notes")),
+                     key=lambda e: e["onset"])
+        for ev in evs:
+            for n in ev["notes"]:
+                pos = note_position(n)
+                if pos is None or is_hidden(n) or n.find("unpitched") is not None:
+                    continue
+                step, alter, octave = pos
+                current = state.get((step, octave), key.get(step, 0))
+                acc = n.find("accidental")
+                if acc is not None and (acc.text or "").strip() in ACC_TEXT:
+                    if not is_hidden(acc):
+                        out[id(n)] = ACC_GLYPH[ACC_TEXT[acc.text.strip()]]
+                elif alter != current and alter in ACC_GLYPH:
+                    out[id(n)] = ACC_GLYPH[alter]
+                state[(step, octave)] = alter
+    return out
+
+def _column_width(quarters):
+    return 22 + 16 * math.log2(1 + 2 * float(quarters))
+
+def _plan_measure(parts, mi):
+    """Columns of measure mi across all parts: [(onset, duration width, accidental lead)], plus accidentals."""
+    accs, onsets, lead = {}, set(), {}
+    length = 0
+    for ps in parts:
+        if mi >= len(ps.events.measures):
+            continue
+        m = ps.events.measures[mi]
+        length = max(length, m["len"])
+        a = _accidentals(ps, mi)
+        accs.update(a)
+        for evs in m["events"].values():
+            for ev in evs:
+                onsets.add(ev["onset"])
+                if ev.get("notes"):
+                    n_acc = sum(1 for n in ev["notes"] if id(n) in a)
+                    if n_acc:
+                        lead[ev["onset"]] = max(lead.get(ev["onset"], 0), 3 + 11 * min(n_acc, 3))
+    onsets = sorted(o for o in onsets if o < length) or [Fraction(0)]
+    cols = []
+    for i, o in enumerate(onsets):
+        nxt = onsets[i + 1] if i + 1 < len(onsets) else max(length, o + DIVISION)
+        cols.append((o, _column_width((nxt - o) / DIVISION), lead.get(o, 0)))
+    return {"cols": cols, "len": length, "accidentals": accs}
+
+def _header_width(ps, mi, first_measure):
+    s = ps.settings[mi]
+    w = 40 + (10 * abs(s["fifths"]) + 6 if s["fifths"] else 0)
+    if s["time"] and first_measure:
+        w += 10 * max(len(x) for x in s["time"]) + 10
+    return w
+
+def _systems(parts, plans, lay):
+    """Measure index lists per system, and the indices that start a new page. Breaks come from <print>;
+    scores without any are filled greedily to the line width."""
+    first = parts[0].events.measures
+    n = max(len(ps.events.measures) for ps in parts)
+    has_breaks = any(m["break"] for m in first)
+    line_width = lay["width"] - lay["left"] - lay["right"] - lay["system"]["left"] - lay["system"]["right"]
+    systems, pages, cur, cur_w = [], set(), [], 0.0
+    for mi in range(n):
+        w = 12 + sum(c[1] + c[2] for c in plans[mi]["cols"])
+        if cur and not has_breaks and cur_w + w > line_width - _header_width(parts[0], cur[0], False):
+            systems.append(cur); cur, cur_w = [], 0.0
+        cur.append(mi); cur_w += w
+        brk = first[mi]["break"] if mi < len(first) else None
+        if brk:
+            systems.append(cur); cur, cur_w = [], 0.0
+            if brk == "page":
+                pages.add(len(systems))
+    if cur:
+        systems.append(cur)
+    return systems, pages
+
+def _print_layout(parts, mi, lay):
+    el = parts[0].elements[mi].find("print") if mi < len(parts[0].elements) else None
+    sys_lay = _system_layout(el.find("system-layout") if el is not None else None, lay["system"])
+    staff_dist = {}
+    if el is not None:
+        for sl in el.findall("staff-layout"):
+            if sl.findtext("staff-distance"):
+                staff_dist[to_int(sl.get("number"), 1)] = float(sl.findtext("staff-distance"))
+    return sys_lay, staff_dist
+
+def engrave(root):
+    """Pages (dicts with width/height in tenths, mm per tenth and display items) for a score-partwise root."""
+    lay = _layout(root)
+    W, H, widths = lay["width"], lay["height"], lay["widths"]
+    parts = [_PartState(p) for p in root.findall("part")]
+    if not parts:
+        return []
+    n = max(len(ps.events.measures) for ps in parts)
+    plans = [_plan_measure(parts, mi) for mi in range(n)]
+    systems, page_starts = _systems(parts, plans, lay)
+    pt_tenths = 25.4 / 72 / lay["mm"]
+
+    pages, canvas, y_bottom = [], None, None
+    ties = {}
+    for si, measures in enumerate(systems):
+        sys_lay, staff_dist = _print_layout(parts, measures[0], lay)
+        height, tops = 0.0, []
+        for pi, ps in enumerate(parts):
+            for s in range(1, ps.staves + 1):
+                if not ps.settings[measures[0]]["visible"].get(s, True):
+                    continue  # hidden staves take no room
+                if tops:
+                    height += 40 + (staff_dist.get(s, lay["staff_distance"]) if tops[-1][0] == pi else lay["staff_distance"])
+                tops.append((pi, s, height))
+        height += 40
+        new_page = canvas is None or si in page_starts
+        if not new_page and y_bottom + sys_lay["distance"] + height > H - lay["bottom"]:
+            new_page = True
+        if new_page:
+            canvas = Canvas(W, H, lay["mm"])
+            pages.append(canvas.page)
+            _draw_credits(canvas, root, lay, pt_tenths, len(pages))
+            top = lay["top"] + sys_lay["top"]
+        else:
+            top = y_bottom + sys_lay["distance"]
+        y_bottom = top + height
+        staff_top = {(pi, s): top + off for pi, s, off in tops}
+        x0 = lay["left"] + sys_lay["left"]
+        x1 = W - lay["right"] - sys_lay["right"]
+        _draw_system(canvas, parts, plans, measures, staff_top, x0, x1, widths, pt_tenths, ties, si)
+    return pages
+
+def _draw_credits(canvas, root, lay, pt_tenths, page):
+    """Credit lines of this page centred at the top (exporters disagree on where default-y counts from)."""
+    y = lay["top"]
+    for cw in (w for c in root.findall("credit") if to_int(c.get("page"), 1) == page for w in c.findall("credit-words")):
+        text = (cw.text or "").strip()
+        if not text:
+            continue
+        size = float(cw.get("font-size") or 12) * pt_tenths
+        y += size
+        canvas.text(lay["width"] / 2, y, size, text, "sans", "middle")
+        y += size * 0.4
+
+def _draw_system(canvas, parts, plans, measures, staff_top, x0, x1, widths, pt_tenths, ties, si):
+    first = measures[0]
+    header = max(_header_width(ps, first, True) for ps in parts)
+    attr_widths = [parts[0].elements[mi].get("width") if mi < len(parts[0].elements) else None for mi in measures]
+    if all(attr_widths):
+        natural = [float(w) for w in attr_widths]
+    else:
+        natural = [12 + sum(c[1] + c[2] for c in plans[mi]["cols"]) for mi in measures]
+        natural[0] += header
+    scale = (x1 - x0) / sum(natural)
+
+    # staves, clefs, keys, time signatures, system barline and brace
+    for pi, ps in enumerate(parts):
+        st = ps.settings[first]
+        shown = [s for s in range(1, ps.staves + 1) if (pi, s) in staff_top]
+        for s in shown:
+            top = staff_top[(pi, s)]
+            lines = st["lines"].get(s, 5)
+            ys = [top + 20] if lines == 1 else [top + 10 * i for i in range(lines)]
+            for y in ys:
+                canvas.line(x0, y, x1, y, widths["staff"])
+            glyph, ref, bottom = ps.clef(first, s)
+            canvas.use(glyph, x0 + (12 if glyph == "fClef" else 18), top + ref)
+            fifths = st["fifths"]
+            positions = KEY_SHARPS if fifths > 0 else KEY_FLATS
+            for i in range(abs(fifths)):
+                d = positions[i] + bottom - dia("E", 4)
+                canvas.use("accidentalSharp" if fifths > 0 else "accidentalFlat", x0 + 44 + 10 * i, top + 40 - 5 * (d - bottom))
+            if st["time"]:
+                tx = x0 + 40 + (10 * abs(fifths) + 6 if fifths else 0) + 5 * max(len(v) for v in st["time"])
+                canvas.text(tx, top + 19, 28, st["time"][0], "bold", "middle")
+                canvas.text(tx, top + 39, 28, st["time"][1], "bold", "middle")
+        if len(shown) > 1:
+            y_top, y_bot = staff_top[(pi, shown[0])], staff_top[(pi, shown[-1])] + 40
+            canvas.line(x0, y_top, x0, y_bot, widths["light barline"])
+            canvas.use("brace", x0 - 3, y_top, y_bot - y_top)
+
+    mx = x0
+    for k, mi in enumerate(measures):
+        mw = natural[k] * scale
+        start = mx + (header if k == 0 else 0) + 10
+        cols = plans[mi]["cols"]
+        stretch = sum(c[1] for c in cols)
+        room = max(0.0, mx + mw - start - sum(c[2] for c in cols))
+        xs, cx = {}, start
+        for onset, w, lead in cols:
+            xs[onset] = cx + lead + 7
+            cx += lead + w * room / stretch
+        for pi, ps in enumerate(parts):
+            shown = [s for s in range(1, ps.staves + 1) if (pi, s) in staff_top]
+            if mi >= len(ps.events.measures) or not shown:
+                continue
+            m = ps.events.measures[mi]
+            for (s, track), evs in sorted(m["events"].items(), key=lambda kv: kv[0]):
+                if s not in shown:
+                    continue
+                _draw_voice(canvas, ps, mi, s, track, evs, xs, staff_top[(pi, s)], (start, mx + mw), plans[mi],
+                            widths, ties, (si, x0 + header, x1), pi)
+            for el in ps.elements[mi].findall("direction"):
+                if to_int(el.findtext("staff"), 1) in shown:
+                    _draw_words(canvas, el, staff_top[(pi, to_int(el.findtext("staff"), 1))], start, widths, pt_tenths)
+            y_top, y_bot = staff_top[(pi, shown[0])], staff_top[(pi, shown[-1])] + 40
+            bx = mx + mw
+            if m["end_bar"]:
+                canvas.line(bx - 8, y_top, bx - 8, y_bot, widths["light barline"])
+                canvas.line(bx - widths["heavy barline"] / 2, y_top, bx - widths["heavy barline"] / 2, y_bot,
+                            widths["heavy barline"])
+            else:
+                canvas.line(bx, y_top, bx, y_bot, widths["light barline"])
+        mx += mw
+
+def _draw_words(canvas, direction, top, x, widths, pt_tenths):
+    for w in direction.findall("direction-type/words"):
+        text = (w.text or "").strip()
+        if not text:
+            continue
+        size = float(w.get("font-size") or 10) * pt_tenths
+        y = top - float(w.get("default-y") or 0) if w.get("default-y") else top - 18 - float(w.get("relative-y") or 0)
+        base = y + size * 0.35
+        canvas.text(x, base, size, text, "sans")
+        if w.get("enclosure") == "rectangle":
+            pad = size * 0.3
+            canvas.rect(x - pad, y - size * 0.5 - pad, text_width(text, "sans", size) + 2 * pad, size + 2 * pad,
+                        widths["enclosure"])
+
+def _staff_y(top, bottom, d):
+    return top + 40 - 5 * (d - bottom)
+
+def _ledgers(canvas, x, hw, top, bottom, d, width):
+    pos = d - bottom
+    rng = range(-2, pos - 1, -2) if pos <= -2 else range(10, pos + 1, 2) if pos >= 10 else ()
+    for p in rng:
+        y = top + 40 - 5 * p
+        canvas.line(x - hw - 3.5, y, x + hw + 3.5, y, width)
+
+def _draw_voice(canvas, ps, mi, staff, track, evs, xs, top, span, plan, widths, ties, sys_info, pi):
+    _, bottom = ps.clef(mi, staff)[1:]
+    mid = top + 20
+    beam_group, tuplets, open_tuplet = None, [], None
+    for ev in sorted(evs, key=lambda e: e["onset"]):
+        if ev.get("forward"):
+            continue
+        x = xs.get(ev["onset"], span[0])
+        first = ev["notes"][0]
+        ntype = (first.findtext("type") or "").strip()
+        dots = len(first.findall("dot"))
+        entry = None
+        if ev["rest"]:
+            if not is_hidden(first):
+                r = first.find("rest")
+                if r is not None and r.get("measure") == "yes" or not ntype or ev["ticks"] >= plan["len"] and ntype in ("whole", "breve"):
+                    canvas.use("restWhole", (span[0] + span[1]) / 2, top + 10)
+                else:
+                    canvas.use(RESTS.get(ntype, "restQuarter"), x, mid)
+                    for i in range(dots):
+                        canvas.use("augmentationDot", x + 9 + 5 * i, mid - 5)
+        else:
+            entry = _draw_chord(canvas, ev, ntype, dots, x, top, bottom, mid, plan, widths, ties, sys_info, (pi, staff, track))
+        beam = next((b.text.strip() for b in first.findall("beam") if b.get("number", "1") == "1" and b.text), None)
+        if entry is not None and entry["stem"]:
+            if beam in ("begin", "continue", "end") and (beam == "begin" or beam_group is not None):
+                if beam == "begin":
+                    beam_group = []
+                beam_group.append(entry)
+                if beam == "end":
+                    _draw_beams(canvas, beam_group, mid, widths); beam_group = None
+            else:
+                _draw_stem(canvas, entry, mid, widths)
+        tup = first.find("notations/tuplet")
+        if tup is not None and tup.get("type") == "start":
+            tm = first.find("time-modification")
+            open_tuplet = {"number": (tm.findtext("actual-notes") if tm is not None else None) or "3", "entries": [], "x": []}
+        if open_tuplet is not None:
+            open_tuplet["x"].append(x)
+            if entry is not None:
+                open_tuplet["entries"].append(entry)
+            if tup is not None and tup.get("type") == "stop":
+                tuplets.append(open_tuplet); open_tuplet = None
+    if beam_group:
+        for entry in beam_group:
+            _draw_stem(canvas, entry, mid, widths)
+    for t in tuplets:
+        tips = [e for e in t["entries"] if e.get("tip") is not None]
+        if not t["entries"] or not tips:
+            continue  # nothing of the group is printed, so the number would give it away
+        if all(e["dir"] == "up" for e in tips):
+            y = min(min(e["tip"] for e in tips), top) - 6
+        else:
+            y = max(max(e["tip"] for e in tips), top + 40) + 16
+        canvas.text((t["x"][0] + t["x"][-1]) / 2, y, 18, t["number"], "italic", "middle")
+
+def _draw_chord(canvas, ev, ntype, dots, x, top, bottom, mid, plan, widths, ties, sys_info, voice_key):
+    """Heads, ledger lines, accidentals, dots and ties of one chord; returns the stem entry (None if all hidden)."""
+    visible = []
+    for n in ev["notes"]:
+        pos = note_position(n)
+        if pos is not None and not is_hidden(n):
+            visible.append((dia(pos[0], pos[2]), n, pos))
+    if not visible:
+        return None
+    visible.sort(key=lambda v: v[0])
+    head = HEADS.get(ntype, "noteheadBlack")
+    hw = HEAD_HALF_WIDTH[head]
+    first = ev["notes"][0]
+    stem_text = (first.findtext("stem") or "").strip()
+    has_stem = ntype not in ("whole", "breve", "") and stem_text != "none"
+    lo, hi = visible[0][0], visible[-1][0]
+    if stem_text in ("up", "down"):
+        direction = stem_text
+    else:
+        direction = "down" if (lo + hi) / 2 - bottom >= 4 else "up"
+    # seconds in a chord: the upper head of the pair goes right of an up stem, the lower one left of a down stem
+    shift = {}
+    order = visible if direction == "up" else list(reversed(visible))
+    prev = None
+    for d, n, _ in order:
+        if prev is not None and abs(d - prev[0]) == 1 and not prev[1]:
+            shift[id(n)] = (2 * hw - 1.2) * (1 if direction == "up" else -1)
+        prev = (d, id(n) in shift)
+    acc_cols = []
+    for d, n, pos in reversed(visible):
+        hx = x + shift.get(id(n), 0)
+        y = _staff_y(top, bottom, d)
+        _ledgers(canvas, hx, hw, top, bottom, d, widths["leger"])
+        canvas.use(head, hx, y)
+        glyph = plan["accidentals"].get(id(n))
+        if glyph:
+            col = 0
+            while any(abs(d - other) < 6 for other in (acc_cols[col] if col < len(acc_cols) else ())):
+                col += 1
+            if col == len(acc_cols):
+                acc_cols.append([])
+            acc_cols[col].append(d)
+            left, right = ACC_EXTENT[glyph]
+            canvas.use(glyph, x - hw - 2.5 - right - 11 * col, y)
+        for i in range(dots):
+            canvas.use("augmentationDot", x + hw + 5 + 5 * i + max(shift.values(), default=0), y - (5 if (d - bottom) % 2 == 0 else 0))
+        _tie(canvas, n, pos, hx, hw, y, direction if has_stem else ("down" if d - bottom >= 4 else "up"), ties, sys_info, voice_key)
+    return {"dir": direction, "type": ntype, "head_x": x, "hw": hw, "stem": has_stem, "tip": None,
+            "beams": {b.get("number", "1"): (b.text or "").strip() for b in first.findall("beam")},
+            "y_lo": _staff_y(top, bottom, lo), "y_hi": _staff_y(top, bottom, hi)}
+
+def _stem_x(e):
+    return e["head_x"] + (e["hw"] - 0.6 if e["dir"] == "up" else 0.6 - e["hw"])
+
+def _tie(canvas, note, pos, x, hw, y, direction, ties, sys_info, voice_key):
+    si, sys_start, sys_end = sys_info
+    key = voice_key + (pitch_to_midi(pos[0], pos[1], pos[2]),)
+    types = {t.get("type") for t in note.findall("tie")} | {t.get("type") for t in note.findall("notations/tied")}
+    if "stop" in types and key in ties:
+        sx, sy, ssi, sdir, send = ties.pop(key)
+        if ssi == si:
+            _arc(canvas, sx, x - hw - 1, sy, sdir)
+        else:
+            _arc(canvas, sx, send, sy, sdir)
+            _arc(canvas, sys_start, x - hw - 1, y, sdir)
+    if "start" in types:
+        ties[key] = (x + hw + 1, y, si, direction, sys_end)
+
+def _arc(canvas, x1, x2, y, direction):
+    if x2 - x1 < 4:
+        return
+    s = 1 if direction == "up" else -1  # ties go opposite the stem
+    y += 6 * s
+    h = min(9.0, 3 + (x2 - x1) * 0.08)
+    dx = (x2 - x1) / 4
+    canvas.fill([("M", (x1, y)), ("C", (x1 + dx, y + s * h), (x2 - dx, y + s * h), (x2, y)),
+                 ("C", (x2 - dx, y + s * (h - 2.2)), (x1 + dx, y + s * (h - 2.2)), (x1, y)), ("Z",)])
+
+def _draw_stem(canvas, e, mid, widths):
+    e["x"] = _stem_x(e)
+    flags = FLAGS.get(e["type"], 0)
+    length = STEM + max(0, flags - 1) * 7
+    if e["dir"] == "up":
+        tip = min(e["y_hi"] - length, mid) if e["y_hi"] - length > mid else e["y_hi"] - length
+        canvas.line(e["x"], e["y_lo"], e["x"], tip, widths["stem"])
+    else:
+        tip = max(e["y_lo"] + length, mid) if e["y_lo"] + length < mid else e["y_lo"] + length
+        canvas.line(e["x"], e["y_hi"], e["x"], tip, widths["stem"])
+    if flags:
+        canvas.use(f"flag{ {1: '8th', 2: '16th', 3: '32nd'}[flags]}", e["x"] - widths["stem"] / 2, tip, 1.0,
+                   1.0 if e["dir"] == "up" else -1.0)
+    e["tip"] = tip
+
+def _draw_beams(canvas, group, mid, widths):
+    if len(group) < 2:
+        for e in group:
+            _draw_stem(canvas, e, mid, widths)
+        return
+    up = group[0]["dir"] == "up"
+    for e in group:
+        e["dir"] = group[0]["dir"]
+        e["x"] = _stem_x(e)
+    xf, xl = group[0]["x"], group[-1]["x"]
+    yf = group[0]["y_hi"] if up else group[0]["y_lo"]
+    yl = group[-1]["y_hi"] if up else group[-1]["y_lo"]
+    slope = max(-0.12, min(0.12, 0.5 * (yl - yf) / (xl - xf))) if xl > xf else 0.0
+    depth = max(FLAGS.get(e["type"], 1) for e in group)
+    length = STEM + (depth - 1) * 4
+    if up:
+        b = min(e["y_hi"] - length - slope * (e["x"] - xf) for e in group)
+    else:
+        b = max(e["y_lo"] + length - slope * (e["x"] - xf) for e in group)
+    beam_y = lambda x: b + slope * (x - xf)
+    for e in group:
+        e["tip"] = beam_y(e["x"])
+        canvas.line(e["x"], e["y_lo"] if up else e["y_hi"], e["x"], e["tip"], widths["stem"])
+    thick, inward = widths["beam"], 1 if up else -1
+    def segment(xa, xb, level):
+        off = level * 8 * inward
+        ya, yb = beam_y(xa) + off, beam_y(xb) + off
+        canvas.fill(_poly((xa, ya), (xb, yb), (xb, yb + thick * inward), (xa, ya + thick * inward)))
+    half = widths["stem"] / 2
+    segment(xf - half, xl + half, 0)
+    for level in (2, 3):
+        start = None
+        for i, e in enumerate(group):
+            state = e["beams"].get(str(level), "")
+            if state == "begin":
+                start = e["x"]
+            elif state == "end" and start is not None:
+                segment(start - half, e["x"] + half, level - 1); start = None
+            elif state == "forward hook":
+                segment(e["x"] - half, e["x"] + 10, level - 1)
+            elif state == "backward hook":
+                segment(e["x"] - 10, e["x"] + half, level - 1)
+
+# ---------- output ----------
+
+def svg_page(page):
+    """One page as a standalone SVG document (sized in mm, drawn in tenths)."""
+    w, h, mm = page["width"], page["height"], page["mm"]
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+           f'width="{_num(w * mm)}mm" height="{_num(h * mm)}mm" viewBox="0 0 {_num(w)} {_num(h)}">',
+           svg_atlas(), f'<rect width="{_num(w)}" height="{_num(h)}" fill="#fff"/><g fill="#000">']
+    for it in page["items"]:
+        kind = it[0]
+        if kind == "line":
+            _, x1, y1, x2, y2, lw = it
+            out.append(f'<line x1="{_num(x1)}" y1="{_num(y1)}" x2="{_num(x2)}" y2="{_num(y2)}" stroke="#000" stroke-width="{_num(lw)}"/>')
+        elif kind == "fill":
+            out.append(f'<path d="{_svg_d(it[1])}"/>')
+        elif kind == "use":
+            _, name, x, y, sx, sy = it
+            out.append(f'<use xlink:href="#{name}" transform="translate({_num(x)} {_num(y)}) scale({_num(sx * SP)} {_num(sy * SP)})"/>'
+                       if name != "brace" else
+                       f'<use xlink:href="#{name}" transform="translate({_num(x)} {_num(y)}) scale({_num(sx)} {_num(sy)})"/>')
+        elif kind == "rect":
+            _, x, y, rw, rh, lw = it
+            out.append(f'<rect x="{_num(x)}" y="{_num(y)}" width="{_num(rw)}" height="{_num(rh)}" fill="none" stroke="#000" stroke-width="{_num(lw)}"/>')
+        elif kind == "text":
+            _, x, y, size, text, font, anchor = it
+            out.append(f'<text x="{_num(x)}" y="{_num(y)}" font-size="{_num(size)}" {FONTS[font][2]} text-anchor="{anchor}">{escape(text)}</text>')
+    out.append("</g></svg>\n")
+    return "\n".join(out)
+
+def _pdf_string(text):
+    data = text.encode("cp1252", "replace")
+    return "(" + data.decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+def _pdf_content(page, aliases):
+    k = page["mm"] * 72 / 25.4
+    ops = [f"q {_num(k)} 0 0 {_num(-k)} 0 {_num(page['height'] * k)} cm"]
+    for it in page["items"]:
+        kind = it[0]
+        if kind == "line":
+            _, x1, y1, x2, y2, lw = it
+            ops.append(f"{_num(lw)} w {_num(x1)} {_num(y1)} m {_num(x2)} {_num(y2)} l S")
+        elif kind == "fill":
+            ops.append(_pdf_ops(it[1]) + " f")
+        elif kind == "use":
+            _, name, x, y, sx, sy = it
+            f = 1 if name == "brace" else SP
+            ops.append(f"q {_num(sx * f)} 0 0 {_num(sy * f)} {_num(x)} {_num(y)} cm /{aliases[name]} Do Q")
+        elif kind == "rect":
+            _, x, y, rw, rh, lw = it
+            ops.append(f"{_num(lw)} w {_num(x)} {_num(y)} {_num(rw)} {_num(rh)} re S")
+        elif kind == "text":
+            _, x, y, size, text, font, anchor = it
+            if anchor == "middle":
+                x -= text_width(text, font, size) / 2
+            ops.append(f"BT /{FONTS[font][0]} {_num(size)} Tf 1 0 0 -1 {_num(x)} {_num(y)} Tm {_pdf_string(text)} Tj ET")
+    ops.append("Q")
+    return "\n".join(ops).encode("latin-1")
+
+def pdf_bytes(pages):
+    """A PDF with one page per display-list page; fonts are the standard 14 and glyphs shared form XObjects."""
+    objs = [b"", b""]  # 1: catalog, 2: page tree
+    def add(body):
+        objs.append(body)
+        return len(objs)
+    def stream(data, head=""):
+        data = zlib.compress(data)
+        return f"<< {head} /Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode("latin-1") + data + b"\nendstream"
+    fonts = {alias: add(f"<< /Type /Font /Subtype /Type1 /BaseFont /{base} /Encoding /WinAnsiEncoding >>".encode())
+             for alias, base, _ in FONTS.values()}
+    used = sorted({it[1] for p in pages for it in p["items"] if it[0] == "use"})
+    aliases, xobjs = {}, {}
+    for i, name in enumerate(used):
+        aliases[name] = f"G{i}"
+        xobjs[f"G{i}"] = add(stream(pdf_atlas()[name], "/Type /XObject /Subtype /Form /BBox [-6 -6 6 6]"))
+    res = add(("<< /Font << " + " ".join(f"/{a} {n} 0 R" for a, n in fonts.items()) + " >> /XObject << "
+               + " ".join(f"/{a} {n} 0 R" for a, n in xobjs.items()) + " >> >>").encode())
+    kids = []
+    for page in pages:
+        k = page["mm"] * 72 / 25.4
+        content = add(stream(_pdf_content(page, aliases)))
+        kids.append(add(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {_num(page['width'] * k)} {_num(page['height'] * k)}] "
+                        f"/Resources {res} 0 R /Contents {content} 0 R >>".encode()))
+    objs[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>".encode()
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+def render(task):
+    """Worker: (src, pdf path or None, svg stem or None, keep pages) -> (src, pages or None, error or None)."""
+    src, pdf, svg, keep = task
+    try:
+        pages = engrave(read_tree(src).getroot())
+        if pdf:
+            Path(pdf).write_bytes(pdf_bytes(pages))
+        if svg:
+            for i, page in enumerate(pages):
+                Path(f"{svg}{'' if i == 0 else f'_p{i + 1}'}.svg").write_text(svg_page(page), encoding="utf-8")
+        return src, pages if keep else None, None
+    except Exception as e:
+        return src, None, f"{type(e).__name__}: {e}"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Render generated MusicXML (Übungsblatt/Arbeitsblatt) to PDF and SVG without a notation program.")
+    ap.add_argument("paths", nargs="+", help="Files or output folders")
+    ap.add_argument("--outdir", default=None, help="Where to write the files (default: next to each input)")
+    ap.add_argument("--svg", action="store_true", help="Also write one SVG per page")
+    ap.add_argument("--combine", default=None, metavar="CLASS.pdf", help="Write all inputs into this one PDF instead of one PDF per input")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    tasks = []
+    for src in iter_inputs(args.paths):
+        name = src.name[:-len(".music.xml")] if src.name.lower().endswith(".music.xml") else src.stem
+        stem = Path(args.outdir) / name if args.outdir else src.with_name(name)
+        tasks.append((str(src), None if args.combine else str(stem) + ".pdf", str(stem) if args.svg else None, bool(args.combine)))
+    if args.outdir:
+        Path(args.outdir).mkdir(parents=True, exist_ok=True)
+    failed, pages = 0, []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for task, (src, result, err) in zip(tasks, pool.map(render, tasks, chunksize=8)):
+            if err:
+                failed += 1; print(f"{src}: {err}", file=sys.stderr)
+            elif args.combine:
+                pages += result
+            else:
+                print(f"Wrote {task[1]}")
+    if args.combine:
+        Path(args.combine).write_bytes(pdf_bytes(pages))
+        print(f"Wrote {args.combine} ({len(pages)} page(s))")
+    print(f"Rendered {len(tasks) - failed} of {len(tasks)} file(s).")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
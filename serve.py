@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Local HTTP service: generate sheets on demand without a Python install on the client.
+# Standard library only. Templates and the YAML config stay parsed in every worker process.
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as JobTimeout
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from musicxml_utils import warm_templates
+from uebungsblatt_cli import load_cfg, variant_cfg, section_files, draw_seed, SECTIONS, OUTPUT_NAMES
+
+HERE = Path(__file__).resolve().parent
+ACTIONS = ("hide", "delete")
+
+_CFG = {}
+_BARRIER = None
+
+def _init_worker(cfg, barrier):
+    global _BARRIER
+    _CFG.update(cfg); _BARRIER = barrier
+    inputs = [p for p in (cfg.get("inputs") or {}).values() if p and os.path.exists(p)]
+    warm_templates(inputs)
+    import generate_scales, generate_intervals, generate_chords, generate_rhythms, make_arbeitsblatt  # noqa: F401
+
+@lru_cache(maxsize=None)
+def _profile_cfg(profile):
+    return variant_cfg(_CFG, profile, None)
+
+def _warm(_):
+    """Worker: parse the plain config, then block until every worker got here, so each one has its own warm-up task."""
+    _profile_cfg("")
+    _BARRIER.wait(timeout=60)
+
+def generate_sections(profile, seed, sections):
+    """Worker: {section: (sheet bytes, Arbeitsblatt bytes)} for one (profile, seed)."""
+    cfg = dict(_profile_cfg(profile), seed=seed)
+    out = {}
+    for _, data, meta in section_files(cfg, profile or None, sections=sections):
+        out.setdefault(meta["section"], {})[meta["kind"]] = data
+    return {section: (f["uebungsblatt"], f["arbeitsblatt"]) for section, f in out.items()}
+
+def arbeitsblatt(xml_bytes, mode, action):
+    """Worker: Arbeitsblatt for an uploaded Übungsblatt."""
+    from make_arbeitsblatt import apply_mode
+    tree = ET.ElementTree(ET.fromstring(xml_bytes))
+    apply_mode(tree.getroot(), mode, action)
+    buf = io.BytesIO()
+    tree.write(buf, encoding="utf-8", xml_declaration=True)
+    return buf.getvalue()
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message); self.status = status
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "Uebungsblatt/1"
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def _dispatch(self):
+        url = urlparse(self.path)
+        q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            route = {("GET", "/health"): self.health, ("GET", "/generate"): self.generate,
+                     ("GET", "/bundle"): self.bundle, ("POST", "/arbeitsblatt"): self.arbeitsblatt}.get((self.command, url.path))
+            if route is None:
+                raise HTTPError(404, f"no route {self.command} {url.path}")
+            route(q)
+        except HTTPError as e:
+            self._send(e.status, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+        except Exception as e:  # generator failure: report it, keep serving
+            self._send(500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8"), "application/json")
+
+    def _send(self, status, body, ctype, filename=None, seed=None):
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if status in (503, 504):
+            self.send_header("Retry-After", "1")
+        if seed is not None:
+            self.send_header("X-Seed", str(seed))  # reproduces an unseeded response
+        if filename:
+            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _run(self, fn, *args):
+        """Run fn in the pool, holding one of the bounded in-flight slots until the job finishes.
+        A job past job_timeout answers 504 but keeps its slot (its worker is still busy) until it is done."""
+        if not self.server.slots.acquire(timeout=self.server.queue_timeout):
+            raise HTTPError(503, "server busy, retry later")
+        try:
+            fut = self.server.pool.submit(fn, *args)
+        except BaseException:
+            self.server.slots.release(); raise
+        fut.add_done_callback(lambda _: self.server.slots.release())
+        try:
+            return fut.result(timeout=self.server.job_timeout)
+        except JobTimeout:
+            raise HTTPError(504, f"generation took over {self.server.job_timeout:g}s, retry later")
+
+    def _variant_args(self, q):
+        profile = q.get("profile", "")
+        if profile and profile not in self.server.profiles:
+            raise HTTPError(400, f"unknown profile {profile!r}")
+        try:
+            seed = int(q["seed"]) if "seed" in q else self.server.cfg.get("seed")
+        except ValueError:
+            raise HTTPError(400, "seed must be an integer")
+        return profile, draw_seed() if seed is None else seed
+
+    def health(self, q):
+        body = {"status": "ok", "workers": self.server.workers, "max_inflight": self.server.max_inflight,
+                "profiles": sorted(self.server.profiles), "sections": self.server.sections}
+        self._send(200, json.dumps(body).encode("utf-8"), "application/json")
+
+    def generate(self, q):
+        """GET /generate?section=intervals&profile=EC1&seed=7[&sheet=arbeitsblatt]"""
+        section = q.get("section")
+        if section not in self.server.sections:
+            raise HTTPError(400, f"section must be one of {self.server.sections}")
+        profile, seed = self._variant_args(q)
+        sheet, ab = self._run(generate_sections, profile, seed, (section,))[section]
+        want_ab = q.get("sheet", "uebungsblatt") == "arbeitsblatt"
+        name = OUTPUT_NAMES[section] + ("_arbeitsblatt" if want_ab else "") + ".musicxml"
+        self._send(200, ab if want_ab else sheet, "application/vnd.recordare.musicxml+xml", name, seed)
+
+    def bundle(self, q):
+        """GET /bundle?profile=EC1&seed=7[&sections=scales,intervals] -> ZIP with both sheets per section."""
+        wanted = [s for s in (q.get("sections") or ",".join(self.server.sections)).split(",") if s]
+        if not wanted or any(s not in self.server.sections for s in wanted):
+            raise HTTPError(400, f"sections must be among {self.server.sections}")
+        profile, seed = self._variant_args(q)
+        files = self._run(generate_sections, profile, seed, tuple(wanted))
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            for section, (sheet, ab) in files.items():
+                zf.writestr(OUTPUT_NAMES[section] + ".musicxml", sheet)
+                zf.writestr(OUTPUT_NAMES[section] + "_arbeitsblatt.musicxml", ab)
+        self._send(200, buf.getvalue(), "application/zip", f"uebungsblatt_{profile or 'default'}_{seed}.zip", seed)
+
+    def arbeitsblatt(self, q):
+        """POST /arbeitsblatt?mode=intervals&action=hide with the Übungsblatt MusicXML as body."""
+        mode, action = q.get("mode"), q.get("action", "hide")
+        if mode not in SECTIONS or action not in ACTIONS:
+            raise HTTPError(400, f"mode must be one of {SECTIONS}, action one of {ACTIONS}")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise HTTPError(400, "bad Content-Length")
+        if length <= 0:
+            raise HTTPError(411, "Content-Length required")
+        if length > self.server.max_body:
+            raise HTTPError(413, f"request body over {self.server.max_body} bytes")
+        body = self.rfile.read(length)
+        try:
+            ET.fromstring(body)
+        except ET.ParseError as e:
+            raise HTTPError(400, f"not MusicXML: {e}")
+        out = self._run(arbeitsblatt, body, mode, action)
+        self._send(200, out, "application/vnd.recordare.musicxml+xml", f"{mode}_arbeitsblatt.musicxml")
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+def make_server(cfg, host, port, workers, max_inflight, max_body, queue_timeout=5.0, job_timeout=60.0, quiet=False):
+    srv = Server((host, port), Handler)
+    srv.cfg = cfg
+    srv.profiles = set((cfg.get("profiles") or {}).keys())
+    srv.sections = [s for s in SECTIONS if (cfg.get("inputs") or {}).get(s)]
+    srv.workers = workers or os.cpu_count() or 1
+    srv.max_inflight = max_inflight or 2 * srv.workers
+    srv.slots = threading.BoundedSemaphore(srv.max_inflight)
+    srv.max_body = max_body
+    srv.queue_timeout, srv.job_timeout, srv.quiet = queue_timeout, job_timeout, quiet
+    ctx = multiprocessing.get_context()
+    srv.pool = ProcessPoolExecutor(max_workers=srv.workers, mp_context=ctx, initializer=_init_worker,
+                                   initargs=(cfg, ctx.Barrier(srv.workers)))
+    # start and warm every worker before accepting connections: the warm-up tasks wait for each other,
+    # so the pool cannot hand two of them to one worker
+    list(srv.pool.map(_warm, range(srv.workers)))
+    return srv
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve generation, Arbeitsblatt and bundle endpoints on the local network.")
+    ap.add_argument("--config", default=str(HERE / "uebungsblatt.yaml"))
+    ap.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to serve the local network")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=None, help="Generator processes (default: CPU count)")
+    ap.add_argument("--max-inflight", type=int, default=None, help="Requests generating at once; more wait, then get 503 (default: 2x workers)")
+    ap.add_argument("--max-body", type=int, default=2_000_000, help="Largest accepted upload in bytes")
+    ap.add_argument("--quiet", action="store_true", help="No per-request log lines")
+    args = ap.parse_args()
+
+    srv = make_server(load_cfg(Path(args.config)), args.host, args.port, args.workers, args.max_inflight, args.max_body,
+                      quiet=args.quiet)
+    print(f"Serving on http://{args.host}:{args.port} with {srv.workers} worker(s), {srv.max_inflight} in flight")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close(); srv.pool.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# Distribution report over many generated files (e.g. an unpacked --bundle or a web bank build):
+# pitch range, accidental frequency, harmonic and melodic intervals, per section, variant folder or profile.
+# Needs numpy (ScoreMatrix in musicxml_utils).
+import argparse
+import json
+import re
+from pathlib import Path
+
+from musicxml_utils import ScoreMatrix, INTERVAL_TO_SEMITONES, midi_to_pitch
+
+ALTER_NAMES = {-2: "bb", -1: "b", 0: "natural", 1: "#", 2: "x"}
+SEMITONE_NAMES = {v: k for k, v in INTERVAL_TO_SEMITONES.items()}
+
+def group_label(path, by):
+    p = Path(path)
+    if by == "name":
+        return p.name[:-len(".music.xml")] if p.name.lower().endswith(".music.xml") else p.stem
+    if by == "folder":
+        return p.parent.name
+    return re.sub(r"_seed-?\d+$", "", p.parent.name)  # bundle folders are <profile>_seed<N>
+
+def interval_name(semitones):
+    octaves, rest = divmod(abs(int(semitones)), 12)
+    if rest == 0 and octaves:
+        return "P8" if octaves == 1 else f"{octaves}xP8"
+    name = SEMITONE_NAMES.get(rest, "P1")
+    return name if not octaves else f"{name}+{octaves}xP8"
+
+def pitch_name(midi):
+    step, alter, octave = midi_to_pitch(int(midi))
+    return f"{step}{'#' if alter else ''}{octave}"
+
+def summarize(m, mask, visible_only):
+    if visible_only:
+        mask = mask & m.visible
+    pitched = mask & m.pitched()
+    files = len(set(m.file[mask].tolist()))
+    lo_hi = m.pitch_range(by="part", mask=mask)
+    lo = min((a for a, _ in lo_hi.values()), default=None)
+    hi = max((b for _, b in lo_hi.values()), default=None)
+    harmonic = m.harmonic_intervals(mask)
+    melodic = m.melodic_intervals(mask)
+    count = lambda values: {k: int(v) for k, v in sorted(_counts(values).items())}
+    return {
+        "files": files, "notes": int(mask.sum()), "pitched": int(pitched.sum()),
+        "range": [pitch_name(lo), pitch_name(hi)] if lo is not None else None,
+        "accidentals": {ALTER_NAMES.get(k, str(k)): v for k, v in m.histogram("alter", pitched).items()},
+        "harmonic": {interval_name(k): v for k, v in count(harmonic).items()},
+        "melodic": {(("+" if k > 0 else "-") if k else "") + interval_name(k): v for k, v in count(melodic).items()},
+    }
+
+def _counts(values):
+    import numpy as np
+    keys, counts = np.unique(values, return_counts=True)
+    return dict(zip(keys.tolist(), counts.tolist()))
+
+def main():
+    ap = argparse.ArgumentParser(description="Pitch, accidental and interval distributions across generated MusicXML files.")
+    ap.add_argument("directory", help="Folder with .musicxml files (searched recursively)")
+    ap.add_argument("--by", default="name", choices=["name", "folder", "profile"],
+                    help="Group by file name (section), variant folder, or profile (bundle folder without _seedN)")
+    ap.add_argument("--visible", action="store_true", help="Only count printed notes (what the students see)")
+    ap.add_argument("--cache", default=None, metavar="FILE.npz", help="Reuse parsed arrays while the folder is unchanged")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--json", action="store_true", help="Print JSON instead of a text report")
+    args = ap.parse_args()
+
+    m = ScoreMatrix.load_dir(args.directory, workers=args.workers, cache=args.cache)
+    labels = {}
+    for i, f in enumerate(m.files):
+        labels.setdefault(group_label(f, args.by), []).append(i)
+    report = {label: summarize(m, m.mask(file=ids), args.visible) for label, ids in sorted(labels.items())}
+    if args.json:
+        print(json.dumps(report, indent=1, ensure_ascii=False))
+        return
+    for label, s in report.items():
+        print(f"== {label}: {s['files']} file(s), {s['notes']} notes, {s['pitched']} pitched"
+              + (f", range {s['range'][0]}-{s['range'][1]}" if s["range"] else ""))
+        for key in ("accidentals", "harmonic", "melodic"):
+            if s[key]:
+                print(f"   {key}: " + ", ".join(f"{k} {v}" for k, v in s[key].items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# The tools are flat scripts in the repo root; import them as modules.
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+@pytest.fixture(scope="session")
+def template():
+    """Path of a committed Sibelius template by section name (scales, intervals, chords, rhythm)."""
+    return lambda name: str(REPO / "sibelius" / f"Hoeren_{name}.musicxml")
+
+@pytest.fixture(scope="session")
+def cfg():
+    """The repo's uebungsblatt.yaml, compiled, with template paths made absolute so tests run from any directory."""
+    from uebungsblatt_config import load_cfg
+    cfg = load_cfg(REPO / "uebungsblatt.yaml")
+    return dict(cfg, inputs={k: str(REPO / v) for k, v in cfg["inputs"].items()})
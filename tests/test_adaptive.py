@@ -0,0 +1,88 @@
+import hashlib
+
+import pytest
+
+import adaptive
+import generate_chords
+import generate_intervals
+from make_arbeitsblatt import answer_key
+from musicxml_utils import alias_draw, read_tree
+
+CSV = """class,section,item,correct
+7a,intervals,M6 down,0
+7a,intervals,M6 down,0
+7a,intervals,M6 down,0
+7a,intervals,P5 up,1
+7a,intervals,P5 up,1
+7b,intervals,M6 down,1
+7a,chords,dim second,3,4
+"""
+
+@pytest.fixture
+def results(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_text(CSV.replace("correct\n", "correct,attempts\n"), encoding="utf-8")
+    return path
+
+def test_read_counts(results):
+    counts = adaptive.read_counts(results, "7a")
+    assert counts["intervals"] == {("M6", "down"): [3.0, 3.0], ("P5", "up"): [0.0, 2.0]}
+    assert counts["chords"] == {("dim", "second"): [1.0, 4.0]}
+    assert adaptive.read_counts(results)["intervals"][("M6", "down")] == [3.0, 4.0]
+
+def test_error_rates_are_smoothed():
+    counts = {("M6", "down"): [3.0, 3.0], ("P5", "up"): [0.0, 2.0]}
+    m6, p5, m3_down, unseen = adaptive.error_rates(counts, [("M6", "down"), ("P5", "up"), ("m3", "down"), ("m3", "up")])
+    assert 0 < p5 < unseen < m3_down < m6 < 1  # m3 down shares the "down" token with the missed M6
+    assert adaptive.error_rates({}, [("M6", "down")]) == [0.5]
+
+def test_sampling_weights():
+    assert adaptive.sampling_weights([0.0, 0.0], 0.7) == [0.5, 0.5]
+    w = adaptive.sampling_weights([0.1, 0.3], 0.5)
+    assert sum(w) == pytest.approx(1) and w == pytest.approx([0.25 + 0.125, 0.25 + 0.375])
+    assert adaptive.sampling_weights([0.1, 0.3], 2.0) == pytest.approx([0.25, 0.75])
+
+def test_tables_are_cached(results):
+    cands = [("M6", "down"), ("P5", "up")]
+    first = adaptive.AdaptiveTables(results, "7a")
+    prob, alias = first.table("intervals", cands)
+    assert first.cache.exists() and len(prob) == len(alias) == 2
+    second = adaptive.AdaptiveTables(results, "7a")
+    assert second.table("intervals", cands) == (prob, alias) and second._counts is None  # served from the cache
+    results.write_text(results.read_text() + "7a,intervals,P5 up,0,5\n", encoding="utf-8")
+    assert adaptive.AdaptiveTables(results, "7a").cache != first.cache
+
+def test_alias_draws_follow_the_weights(results):
+    cands = [("M6", "down"), ("P5", "up")]
+    tab = adaptive.AdaptiveTables(results, "7a", mix=1.0).table("intervals", cands)
+    import random
+    rng = random.Random(0)
+    draws = [alias_draw(tab, rng) for _ in range(4000)]
+    weights = adaptive.sampling_weights(adaptive.error_rates(adaptive.read_counts(results, "7a")["intervals"], cands), 1.0)
+    assert draws.count(0) / len(draws) == pytest.approx(weights[0], abs=0.03)
+
+# sha256[:16] for seeds 1, 2, 3, recorded before adaptive weighting existed: without --results nothing may change.
+BEFORE_ADAPTIVE = [
+    (generate_intervals, "intervals", ["bd551e469222acd4", "7397822fab53d4c2", "cb2b6215257119dd"]),
+    (generate_chords, "chords", ["6df26c5e1ad4258f", "2c0dd64e9de67253", "0c1f4ba9cb203a95"]),
+]
+
+@pytest.mark.parametrize("module, name, digests", BEFORE_ADAPTIVE)
+def test_output_without_results_is_unchanged(template, tmp_path, module, name, digests):
+    for seed, digest in zip((1, 2, 3), digests):
+        out = tmp_path / f"{seed}.musicxml"
+        module.main(["--input", template(name), "--output", str(out), "--seed", str(seed)])
+        assert hashlib.sha256(out.read_bytes()).hexdigest()[:16] == digest, seed
+
+def test_results_oversample_weak_intervals(template, tmp_path):
+    results = tmp_path / "class.csv"  # every upward interval answered right but the M6
+    results.write_text("class,section,item,correct,attempts\n" + "".join(
+        f"7a,intervals,{ivl} up,{0 if ivl == 'M6' else 10},10\n" for ivl in generate_intervals.INTERVAL_TABLE), encoding="utf-8")
+    def m6(*extra):
+        n = 0
+        for seed in range(1, 9):
+            out = tmp_path / "i.musicxml"
+            generate_intervals.main(["--input", template("intervals"), "--output", str(out), "--seed", str(seed)] + list(extra))
+            n += sum(line.count("M6 up") for line in answer_key(read_tree(str(out)).getroot(), "intervals"))
+        return n
+    assert m6("--results", str(results), "--class-name", "7a", "--adaptive-mix", "1") > 3 * m6()
@@ -0,0 +1,45 @@
+import json
+import random
+
+import pytest
+
+import build_web_bank as wb
+
+def test_line_patch_round_trip():
+    rng = random.Random(0)
+    base = [f"<l{i}/>" for i in range(40)]
+    for _ in range(50):
+        new = [rng.choice(["<x/>", line]) for line in base if rng.random() > 0.1] + ["<tail/>"] * rng.randrange(3)
+        assert wb.apply_patch(base, wb.line_patch(base, "\n".join(new))) == "\n".join(new)
+
+def unpack(chunk, seed):
+    lines = chunk["lines"]
+    return [[[i1, i2, [lines[k] for k in ks]] for i1, i2, ks in patch] for patch in chunk["variants"][str(seed)]]
+
+def test_bank_reproduces_cli_output(cfg, tmp_path):
+    out = tmp_path / "bank"
+    assert wb.build(cfg, [""], [3, 4, 5], out, 2, workers=1)[0] == 3
+    index = json.loads((out / "index.json").read_text())
+    assert wb.is_bank(out) and index["seeds"] == [3, 5]
+    for section, (family, sheet, ab) in wb.render_variant(cfg, "", 4).items():
+        base = [(out / section / name).read_text(encoding="utf-8").split("\n")
+                for name in ("base.musicxml", "base_arbeitsblatt.musicxml")]
+        assert index["sections"][section]["families"][""] == family
+        chunk = json.loads((out / section / family / "chunk_0000.json").read_text(encoding="utf-8"))
+        assert [wb.apply_patch(b, p) for b, p in zip(base, unpack(chunk, 4))] == [sheet, ab]
+
+def test_rebuild_replaces_only_a_bank(cfg, tmp_path):
+    """Regression: --outdir pointing at real data (OUT, the repo root) must be refused, not wiped."""
+    data = tmp_path / "OUT"
+    data.mkdir(); (data / "sheet.musicxml").write_text("keep")
+    with pytest.raises(ValueError):
+        wb.build(cfg, [""], [1], data, 25, workers=1)
+    assert (data / "sheet.musicxml").read_text() == "keep"
+
+    bank = tmp_path / "bank"
+    bank.mkdir()  # an existing empty folder is fine
+    wb.build(cfg, [""], [1], bank, 25, workers=1)
+    (bank / "stale.json").write_text("{}")
+    wb.build(cfg, [""], [2], bank, 25, workers=1)
+    assert not (bank / "stale.json").exists()
+    assert json.loads((bank / "index.json").read_text())["seeds"] == [2, 2]
@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+import difficulty as df
+import generate_chords
+import generate_intervals
+
+def test_accidental_cost():
+    assert [df.accidental_cost(a) for a in (0, 1, -1, 2, -2)] == [0.0, 0.75, 1.0, 1.5, 2.0]
+
+def test_pick_by_difficulty_takes_the_nearest():
+    rng = random.Random(0)
+    assert df.pick_by_difficulty([], [], rng, 3.0) is None
+    assert df.pick_by_difficulty("abc", [1.0, 2.9, 5.0], rng, 3.0) == 1
+    assert {df.pick_by_difficulty("abc", [2.0, 4.0, 9.0], random.Random(s), 3.0) for s in range(20)} == {0, 1}
+
+@pytest.mark.parametrize("module, section, args", [
+    (generate_chords, "chords", ["--triads", "maj,min,dim,aug,dom7,maj7,min7,hdim7,dim7"]),
+    (generate_intervals, "intervals", []),
+])
+def test_target_difficulty_moves_the_sheet(template, tmp_path, module, section, args):
+    means = []
+    for target in (1.0, 7.0):
+        out = tmp_path / f"Hoeren_{section}_{target:g}.musicxml"
+        module.main(["--input", template(section), "--output", str(out), "--seed", "3", "--target-difficulty", str(target)] + args)
+        scores = df.score_file(str(out))
+        assert scores
+        means.append(sum(scores) / len(scores))
+    assert means[0] < means[1]
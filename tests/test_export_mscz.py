@@ -0,0 +1,42 @@
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+
+import pytest
+
+import export_mscz as em
+import generate_scales
+import make_arbeitsblatt
+
+def test_tpc():
+    assert [em.tpc(*p) for p in (("C", 0), ("G", 0), ("F", 1), ("B", -1), ("E", -2))] == [14, 15, 20, 12, 4]
+
+@pytest.mark.parametrize("ticks, expected", [(480, [("quarter", 0)]), (1440, [("half", 1)]),
+                                             (2400, [("whole", 0), ("quarter", 0)]), (180, [("16th", 1)]),
+                                             (160, [("16th", 0), ("64th", 0)])])  # snapped to the 64th grid
+def test_split_ticks(ticks, expected):
+    assert em.split_ticks(ticks) == expected
+
+def mscx(root, stem="x"):
+    with zipfile.ZipFile(io.BytesIO(em.mscz_bytes(root, stem))) as zf:
+        assert f'full-path="{stem}.mscx"' in zf.read("META-INF/container.xml").decode()
+        return ET.fromstring(zf.read(stem + ".mscx"))
+
+def test_every_section_converts(cfg):
+    for section, path in cfg["inputs"].items():
+        root = ET.parse(path).getroot()
+        score = mscx(root).find("Score")
+        n_measures = len(root.find("part").findall("measure"))
+        assert [len(st.findall("Measure")) for st in score.findall("Staff")] == \
+            [n_measures] * len(score.findall("Staff")), section
+
+def test_hidden_notes_and_accidentals_stay_hidden(template, tmp_path):
+    sheet, ab = tmp_path / "s.musicxml", tmp_path / "ab.musicxml"
+    generate_scales.main(["--input", template("scales"), "--output", str(sheet), "--seed", "2", "--alter-ratio", "1"])
+    make_arbeitsblatt.main(["--mode", "scales", "--input", str(sheet), "--output", str(ab)])
+    root = ET.parse(ab).getroot()
+    hidden = [n for n in root.iter("note") if n.find("pitch") is not None and n.get("print-object") == "no"]
+    notes = [n for n in mscx(root).iter("Note") if n.findtext("visible") == "0"]
+    assert hidden and len(notes) == len(hidden)
+    assert all(a.findtext("visible") == "0" for n in notes for a in n.findall("Accidental"))
+    assert any(n.find("Accidental") is not None for n in notes)
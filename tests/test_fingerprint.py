@@ -0,0 +1,63 @@
+import argparse
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import fingerprint as fp
+import generate_chords
+
+def test_hamming():
+    assert fp.hamming([1, 2, 3], [1, 2, 3]) == 0
+    assert fp.hamming([1, 2, 3], [1, 5, 3]) == 1
+    assert fp.hamming([1, 2, 3], [1, 2]) == 1
+
+@pytest.mark.parametrize("d", [1, 2, 3, 5])
+def test_block_index_matches_brute_force(d):
+    rng = random.Random(d)
+    store, stored = fp.FingerprintStore(min_distance=d), []
+    for _ in range(300):
+        base = rng.choice(stored) if stored and rng.random() < 0.7 else [rng.randrange(4) for _ in range(8)]
+        vec = [rng.randrange(4) if rng.random() < 0.25 else v for v in base]
+        expected = any(fp.hamming(s, vec) < d for s in stored)
+        assert store.is_duplicate("chords", vec) == expected
+        if not expected:
+            store.add("chords", vec); stored.append(vec)
+
+def test_store_persists_and_separates_sections(tmp_path):
+    path = tmp_path / "fp.tsv"
+    fp.FingerprintStore(str(path), 2).add("chords", [1, 2, 3, 4])
+    store = fp.FingerprintStore(str(path), 2)
+    assert store.is_duplicate("chords", [1, 2, 3, 4]) and store.is_duplicate("chords", [1, 2, 3, 9])
+    assert not store.is_duplicate("intervals", [1, 2, 3, 4])
+
+def dedupe_args(path, **kw):
+    return argparse.Namespace(**dict(dict(fingerprints=str(path), min_distance=1, max_redraws=2, salt=0, require_unique=False), **kw))
+
+def constant(root, salt):
+    return 0
+
+def test_exhausted_redraws_warn_and_are_not_recorded(template, tmp_path, capsys):
+    """Regression: a variant that is still a duplicate goes to stderr and never into the store."""
+    tree, path = ET.parse(template("chords")), tmp_path / "fp.tsv"
+    fp.generate_unique(tree, "chords", constant, dedupe_args(path))
+    lines = path.read_text()
+    fp.generate_unique(tree, "chords", constant, dedupe_args(path))
+    assert "still a duplicate after 2 re-draws" in capsys.readouterr().err
+    assert path.read_text() == lines
+
+def test_require_unique_exits_nonzero(template, tmp_path):
+    tree, path = ET.parse(template("chords")), tmp_path / "fp.tsv"
+    fp.generate_unique(tree, "chords", constant, dedupe_args(path))
+    with pytest.raises(SystemExit) as e:
+        fp.generate_unique(tree, "chords", constant, dedupe_args(path, require_unique=True))
+    assert e.value.code != 0
+
+def test_generator_redraws_a_stored_variant(template, tmp_path):
+    store = tmp_path / "fp.tsv"
+    outs = [tmp_path / f"{i}.musicxml" for i in range(2)]
+    for out in outs:
+        generate_chords.main(["--input", template("chords"), "--output", str(out), "--seed", "1", "--fingerprints", str(store)])
+    vecs = [fp.item_vector(ET.parse(o).getroot(), "chords") for o in outs]
+    assert vecs[0] != vecs[1]
+    assert len(store.read_text().splitlines()) == 2
@@ -0,0 +1,41 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import generate_chords as gc
+from musicxml_utils import note_pitch
+
+def test_root_position_keeps_tones_above_root():
+    assert gc.CHORD_TABLE[("C", 0, "maj", "root")] == (("C", 0, 0), ("E", 0, 0), ("G", 0, 0))
+    assert gc.CHORD_TABLE[("A", 0, "min", "root")] == (("A", 0, 0), ("C", 0, 1), ("E", 0, 1))
+
+def test_inversions_drop_lower_tones_below_root():
+    assert gc.CHORD_TABLE[("C", 0, "maj", "first")] == (("E", 0, -1), ("G", 0, -1), ("C", 0, 0))
+    assert gc.CHORD_TABLE[("G", 0, "dom7", "third")] == (("F", 0, 0), ("G", 0, 0), ("B", 0, 0), ("D", 0, 1))
+    assert gc.CHORD_TABLE[("C", 0, "maj", "third")] is None
+
+@pytest.mark.parametrize("key", [k for k, v in gc.CHORD_TABLE.items() if v])
+def test_table_round_trips_through_classify(key):
+    step, alter, quality, inversion = key
+    tones = [(s, a, 4 + o) for s, a, o in gc.CHORD_TABLE[key]]
+    assert gc.classify_chord(tones) == key
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_root_position_chords_stay_in_template_register(template, tmp_path, seed):
+    src, out = template("chords"), tmp_path / "chords.musicxml"
+    gc.main(["--input", src, "--output", str(out), "--inversion", "root", "--triads", "maj,min,dim,aug", "--seed", str(seed)])
+    before = [[note_pitch(g[0])[2] for g in gc.chord_groups(m)] for m in ET.parse(src).getroot().iter("measure")]
+    after = [gc.chord_groups(m) for m in ET.parse(out).getroot().iter("measure")]
+    for octaves, groups in zip(before, after):
+        assert [note_pitch(g[0])[2] for g in groups] == octaves
+        for g in groups:
+            if len(g) > 1:  # the lower staff keeps single notes
+                assert gc.classify_chord([note_pitch(n) for n in g])[3] == "root"
+
+def test_existing_chords_are_rewritten(template, tmp_path):
+    src, out = template("chords"), tmp_path / "chords.musicxml"
+    gc.main(["--input", src, "--output", str(out), "--seed", "5"])
+    chords = lambda path: [[note_pitch(n) for n in g] for m in ET.parse(path).getroot().iter("measure")
+                           for g in gc.chord_groups(m) if len(g) > 1]
+    assert len(chords(out)) >= len(chords(src))
+    assert all(gc.classify_chord(c) for c in chords(out))
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import generate_melodies as gm
+from musicxml_utils import alias_draw, note_pitch, read_tree
+
+@pytest.mark.parametrize("name, key", [("C", (0, "major")), ("Bb", (-2, "major")), ("F#", (6, "major")),
+                                       ("a", (0, "minor")), ("f#", (3, "minor")), ("eb", (-6, "minor")), (" g ", (-2, "minor"))])
+def test_parse_key(name, key):
+    assert gm.parse_key(name) == key
+    assert gm.key_name(*key) == name.strip() + (" major" if name.strip()[0].isupper() else " minor")
+
+@pytest.mark.parametrize("name", ["", "H", "C##", "Cm", "Fb", "e#"])
+def test_parse_key_errors(name):
+    with pytest.raises(ValueError):
+        gm.parse_key(name)
+
+def test_tonic_of():
+    assert gm.tonic_of(-2, "major") == ("B", -1)
+    assert gm.tonic_of(3, "minor") == ("F", 1)
+    assert gm.tonic_of(7, "major") == ("C", 1)
+
+def test_parse_range():
+    assert gm.parse_range("C4-G5") == (28, 39)
+    assert gm.parse_range(" a3 - e4 ") == (26, 30)
+    for spec in ("C4-F4", "C4", "X4-G5", None):
+        with pytest.raises(ValueError):
+            gm.parse_range(spec)
+
+def test_key_pitch_raises_the_leading_tone_in_minor():
+    assert gm.key_pitch(32, 0, "minor") == ("G", 1, 4)
+    assert gm.key_pitch(32, 0, "major") == ("G", 0, 4)
+    assert gm.key_pitch(27, -2, "major") == ("B", -1, 3)
+
+@pytest.mark.parametrize("difficulty", [1.0, 2.5, 4.0])
+def test_transition_table(difficulty):
+    lo, hi = gm.parse_range("C4-G5")
+    states, reach, tonics, starts = gm.transition_table(-1, "minor", lo, hi, difficulty)
+    assert reach == gm.MAX_LEAP[round(difficulty)]
+    assert set(states) == {(d, last) for d in range(lo, hi + 1) for last in (-1, 0, 1)}
+    for (d, _), (nxt, (prob, alias)) in states.items():
+        assert nxt and all(lo <= e <= hi and abs(e - d) <= reach and abs(e - d) != 6 for e in nxt)
+        assert len(prob) == len(alias) == len(nxt)
+        assert all(0 <= p <= 1 for p in prob) and all(0 <= a < len(nxt) for a in alias)
+    assert tonics == [d for d in range(lo, hi + 1) if gm.STEPS[d % 7] == "D"]
+    assert set(tonics) <= set(starts)
+
+def test_alias_tables_follow_the_move_weights():
+    lo, hi = gm.parse_range("C4-G5")
+    nxt, tab = gm.transition_table(0, "major", lo, hi, 1.0)[0][(33, 0)]
+    prob, alias = tab
+    share = [(p + sum(1 - q for q, a in zip(prob, alias) if a == i)) / len(prob) for i, p in enumerate(prob)]
+    assert sum(share) == pytest.approx(1)
+    assert sum(w for e, w in zip(nxt, share) if abs(e - 33) == 1) > 0.7  # easy melodies mostly move by step
+    rng = random.Random(1)
+    draws = [alias_draw(tab, rng) for _ in range(4000)]
+    assert [draws.count(i) / len(draws) for i in range(len(nxt))] == pytest.approx(share, abs=0.03)
+
+@pytest.mark.parametrize("n", [1, 2, 5, 12])
+def test_draw_melody(n):
+    lo, hi = gm.parse_range("A3-E5")
+    table = gm.transition_table(2, "major", lo, hi, 3.0)
+    states, reach, tonics, starts = table
+    for seed in range(20):
+        melody = gm.draw_melody(random.Random(seed), n, table)
+        assert len(melody) == n and all(lo <= d <= hi for d in melody)
+        assert melody[-1] in tonics
+        if n > 1:
+            assert abs(melody[-2] - melody[-1]) == 1
+        if n > 2:  # two notes are just the closing step
+            assert melody[0] in starts
+            assert all(abs(b - a) <= reach for a, b in zip(melody[:-2], melody[1:-1]))
+
+def test_draw_melody_falls_back_onto_the_closing_step():
+    """No drawable move reaches a step from the close in time: the penultimate note still is one."""
+    tab = lambda nxt: (nxt, ([1.0] * len(nxt), list(range(len(nxt)))))
+    states = {(14, 0): tab([13]), (13, 0): tab([12]), (9, 0): tab([10]), (11, 0): tab([10])}
+    table = (states, 1, [10], [14])
+    assert gm.draw_melody(random.Random(0), 3, table) == [14, 11, 10]
+    assert gm.draw_melody(random.Random(0), 2, table) == [11, 10]
+
+def test_main(template, tmp_path):
+    out = tmp_path / "m.musicxml"
+    gm.main(["--input", template("rhythm"), "--output", str(out), "--key", "Bb", "--range", "C4-C5", "--seed", "3"])
+    root = read_tree(str(out)).getroot()
+    assert {k.findtext("fifths") for k in root.iter("key")} == {"-2"}
+    assert [w.text for w in root.iter("words")] == [w.text for w in read_tree(template("rhythm")).getroot().iter("words")]
+    for meas in root.iter("measure"):
+        groups = gm.attack_groups(meas)
+        pitches = [note_pitch(g[0]) for g in groups]
+        assert all(note_pitch(n) == note_pitch(g[0]) for g in groups for n in g)  # ties keep their pitch
+        assert all(28 <= o * 7 + gm.STEPS.index(s) <= 35 for s, _, o in pitches)
+        if pitches:
+            assert pitches[-1][:2] == ("B", -1)
+    again = tmp_path / "again.musicxml"
+    gm.main(["--input", template("rhythm"), "--output", str(again), "--key", "Bb", "--range", "C4-C5", "--seed", "3"])
+    assert again.read_bytes() == out.read_bytes()
+
+@pytest.mark.parametrize("argv", [["--key", "H"], ["--range", "C4-D4"], ["--key", "F#", "--range", "G4-E5"]])
+def test_main_rejects_bad_arguments(template, tmp_path, argv):
+    with pytest.raises(SystemExit):
+        gm.main(["--input", template("rhythm"), "--output", str(tmp_path / "m.musicxml")] + argv)
+
+def test_words_are_added_after_the_section_marker(template, tmp_path):
+    import musicxml_utils as mu
+    out = tmp_path / "m.musicxml"
+    gm.main(["--input", template("rhythm"), "--output", str(out), "--seed", "3", "--words", "Melodie zu Notieren"])
+    root, src = read_tree(str(out)).getroot(), read_tree(template("rhythm")).getroot()
+    marker = mu.find_sections_by_words(src)[0]
+    assert mu.find_sections_by_words(root)[:2] == [marker, ("Melodie zu Notieren", 0, 0)]
@@ -0,0 +1,86 @@
+import xml.etree.ElementTree as ET
+from fractions import Fraction as F
+
+import pytest
+
+import generate_rhythms as gr
+
+def measure_totals(path):
+    """[(sum of note durations, expected measure length)] in divisions, for every measure."""
+    out = []
+    for part in ET.parse(path).getroot().findall("part"):
+        divisions, beats, beat_type = 1, 4, 4
+        for meas in part.findall("measure"):
+            divisions = int(meas.findtext("attributes/divisions") or divisions)
+            beats = int(meas.findtext("attributes/time/beats") or beats)
+            beat_type = int(meas.findtext("attributes/time/beat-type") or beat_type)
+            total = sum(int(n.findtext("duration")) for n in meas.findall("note") if n.find("chord") is None)
+            out.append((total, F(4 * beats * divisions, beat_type)))
+    return out
+
+def all_durations(path):
+    return [int(d.text) for d in ET.parse(path).getroot().iter("duration")]
+
+@pytest.mark.parametrize("divisions", [1, 2, 3, 256])
+def test_library_tokens_fit_divisions(divisions):
+    segs, _, tables = gr.pattern_index(4, F(1), False, 2.0, 0.7, divisions)
+    for pats, _ in tables.values():
+        for tokens in pats:
+            for ln, _, trip, _ in tokens:
+                assert (ln * divisions).denominator == 1
+    assert segs
+
+def test_divisions_factor_covers_triplets_and_16ths():
+    assert gr.divisions_factor(256, {(4, 4)}) == 3
+    assert gr.divisions_factor(1, {(4, 4)}) % 4 == 0
+    assert gr.divisions_factor(768, {(4, 4), (6, 8)}) == 1
+
+@pytest.mark.parametrize("seed", [1, 7])
+def test_template_durations_are_exact(template, tmp_path, seed):
+    out = tmp_path / "rhythm.musicxml"
+    gr.main(["--input", template("rhythm"), "--output", str(out), "--seed", str(seed), "--difficulty", "4"])
+    assert ET.parse(out).getroot().findtext(".//divisions") == "768"
+    assert all(d > 0 for d in all_durations(out))
+    assert all(total == length for total, length in measure_totals(out))
+
+def test_low_divisions_template(template, tmp_path):
+    """A template exported with <divisions>1</divisions> must not get rounded or zero durations."""
+    tree = ET.parse(template("rhythm"))
+    for d in tree.getroot().iter("divisions"):
+        d.text = "1"
+    for d in tree.getroot().iter("duration"):
+        d.text = str(max(1, round(int(d.text) / 256)))
+    src, out = tmp_path / "low.musicxml", tmp_path / "out.musicxml"
+    tree.write(src, encoding="utf-8", xml_declaration=True)
+    gr.main(["--input", str(src), "--output", str(out), "--seed", "3", "--difficulty", "4"])
+    assert int(ET.parse(out).getroot().findtext(".//divisions")) > 1
+    assert all(d > 0 for d in all_durations(out))
+    assert all(total == length for total, length in measure_totals(out))
+
+def voice_ends(meas):
+    """Position after each voice's last event, in divisions, following <backup>/<forward>."""
+    pos, ends = 0, {}
+    for el in meas:
+        if el.tag == "backup":
+            pos -= int(el.findtext("duration"))
+        elif el.tag == "forward" or (el.tag == "note" and el.find("chord") is None):
+            pos += int(el.findtext("duration"))
+            if el.tag == "note":
+                ends[el.findtext("voice")] = pos
+    return ends
+
+def test_splice_rescales_backups_of_kept_measures(template, tmp_path):
+    """Measure 2 gets a second voice (not refilled); splicing it into a base with raised divisions scales it all."""
+    tree = ET.parse(template("rhythm"))
+    meas = tree.getroot().find("part").findall("measure")[1]
+    ET.SubElement(ET.SubElement(meas, "backup"), "duration").text = "1024"
+    rest = ET.SubElement(meas, "note"); ET.SubElement(rest, "rest")
+    ET.SubElement(rest, "duration").text = "1024"; ET.SubElement(rest, "voice").text = "2"
+    src, base, out = tmp_path / "two.musicxml", tmp_path / "base.musicxml", tmp_path / "out.musicxml"
+    tree.write(src, encoding="utf-8", xml_declaration=True)
+    gr.main(["--input", str(src), "--output", str(base), "--seed", "1"])
+    gr.main(["--input", str(src), "--output", str(out), "--seed", "1", "--base", str(base), "--measures", "1-2", "--salt", "1"])
+    measures = ET.parse(out).getroot().find("part").findall("measure")
+    assert voice_ends(measures[1]) == {"1": 3072, "2": 3072}
+    assert measures[1].findtext("backup/duration") == "3072"
+    assert all(total == length for total, length in measure_totals(out)[2:])
@@ -0,0 +1,40 @@
+import shutil
+
+import index_corpus as ic
+
+def corpus(tmp_path, template):
+    for folder, names in (("a", ("chords", "intervals")), ("b", ("scales",))):
+        (tmp_path / folder).mkdir()
+        for name in names:
+            shutil.copy(template(name), tmp_path / folder / f"{name}.musicxml")
+    return ic.connect(str(tmp_path / "index.sqlite"))
+
+def indexed(con):
+    return sorted(p.rsplit("/", 2)[-2] + "/" + p.rsplit("/", 1)[-1] for (p,) in con.execute("SELECT path FROM files"))
+
+def test_update_indexes_and_skips_unchanged(tmp_path, template):
+    con = corpus(tmp_path, template)
+    assert ic.update_index(con, [tmp_path / "a", tmp_path / "b"], workers=1) == (3, 0, [])
+    assert ic.update_index(con, [tmp_path / "a", tmp_path / "b"], workers=1) == (0, 0, [])
+    assert ic.query(con, "chords")
+    up = ic.query(con, "intervals", direction="up")
+    assert up and all(r[4] == "up" for r in up)
+
+def test_update_prunes_only_under_scanned_roots(tmp_path, template):
+    """Regression: rescanning one root must not drop the files of the others."""
+    con = corpus(tmp_path, template)
+    ic.update_index(con, [tmp_path / "a", tmp_path / "b"], workers=1)
+    (tmp_path / "a" / "chords.musicxml").unlink()
+    (tmp_path / "b" / "scales.musicxml").unlink()
+    assert ic.update_index(con, [tmp_path / "a"], workers=1) == (0, 1, [])
+    assert indexed(con) == ["a/intervals.musicxml", "b/scales.musicxml"]
+    assert ic.update_index(con, [tmp_path / "b"], workers=1) == (0, 1, [])
+    assert indexed(con) == ["a/intervals.musicxml"]
+
+def test_unparsable_change_drops_the_old_rows(tmp_path, template):
+    con = corpus(tmp_path, template)
+    ic.update_index(con, [tmp_path / "a"], workers=1)
+    (tmp_path / "a" / "chords.musicxml").write_text("<score-partwise><part>", encoding="utf-8")
+    n, removed, errors = ic.update_index(con, [tmp_path / "a"], workers=1)
+    assert (n, removed) == (0, 0) and [p.rsplit("/", 1)[-1] for p, _ in errors] == ["chords.musicxml"]
+    assert indexed(con) == ["a/intervals.musicxml"] and not ic.query(con, "chords")
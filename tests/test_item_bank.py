@@ -0,0 +1,66 @@
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import item_bank as ib
+from generate_chords import chord_groups, classify_chord
+from generate_intervals import collect_events, pair_whole_with_quarter, classify_interval
+from generate_scales import is_visible
+from musicxml_utils import note_pitch
+
+@pytest.fixture(scope="module")
+def bank(tmp_path_factory, template):
+    con = ib.connect(tmp_path_factory.mktemp("bank") / "bank.sqlite")
+    ib.insert(con, ib.interval_items([2, 3, 4, 5]))
+    ib.insert(con, ib.chord_items([2, 3, 4, 5]))
+    ib.insert(con, ib.scale_bar_items(template("scales"), 5, [1, -1], 3, 0))
+    return con
+
+def intervals(root):
+    return [(b["pitch"], t["pitch"]) for m in root.iter("measure") for b, t in pair_whole_with_quarter(collect_events(m))]
+
+def chords(root):
+    return [[note_pitch(n) for n in g] for m in root.iter("measure") for g in chord_groups(m) if len(g) > 1]
+
+def root_octave(chord):
+    step, alter = classify_chord(chord)[:2]
+    return next(o for s, a, o in chord if (s, a) == (step, alter))
+
+def test_parse_where():
+    assert ib.parse_where("name=M6|m6, alter=1,direction=down") == {"name": ["M6", "m6"], "alter_": ["1"], "direction": ["down"]}
+    with pytest.raises(ValueError):
+        ib.parse_where("colour=red")
+
+def test_fill_intervals_keeps_register_and_filters(bank, template):
+    root = ET.parse(template("intervals")).getroot()
+    before = [b[1] for b, _ in intervals(root)]
+    assert ib.fill_intervals(bank, root, ib.parse_where("name=M6,direction=down"), random.Random(1)) == len(before)
+    after = intervals(root)
+    assert [b[1] for b, _ in after] == before
+    assert {classify_interval(b, t) for b, t in after} == {("M6", "down")}
+
+def test_fill_chords_keeps_register(bank, template):
+    """Regression: a bank built over several octaves must not move chords out of the template's register."""
+    root = ET.parse(template("chords")).getroot()
+    before = [c[0][2] for c in chords(root)]
+    ib.fill_chords(bank, root, ib.parse_where("name=dim"), random.Random(2))
+    after = chords(root)
+    assert [root_octave(c) for c in after] == before  # inversions drop the tones below the root
+    assert {classify_chord(c)[2] for c in after} == {"dim"}
+
+def test_octave_filter_only_selects_slots(bank, template):
+    root = ET.parse(template("intervals")).getroot()
+    before = intervals(root)
+    octave = before[0][0][1]
+    n = ib.fill_intervals(bank, root, ib.parse_where(f"octave={octave}"), random.Random(3))
+    assert n == sum(1 for b, _ in before if b[1] == octave)
+    assert [p for p in intervals(root) if p[0][1] != octave] == [p for p in before if p[0][1] != octave]
+
+def test_fill_scales_alters_the_requested_count(bank, template):
+    root = ET.parse(template("scales")).getroot()
+    assert ib.fill_scales(bank, root, ib.parse_where("n_altered=2"), random.Random(4), template("scales")) > 0
+    for meas in root.iter("measure"):
+        notes = meas.findall(".//note[pitch]")
+        if len(notes) > 5:
+            assert sum(1 for n in notes if not is_visible(n) and note_pitch(n)[1]) == 2
@@ -0,0 +1,105 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import make_arbeitsblatt as mab
+import uebungsblatt_cli as cli
+from musicxml_utils import Overlay, captured_outputs, read_tree
+
+TEMPLATES = {"scales": "scales", "intervals": "intervals", "chords": "chords", "rhythms": "rhythm", "melodies": "rhythm"}
+
+@pytest.fixture
+def sheet(template, tmp_path):
+    """Path of an Übungsblatt for a page; the melodies one is generated over the rhythm template."""
+    def make(page):
+        if page != "melodies":
+            return template(TEMPLATES[page])
+        import generate_melodies
+        out = tmp_path / "melodies.musicxml"
+        generate_melodies.main(["--input", template("rhythm"), "--output", str(out), "--seed", "4"])
+        return str(out)
+    return make
+
+def test_overlay_apply_revert_restores_tree():
+    root = ET.fromstring('<m><note a="1"><pitch/><type/></note><note/><forward/></m>')
+    before = ET.tostring(root)
+    n1, n2, fwd = list(root)
+    ov = Overlay()
+    ov.set(n1, "a", "2"); ov.set(n1, "print-object", "no")
+    ov.remove(n1, n1.find("pitch")); ov.insert(n1, ET.Element("rest"), before=n1.find("type"))
+    ov.replace(root, n2, ET.Element("backup")); ov.insert(root, ET.Element("barline"))
+    undo = ov.apply()
+    assert ET.tostring(root) == (b'<m><note a="2" print-object="no"><rest /><type /></note><backup /><forward />'
+                                 b'<barline /></m>')
+    Overlay.revert(undo)
+    assert ET.tostring(root) == before and list(root) == [n1, n2, fwd]
+
+@pytest.mark.parametrize("page", mab.PAGES)
+def test_overlays_leave_the_tree_untouched(sheet, page):
+    root = read_tree(sheet(page)).getroot()
+    before = ET.tostring(root)
+    for action in mab.ACTIONS:
+        ov, _ = mab.overlay_for(root, page, action)
+        with ov.applied():
+            pass
+        assert ET.tostring(root) == before, action
+
+@pytest.mark.parametrize("page", mab.PAGES)
+def test_write_outputs_matches_separate_runs(sheet, tmp_path, page):
+    src = sheet(page)
+    outputs = [(a, str(tmp_path / f"{a}.musicxml")) for a in mab.ACTIONS]
+    with captured_outputs() as files:
+        written = mab.write_outputs(read_tree(src), page, outputs)
+        for action, path in outputs:
+            tree = read_tree(src)
+            n = mab.apply_mode(tree.getroot(), page, action)
+            mab.save(tree, path + ".alone")
+            assert files[path] == files[path + ".alone"], action
+            assert (action, path, n) in written
+
+def test_cli_also_writes_each_variant(template, tmp_path):
+    main, also = tmp_path / "hide.musicxml", tmp_path / "delete.musicxml"
+    mab.main(["--mode", "intervals", "--input", template("intervals"), "--output", str(main),
+              "--also", f"delete={also}"])
+    alone = tmp_path / "alone.musicxml"
+    mab.main(["--mode", "intervals", "--action", "delete", "--input", template("intervals"), "--output", str(alone)])
+    assert also.read_bytes() == alone.read_bytes() != main.read_bytes()
+    with pytest.raises(SystemExit):
+        mab.main(["--mode", "intervals", "--input", template("intervals"), "--output", str(main), "--also", "nope"])
+
+def test_section_files_arbeitsblatt_matches_make_arbeitsblatt(cfg, tmp_path):
+    files = {name: data for name, data, _ in cli.section_files(cli.variant_cfg(cfg, None, 7), None)}
+    for section in cli.SECTIONS:
+        stem = cli.OUTPUT_NAMES[section]
+        sheet = tmp_path / f"{stem}.musicxml"
+        sheet.write_bytes(files[stem + ".musicxml"])
+        out = tmp_path / f"{stem}_arbeitsblatt.musicxml"
+        mab.main(["--mode", section, "--action", cfg.get("worksheet", {}).get(section, "hide"),
+                  "--input", str(sheet), "--output", str(out)])
+        assert files[stem + "_arbeitsblatt.musicxml"] == out.read_bytes(), section
+
+def test_rhythm_answer_key_spells_dots_ties_and_tuplets():
+    root = ET.fromstring("""<score-partwise><part id="P1"><measure number="1">
+      <note><pitch><step>G</step><octave>4</octave></pitch><duration>3</duration><type>eighth</type><dot/></note>
+      <note><pitch><step>G</step><octave>4</octave></pitch><duration>1</duration><type>16th</type><tie type="start"/></note>
+      <note><pitch><step>G</step><octave>4</octave></pitch><duration>4</duration><type>quarter</type><tie type="stop"/></note>
+      <note><rest/><duration>2</duration><type>eighth</type></note>
+      <note><pitch><step>G</step><octave>4</octave></pitch><duration>2</duration><type>eighth</type>
+        <time-modification><actual-notes>3</actual-notes><normal-notes>2</normal-notes></time-modification></note>
+    </measure></part></score-partwise>""")
+    assert mab.answer_key(root, "rhythms") == ["m. 1: dotted eighth | 16th tied | quarter | rest eighth | triplet eighth"]
+
+def test_rhythm_answer_key_adds_up_to_the_measure(template, tmp_path):
+    import generate_rhythms
+    from fractions import Fraction as F
+    out = tmp_path / "r.musicxml"
+    generate_rhythms.main(["--input", template("rhythm"), "--output", str(out), "--seed", "1", "--difficulty", "4"])
+    length = {"whole": F(4), "half": F(2), "quarter": F(1), "eighth": F(1, 2), "16th": F(1, 4), "32nd": F(1, 8)}
+    for line in mab.answer_key(read_tree(str(out)).getroot(), "rhythms"):
+        total = 0
+        for name in line.split(": ", 1)[1].split(" | "):
+            words = name.split()
+            ql = length[words[-2] if words[-1] == "tied" else words[-1]]
+            ql *= 2 - F(1, 2 ** words.count("dotted"))
+            total += ql * (F(2, 3) if "triplet" in words else 1)
+        assert total == 4, line
@@ -0,0 +1,129 @@
+import random
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import musicxml_utils as mu
+
+def alias_probabilities(table):
+    prob, alias = table
+    n = len(prob)
+    out = [p / n for p in prob]
+    for i, p in enumerate(prob):
+        out[alias[i]] += (1 - p) / n
+    return out
+
+@pytest.mark.parametrize("weights", [[1], [1, 1, 1], [5, 1, 0, 2], [0.1, 10, 3.5], list(range(1, 20))])
+def test_alias_table_is_exact(weights):
+    total = sum(weights)
+    assert alias_probabilities(mu.build_alias_table(weights)) == pytest.approx([w / total for w in weights])
+
+def test_alias_draw_never_picks_zero_weight():
+    table = mu.build_alias_table([3, 0, 1, 0])
+    rng = random.Random(1)
+    counts = [0] * 4
+    for _ in range(4000):
+        counts[mu.alias_draw(table, rng)] += 1
+    assert counts[1] == counts[3] == 0
+    assert 2700 < counts[0] < 3300
+
+@pytest.mark.parametrize("weights", [[], [0, 0]])
+def test_alias_table_needs_positive_weight(weights):
+    with pytest.raises(ValueError):
+        mu.build_alias_table(weights)
+
+@pytest.mark.parametrize("spec, expected", [(None, None), ("", None), ("3-5", (2, 5)), ("7", (6, 7)), ("2-2", (1, 2))])
+def test_parse_measure_range(spec, expected):
+    assert mu.parse_measure_range(spec) == expected
+
+@pytest.mark.parametrize("spec", ["0", "5-3", "x"])
+def test_parse_measure_range_rejects(spec):
+    with pytest.raises(ValueError):
+        mu.parse_measure_range(spec)
+
+def test_measure_rng_streams_are_independent():
+    draw = lambda *a: mu.measure_rng(*a).random()
+    assert draw(7, "scales", 0, 3) == draw(7, "scales", 0, 3)
+    assert len({draw(7, "scales", 0, 3), draw(7, "scales", 0, 4), draw(7, "chords", 0, 3),
+                draw(8, "scales", 0, 3), draw(7, "scales", 0, 3, 1)}) == 5
+
+def score(*parts):
+    """score-partwise root with one part per list of measure labels."""
+    root = mu.ET.Element("score-partwise")
+    for labels in parts:
+        part = mu.ET.SubElement(root, "part")
+        for label in labels:
+            mu.ET.SubElement(part, "measure", number=label)
+    return root
+
+def test_splice_measures_replaces_only_the_range():
+    base, tmpl = score("abcd", "efgh"), score("ABCD", "EFGH")
+    spliced = mu.splice_measures(base, tmpl, mu.parse_measure_range("2-3"))
+    assert [[m.get("number") for m in p] for p in base] == [list("aBCd"), list("eFGh")]
+    assert [(pi, mi, old.get("number"), new.get("number")) for pi, mi, old, new in spliced] == \
+        [(0, 1, "b", "B"), (0, 2, "c", "C"), (1, 1, "f", "F"), (1, 2, "g", "G")]
+    assert tmpl[0][1] is not base[0][1]  # copies, the template stays intact
+
+def test_splice_measures_stops_at_the_shorter_score():
+    base = score("abcd", "ef")
+    mu.splice_measures(base, score("AB"), (0, 4))
+    assert [[m.get("number") for m in p] for p in base] == [list("ABcd"), list("ef")]
+
+SMALL = """<score-partwise><part id="P1">
+ <measure><attributes><divisions>2</divisions></attributes>
+  <note><pitch><step>C</step><octave>4</octave></pitch><duration>2</duration><voice>1</voice></note>
+  <note><chord/><pitch><step>E</step><alter>-1</alter><octave>4</octave></pitch><duration>2</duration><voice>1</voice></note>
+  <note><rest/><duration>2</duration><voice>1</voice></note>
+  <note print-object="no"><pitch><step>G</step><octave>4</octave></pitch><duration>4</duration><voice>1</voice><accidental print-object="no">natural</accidental></note>
+ </measure>
+ <measure>
+  <note><pitch><step>F</step><alter>1</alter><octave>4</octave></pitch><duration>8</duration><voice>1</voice><accidental>sharp</accidental></note>
+ </measure>
+</part></score-partwise>"""
+
+def test_score_matrix_columns():
+    pytest.importorskip("numpy")
+    m = mu.ScoreMatrix.from_root(mu.ET.fromstring(SMALL))
+    assert m.midi.tolist() == [60, 63, -1, 67, 66]
+    assert m.onset.tolist() == [0.0, 0.0, 1.0, 2.0, 4.0]
+    assert m.offset.tolist() == [0.0, 0.0, 1.0, 2.0, 0.0]
+    assert m.measure.tolist() == [0, 0, 0, 0, 1]
+    assert m.visible.tolist() == [True, True, True, False, True]
+    assert m.accidental.tolist() == [0, 0, 0, -1, 1]
+    assert m.histogram("alter", m.pitched()) == {-1: 1, 0: 2, 1: 1}
+    assert m.harmonic_intervals().tolist() == [3]
+    assert m.melodic_intervals().tolist() == [7, -1]
+    assert m.pitch_range(by="measure") == {0: (60, 67), 1: (66, 66)}
+    assert len(m.subset(m.mask(measure=0, rest=False))) == 3
+
+def test_score_matrix_load_dir_cache(template, tmp_path, monkeypatch):
+    """Regression: a cache path without .npz must still be hit (savez_compressed appends the suffix)."""
+    pytest.importorskip("numpy")
+    import shutil
+    for name in ("scales", "chords"):
+        shutil.copy(template(name), tmp_path / f"{name}.musicxml")
+    cache = tmp_path / "cache"
+    first = mu.ScoreMatrix.load_dir(str(tmp_path), workers=1, cache=str(cache))
+    assert (tmp_path / "cache.npz").exists() and not cache.exists()
+    def unexpected(path):
+        raise AssertionError(f"re-parsed {path}")
+    monkeypatch.setattr(mu, "_file_columns", unexpected)
+    again = mu.ScoreMatrix.load_dir(str(tmp_path), workers=1, cache=str(cache))
+    assert again.files == first.files and again.midi.tolist() == first.midi.tolist()
+    (tmp_path / "scales.musicxml").write_bytes((tmp_path / "scales.musicxml").read_bytes() + b"\n")
+    with pytest.raises(AssertionError, match="re-parsed"):
+        mu.ScoreMatrix.load_dir(str(tmp_path), workers=1, cache=str(cache))
+
+@pytest.mark.parametrize("kinds, expected", [({"first", "last", "apex"}, [0, 4, 2]), ({"first"}, [0]),
+                                             ({"apex", "last"}, [4, 2]), (set(), [])])
+def test_anchor_indices(kinds, expected):
+    assert mu.anchor_indices([60, 62, 67, 64, 62], kinds) == expected
+
+def test_anchor_indices_deduplicates():
+    assert mu.anchor_indices([60, 55, 50], {"first", "last", "apex"}) == [0, 2]
+    assert mu.anchor_indices([], {"first"}) == []
+
+def test_is_hidden_and_to_int():
+    assert mu.is_hidden(ET.fromstring('<note print-object=" No "/>')) and not mu.is_hidden(ET.fromstring("<note/>"))
+    assert not mu.is_hidden(None)
+    assert (mu.to_int(" 7 "), mu.to_int(None), mu.to_int("x", 4)) == (7, 0, 4)
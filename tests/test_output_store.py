@@ -0,0 +1,54 @@
+import json
+import os
+
+from output_store import OutputStore
+from uebungsblatt_cli import variant_cfg, write_outdir
+
+def test_publish_is_content_addressed(tmp_path):
+    store = OutputStore(tmp_path)
+    first = store.publish("a.musicxml", b"one")
+    assert first["written"] and first["relinked"]
+    again = store.publish("a.musicxml", b"one")
+    assert (again["written"], again["relinked"], again["sha256"]) == (False, False, first["sha256"])
+    assert store.publish("b.musicxml", b"one")["written"] is False  # same content, one object
+    assert os.path.samefile(tmp_path / "a.musicxml", tmp_path / "b.musicxml")
+    store.publish("a.musicxml", b"two")
+    assert (tmp_path / "a.musicxml").read_bytes() == b"two" and (tmp_path / "b.musicxml").read_bytes() == b"one"
+    assert not any(p.name.endswith(".tmp") for p in tmp_path.rglob("*"))
+
+def test_commit_run_removes_names_the_run_no_longer_produces(tmp_path):
+    store = OutputStore(tmp_path)
+    store.commit_run([store.publish(n, n.encode()) for n in ("a.pdf", "b.pdf", "c.pdf")])
+    (tmp_path / "c.pdf").unlink(); (tmp_path / "c.pdf").write_bytes(b"edited by hand")
+    store.commit_run([store.publish("a.pdf", b"a.pdf")])
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_file()) == ["a.pdf", "c.pdf"]
+    store.commit_run([store.publish("d.pdf", b"d")], partial=True)
+    assert (tmp_path / "a.pdf").exists() and (tmp_path / "d.pdf").exists()
+    runs = store.run_manifests()
+    assert len(runs) == 3 and json.loads(runs[-1].read_text())["partial"] is True
+
+def test_prune_keeps_what_kept_runs_and_names_use(tmp_path):
+    store = OutputStore(tmp_path)
+    store.commit_run([store.publish("a.txt", b"v1"), store.publish("keep.txt", b"k")])
+    store.commit_run([store.publish("a.txt", b"v2")], partial=True)
+    store.commit_run([store.publish("a.txt", b"v3")], partial=True)
+    assert store.prune(1) == (2, 2)  # v1 and v2: no kept manifest lists them and a.txt points at v3
+    contents = sorted(p.read_bytes() for p in store.objects.glob("*/*"))
+    assert contents == [b"k", b"v3"]
+    assert (tmp_path / "keep.txt").read_bytes() == b"k" and len(store.run_manifests()) == 1
+
+def test_unchanged_rerun_writes_nothing(cfg, tmp_path):
+    run = lambda: write_outdir(variant_cfg(cfg, None, 2), None, tmp_path, sections=("chords", "intervals"))[1]
+    first, second = run(), run()
+    assert all(e["written"] for e in first) and not any(e["written"] or e["relinked"] for e in second)
+    assert [e["sha256"] for e in first] == [e["sha256"] for e in second]
+
+def test_put_rewrites_an_object_edited_through_its_name(tmp_path):
+    store = OutputStore(tmp_path)
+    first = store.publish("a.txt", b"one")
+    with open(tmp_path / "a.txt", "r+b") as f:  # same size, same inode: the stored object changes with it
+        f.write(b"owt")
+    digest, obj, new = store.put(b"one", ".txt")
+    assert (digest, new) == (first["sha256"], True) and obj.read_bytes() == b"one"
+    again = store.publish("a.txt", b"one")
+    assert again["relinked"] and (tmp_path / "a.txt").read_bytes() == b"one"
@@ -0,0 +1,41 @@
+import re
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import generate_scales
+import make_arbeitsblatt
+import render_sheet as rs
+
+def glyphs(pages, prefix):
+    return [(round(it[2], 3), round(it[3], 3)) for page in pages for it in page["items"]
+            if it[0] == "use" and it[1].startswith(prefix)]
+
+def test_key_alters():
+    assert rs.key_alters(2) == {"F": 1, "C": 1}
+    assert rs.key_alters(-3) == {"B": -1, "E": -1, "A": -1}
+    assert rs.key_alters(0) == {}
+
+@pytest.mark.parametrize("name", ["scales", "intervals", "chords", "rhythm"])
+def test_templates_render_to_pdf_and_svg(template, name):
+    pages = rs.engrave(ET.parse(template(name)).getroot())
+    assert pages and glyphs(pages, "notehead")
+    pdf = rs.pdf_bytes(pages)
+    assert pdf.startswith(b"%PDF-") and pdf.rstrip().endswith(b"%%EOF")
+    assert len(re.findall(rb"/Type\s*/Page\b", pdf)) == len(pages)
+    assert ET.fromstring(rs.svg_page(pages[0])).tag.endswith("svg")
+
+def barlines(pages):
+    return [tuple(round(v, 3) for v in it[1:5]) for page in pages for it in page["items"]
+            if it[0] == "line" and abs(it[1] - it[3]) < 1e-6 and it[4] != it[2]]
+
+def test_hidden_notes_keep_the_layout(template, tmp_path):
+    sheet, solution = tmp_path / "s.musicxml", tmp_path / "solution.musicxml"
+    generate_scales.main(["--input", template("scales"), "--output", str(sheet), "--seed", "6"])
+    make_arbeitsblatt.main(["--mode", "scales", "--action", "solution", "--input", str(sheet), "--output", str(solution)])
+    blank, full = (rs.engrave(ET.parse(p).getroot()) for p in (sheet, solution))
+    notes = [n for n in ET.parse(solution).getroot().iter("note") if n.find("pitch") is not None]
+    hidden = [n for n in ET.parse(sheet).getroot().iter("note") if n.get("print-object") == "no"]
+    assert len(glyphs(full, "notehead")) == len(notes)
+    assert len(glyphs(blank, "notehead")) == len(notes) - len(hidden) > 0
+    assert barlines(blank) == barlines(full) and barlines(full)
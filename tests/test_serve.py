@@ -0,0 +1,96 @@
+import io
+import json
+import threading
+import time
+import types
+import urllib.error
+import urllib.request
+import zipfile
+
+import pytest
+
+import serve
+from uebungsblatt_cli import OUTPUT_NAMES, section_files, variant_cfg
+
+@pytest.fixture(scope="module")
+def server(cfg):
+    srv = serve.make_server(cfg, "127.0.0.1", 0, workers=2, max_inflight=2, max_body=100_000, queue_timeout=0.2, quiet=True)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    srv.url = f"http://127.0.0.1:{srv.server_address[1]}"
+    yield srv
+    srv.shutdown(); srv.server_close(); srv.pool.shutdown()
+
+def fetch(url, body=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=body), timeout=60) as r:
+            return r.status, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def wait_idle(server, timeout=30):
+    deadline = time.time() + timeout
+    while server.slots._value < server.max_inflight and time.time() < deadline:
+        time.sleep(0.05)
+    return server.slots._value == server.max_inflight
+
+def test_every_worker_is_started(server):
+    assert len(server.pool._processes) == 2
+
+def test_health(server):
+    status, body = fetch(server.url + "/health")
+    assert status == 200 and json.loads(body)["workers"] == 2
+
+def test_generate_matches_cli(server, cfg):
+    files = {name: data for name, data, _ in section_files(variant_cfg(cfg, None, 7), None, sections=("chords",))}
+    assert fetch(server.url + "/generate?section=chords&seed=7") == (200, files[OUTPUT_NAMES["chords"] + ".musicxml"])
+    assert fetch(server.url + "/generate?section=chords&seed=7&sheet=arbeitsblatt") == \
+        (200, files[OUTPUT_NAMES["chords"] + "_arbeitsblatt.musicxml"])
+
+@pytest.mark.parametrize("path, status", [("/generate?section=nope", 400), ("/generate?section=chords&seed=x", 400),
+                                          ("/generate?section=chords&profile=nope", 400), ("/nowhere", 404)])
+def test_bad_requests(server, path, status):
+    assert fetch(server.url + path)[0] == status
+
+def test_arbeitsblatt_upload(server, template):
+    sheet = open(template("scales"), "rb").read()
+    status, body = fetch(server.url + "/arbeitsblatt?mode=scales&action=hide", sheet)
+    assert status == 200 and body.startswith(b"<?xml")
+    assert fetch(server.url + "/arbeitsblatt?mode=scales", b"not xml")[0] == 400
+    assert fetch(server.url + "/arbeitsblatt?mode=scales", b"<a/>" * 30_000)[0] == 413
+
+def test_timeout_answers_504(server):
+    server.job_timeout = 0.001
+    try:
+        status, body = fetch(server.url + "/bundle?seed=9")
+    finally:
+        server.job_timeout = 60.0
+    assert status == 504 and b"retry later" in body
+
+def test_timed_out_job_keeps_its_slot_until_done(server):
+    """Regression: a timed-out job must not free its in-flight slot while its worker is still busy."""
+    assert wait_idle(server)
+    handler = types.SimpleNamespace(server=types.SimpleNamespace(**vars(server)))
+    handler.server.job_timeout = 0.05
+    with pytest.raises(serve.HTTPError) as e:
+        serve.Handler._run(handler, time.sleep, 1.0)
+    assert e.value.status == 504
+    assert server.slots._value == server.max_inflight - 1
+    assert wait_idle(server)
+
+def test_unseeded_requests_draw_a_seed(monkeypatch):
+    monkeypatch.setattr(serve, "draw_seed", lambda: 123)
+    handler = types.SimpleNamespace(server=types.SimpleNamespace(cfg={"seed": None}, profiles={}))
+    assert serve.Handler._variant_args(handler, {}) == ("", 123)
+    assert serve.Handler._variant_args(handler, {"seed": "0"}) == ("", 0)
+    handler.server.cfg["seed"] = 0
+    assert serve.Handler._variant_args(handler, {}) == ("", 0)
+
+def test_response_reports_the_seed(server):
+    with urllib.request.urlopen(server.url + "/generate?section=chords&seed=5", timeout=60) as r:
+        assert r.headers["X-Seed"] == "5"
+
+def test_bundle_matches_cli_for_every_section(server, cfg):
+    files = {name: data for name, data, _ in section_files(variant_cfg(cfg, "EC1", 3), "EC1")}
+    status, body = fetch(server.url + "/bundle?profile=EC1&seed=3")
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert status == 200 and {n: zf.read(n) for n in zf.namelist()} == files
@@ -0,0 +1,36 @@
+import hashlib
+import json
+import zipfile
+
+import uebungsblatt_cli as cli
+
+def test_bundle_manifest_matches_members(cfg, tmp_path):
+    bundle = tmp_path / "bundle.zip"
+    n = cli.write_bundle(cli.variant_cfg(cfg, "EC1", 5), "EC1", bundle, variants=2)
+    with zipfile.ZipFile(bundle) as zf:
+        manifest = json.loads(zf.read("manifest.json"))
+        assert manifest["seeds"] == [5, 6] and len(manifest["files"]) == n
+        assert sorted(zf.namelist()) == sorted([f["name"] for f in manifest["files"]] + ["manifest.json"])
+        for f in manifest["files"]:
+            data = zf.read(f["name"])
+            assert (f["size"], f["sha256"]) == (len(data), hashlib.sha256(data).hexdigest())
+        kinds = {(f["name"].split("/")[0], f["kind"]) for f in manifest["files"]}
+    assert kinds == {(folder, kind) for folder in ("EC1_seed5", "EC1_seed6")
+                     for kind in ("uebungsblatt", "arbeitsblatt", "answers")}
+
+def test_answer_key_lists_the_items(cfg):
+    files = {name: data for name, data, _ in cli.section_files(cli.variant_cfg(cfg, None, 3), None, answers=True,
+                                                                sections=("intervals",))}
+    key = files[cli.OUTPUT_NAMES["intervals"] + "_answers.txt"].decode("utf-8").splitlines()
+    assert key and all(line.startswith("m. ") and "->" in line for line in key)
+
+def test_unseeded_bundle_draws_one_seed(cfg, tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "draw_seed", lambda: 123)
+    for seed, first in ((None, 123), (0, 0)):
+        bundle = tmp_path / f"{seed}.zip"
+        cli.write_bundle(dict(cli.variant_cfg(cfg, None, 1), seed=seed), None, bundle, variants=2)
+        with zipfile.ZipFile(bundle) as zf:
+            manifest = json.loads(zf.read("manifest.json"))
+        assert manifest["seeds"] == [first, first + 1]
+        assert {f["name"].split("/")[0] for f in manifest["files"]} == {f"default_seed{first}", f"default_seed{first + 1}"}
+        assert {f["seed"] for f in manifest["files"]} == {first, first + 1}
@@ -0,0 +1,52 @@
+import pytest
+
+import uebungsblatt_config as uc
+
+def test_deep_merge():
+    base = {"a": {"x": 1, "y": [1, 2]}, "b": 2}
+    merged = uc.deep_merge(base, {"a": {"y": [3], "z": 4}, "c": 5})
+    assert merged == {"a": {"x": 1, "y": [3], "z": 4}, "b": 2, "c": 5}
+    assert base == {"a": {"x": 1, "y": [1, 2]}, "b": 2}  # inputs are not modified
+
+def test_compile_normalizes_and_merges_profiles():
+    cfg = uc.compile_config({
+        "seed": 3,
+        "scales": {"accidental_tags": "Sharp, flat", "placeholders": ["e4", "F4"], "hide_articulations": "yes"},
+        "intervals": {"set": ["m3", "M3"], "direction": "Up", "position": "auto"},
+        "profiles": {"EC1": {"scales": {"alter_count": 2}}, "EC2": {"seed": 9, "intervals": {"direction": "down"}}},
+    })
+    assert cfg["scales"] == {"accidental_tags": ["sharp", "flat"], "placeholders": ["E4", "F4"], "hide_articulations": True}
+    assert cfg["intervals"] == {"set": ["m3", "M3"], "direction": "up", "position_tag": "auto"}
+    assert cfg["profiles"]["EC1"]["scales"]["alter_count"] == 2
+    assert cfg["profiles"]["EC1"]["scales"]["placeholders"] == ["E4", "F4"]
+    assert cfg["profiles"]["EC2"]["seed"] == 9 and cfg["profiles"]["EC2"]["intervals"]["set"] == ["m3", "M3"]
+    assert uc.apply_profile(cfg, "EC2")["intervals"]["direction"] == "down"
+    assert uc.apply_profile(cfg, None) is cfg
+
+def test_compile_collects_every_error():
+    with pytest.raises(uc.ConfigError) as e:
+        uc.compile_config({"sede": 1, "chords": {"triads": ["maj", "minn"]}, "rhythms": {"note_prob": 2},
+                           "melodies": {"key": "H"}, "profiles": {"X": {"worksheet": {"scales": "erase"}}}})
+    text = str(e.value)
+    assert len(e.value.errors) == 5
+    for needle in ("did you mean 'seed'", "did you mean 'min'", "rhythms.note_prob: 2 is outside 0..1",
+                   "melodies.key", "profiles.X.worksheet.scales"):
+        assert needle in text
+
+def test_unknown_profile():
+    with pytest.raises(uc.ConfigError, match="did you mean 'EC1'"):
+        uc.apply_profile(uc.compile_config({"profiles": {"EC1": {}}}), "EC!")
+
+def test_load_cfg_caches_by_content(tmp_path, monkeypatch):
+    path = tmp_path / "c.yaml"
+    path.write_text("seed: 4\nchords:\n  inversion: Root\n")
+    assert uc.load_cfg(path)["chords"] == {"inversion": "root"}
+    monkeypatch.setattr(uc, "compile_config", lambda data: pytest.fail("compiled again"))
+    assert uc.load_cfg(path)["seed"] == 4
+    path.write_text("seed: 5\n")
+    monkeypatch.undo()
+    assert uc.load_cfg(path)["seed"] == 5
+    assert len(list((tmp_path / "__pycache__").glob("c.yaml.*.json"))) == 1
+
+def test_repo_config_compiles(cfg):
+    assert set(cfg["inputs"]) == set(uc.SECTIONS)
@@ -0,0 +1,30 @@
+import generate_scales
+import make_arbeitsblatt
+import validate_musicxml as vm
+
+def errors(path):
+    return [p for p in vm.validate_file(path)[1] if p[0] == "error"]
+
+def test_generated_sheets_validate(template, tmp_path):
+    sheet, ab = tmp_path / "Hoeren_scales.musicxml", tmp_path / "Hoeren_scales_arbeitsblatt.musicxml"
+    generate_scales.main(["--input", template("scales"), "--output", str(sheet), "--seed", "1"])
+    make_arbeitsblatt.main(["--mode", "scales", "--input", str(sheet), "--output", str(ab)])
+    assert errors(sheet) == [] and errors(ab) == []
+
+def test_visible_accidental_on_arbeitsblatt_is_an_error(template, tmp_path):
+    sheet, ab = tmp_path / "Hoeren_scales.musicxml", tmp_path / "Hoeren_scales_arbeitsblatt.musicxml"
+    generate_scales.main(["--input", template("scales"), "--output", str(sheet), "--seed", "1", "--alter-ratio", "1"])
+    ab.write_bytes(sheet.read_bytes().replace(b'print-object="no"', b'print-object="yes"'))
+    assert any("scales Arbeitsblatt" in message for _, _, message in errors(ab))
+
+def test_unparsable_file_is_reported(tmp_path):
+    bad = tmp_path / "bad.musicxml"
+    bad.write_text("<score-partwise>")
+    assert errors(bad)[0][1] == "file"
+
+def test_iter_files_skips_dot_directories(tmp_path):
+    """Regression: OUT/.store and OUT/.runs hold content-addressed copies that must not be validated again."""
+    for rel in ("a.musicxml", "sub/b.musicxml", ".store/ab/c.musicxml", ".runs/1/d.musicxml", "notes.txt"):
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("<score-partwise/>")
+    assert [p.relative_to(tmp_path).as_posix() for p in vm.iter_files([tmp_path])] == ["a.musicxml", "sub/b.musicxml"]
@@ -1,166 +1,261 @@
 #!/usr/bin/env python3
 import argparse
-import subprocess
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import random
 import sys
+import zipfile
 from pathlib import Path
 
-try:
-    import yaml  # pip install pyyaml
-except ImportError:
-    print("PyYAML is required. Install with: pip install pyyaml", file=sys.stderr)
-    sys.exit(1)
-
-HERE = Path(__file__).resolve().parent
-
-def run(cmd):
-    subprocess.run([str(c) for c in cmd], check=True)
-
-def load_cfg(path: Path) -> dict:
-    with path.open("r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
-    return data
-
-def apply_profile(cfg: dict, profile_name: str | None) -> dict:
-    if not profile_name:
-        return cfg
-    profs = cfg.get("profiles") or {}
-    prof = profs.get(profile_name)
-    if not prof:
-        return cfg
-    merged = dict(cfg)
-    for k, v in prof.items():
-        if isinstance(v, dict) and isinstance(merged.get(k), dict):
-            nv = dict(merged[k])
-            nv.update(v)
-            merged[k] = nv
-        else:
-            merged[k] = v
-    return merged
+from uebungsblatt_config import ConfigError, load_cfg, apply_profile  # noqa: F401  (re-exported for serve/build_web_bank)
 
-def main():
-    ap = argparse.ArgumentParser(description="Übungsblatt generator (PyYAML edition).")
-    ap.add_argument("--config", required=True, help="Path to YAML config")
-    ap.add_argument("--profile", default=None, help="Optional profile name to apply (also embedded into titles)")
-    args = ap.parse_args()
+def draw_seed() -> int:
+    """A seed for an unseeded config, drawn once so the variants built from it can be reproduced."""
+    return random.SystemRandom().randrange(1_000_000)
 
-    cfg_path = Path(args.config)
-    cfg = load_cfg(cfg_path)
-    cfg = apply_profile(cfg, args.profile)
+def variant_cfg(cfg: dict, profile: str | None, seed: int) -> dict:
+    """Profile applied and seed set; without the fingerprint store so the result depends on (profile, seed) only."""
+    cfg = dict(apply_profile(cfg, profile or None), seed=seed)
+    cfg.pop("dedupe", None)
+    return cfg
 
-    outdir = Path(cfg.get("outdir", "OUT"))
-    outdir.mkdir(parents=True, exist_ok=True)
+def difficulty_args(sec_cfg: dict) -> list:
+    cmd = []
+    if "target_difficulty" in sec_cfg:
+        cmd += ["--target-difficulty", str(sec_cfg["target_difficulty"])]
+    if "difficulty_spread" in sec_cfg:
+        cmd += ["--difficulty-spread", str(sec_cfg["difficulty_spread"])]
+    return cmd
+
+def adaptive_args(cfg: dict) -> list:
+    a_cfg = cfg.get("adaptive", {}) or {}
+    if not a_cfg.get("results"):
+        return []
+    cmd = ["--results", a_cfg["results"]]
+    if a_cfg.get("class"):
+        cmd += ["--class-name", a_cfg["class"]]
+    if "mix" in a_cfg:
+        cmd += ["--adaptive-mix", str(a_cfg["mix"])]
+    return cmd
+
+def dedupe_args(cfg: dict) -> list:
+    d_cfg = cfg.get("dedupe", {}) or {}
+    if not d_cfg.get("store"):
+        return []
+    cmd = ["--fingerprints", d_cfg["store"]]
+    if "min_distance" in d_cfg:
+        cmd += ["--min-distance", str(d_cfg["min_distance"])]
+    if "max_redraws" in d_cfg:
+        cmd += ["--max-redraws", str(d_cfg["max_redraws"])]
+    if d_cfg.get("require_unique"):
+        cmd += ["--require-unique"]
+    return cmd
 
-    # CLEANUP: remove existing MusicXML files before generation
-    for pattern in ("*.musicxml", "*.music.xml"):
-        for _f in outdir.glob(pattern):
-            try:
-                _f.unlink()
-            except Exception:
-                pass
+SECTIONS = ("scales", "intervals", "chords", "rhythms", "melodies")
+OUTPUT_NAMES = {"scales": "Hoeren_scales", "intervals": "Hoeren_intervals",
+                "chords": "Hoeren_chords", "rhythms": "Hoeren_rhythm", "melodies": "Hoeren_melody"}
 
+def section_jobs(cfg: dict, profile: str | None, outdir: Path, sections=SECTIONS, extra=None) -> list:
+    """Generator and Arbeitsblatt argv (without interpreter/script) for each configured section.
+
+    extra: optional {section: [args]} appended to that section's generator argv.
+    """
     inputs = cfg.get("inputs", {}) or {}
     seed = cfg.get("seed")
+    worksheet = cfg.get("worksheet", {}) or {}
+    jobs = []
+    for section in sections:
+        src = inputs.get(section)
+        if not src:
+            continue
+        out = outdir / f"{OUTPUT_NAMES[section]}.musicxml"
+        sec_cfg = cfg.get(section, {}) or {}
+        cmd = ["--input", src, "--output", out] + list((extra or {}).get(section, []))
+
+        if section == "scales":
+            if "accidental_tags" in sec_cfg:
+                cmd += ["--accidental-tags", ",".join(sec_cfg["accidental_tags"])]
+            elif "accidentals" in sec_cfg:
+                cmd += ["--accidentals", ",".join(sec_cfg["accidentals"])]
+            if "placeholders" in sec_cfg:
+                cmd += ["--placeholders", ",".join(sec_cfg["placeholders"])]
+            if "alter_count" in sec_cfg:
+                cmd += ["--alter-count", str(sec_cfg["alter_count"])]
+            if "alter_ratio" in sec_cfg:
+                cmd += ["--alter-ratio", str(sec_cfg["alter_ratio"])]
+            if "stratify" in sec_cfg:
+                cmd += ["--stratify", sec_cfg["stratify"]]
+            if "phrase_measures" in sec_cfg:
+                cmd += ["--phrase-measures", str(sec_cfg["phrase_measures"])]
+            if "hide_articulations" in sec_cfg:
+                cmd += ["--hide-articulations", str(sec_cfg["hide_articulations"]).lower()]
+            cmd += difficulty_args(sec_cfg) + dedupe_args(cfg)
+        elif section == "intervals":
+            if "set" in sec_cfg:
+                cmd += ["--set", ",".join(sec_cfg["set"])]
+            if "direction" in sec_cfg:
+                cmd += ["--direction", sec_cfg["direction"]]
+            if "accidental_tags" in sec_cfg:
+                cmd += ["--accidental-tags", ",".join(sec_cfg["accidental_tags"])]  # second-note filter
+            if "position_tag" in sec_cfg:
+                cmd += ["--position-tag", sec_cfg["position_tag"]]
+            cmd += difficulty_args(sec_cfg) + dedupe_args(cfg) + adaptive_args(cfg)
+        elif section == "chords":
+            if "triads" in sec_cfg:
+                cmd += ["--triads", ",".join(sec_cfg["triads"])]
+            if "inversion" in sec_cfg:
+                cmd += ["--inversion", sec_cfg["inversion"]]
+            cmd += difficulty_args(sec_cfg) + dedupe_args(cfg) + adaptive_args(cfg)
+        elif section == "rhythms":
+            if "note_prob" in sec_cfg:
+                cmd += ["--note-prob", str(sec_cfg["note_prob"])]
+            if "difficulty" in sec_cfg:
+                cmd += ["--difficulty", str(sec_cfg["difficulty"])]
+        elif section == "melodies":
+            if "key" in sec_cfg:
+                cmd += ["--key", sec_cfg["key"]]
+            if "range" in sec_cfg:
+                cmd += ["--range", sec_cfg["range"]]
+            if "difficulty" in sec_cfg:
+                cmd += ["--difficulty", str(sec_cfg["difficulty"])]
+            cmd += dedupe_args(cfg)
 
-    # ---------------- SCALES ----------------
-    scales_in = inputs.get("scales")
-    if scales_in:
-        scales_out = outdir / "Hoeren_scales.musicxml"
-        cmd = [sys.executable, HERE / "generate_scales.py",
-               "--input", scales_in, "--output", scales_out]
-        s_cfg = cfg.get("scales", {}) or {}
-        if "accidental_tags" in s_cfg:
-            cmd += ["--accidental-tags", ",".join(s_cfg["accidental_tags"])]
-        elif "accidentals" in s_cfg:
-            cmd += ["--accidentals", ",".join(s_cfg["accidentals"])]
-        if "placeholders" in s_cfg:
-            cmd += ["--placeholders", ",".join(s_cfg["placeholders"])]
-        if "alter_count" in s_cfg:
-            cmd += ["--alter-count", str(s_cfg["alter_count"])]
-        if "alter_ratio" in s_cfg:
-            cmd += ["--alter-ratio", str(s_cfg["alter_ratio"])]
-        if "hide_articulations" in s_cfg:
-            cmd += ["--hide-articulations", str(s_cfg["hide_articulations"]).lower()]
-        if "target_voice" in s_cfg:
-            cmd += ["--target-voice", str(s_cfg["target_voice"])]
-        if "target_staff" in s_cfg:
-            cmd += ["--target-staff", str(s_cfg["target_staff"])]
-        if seed is not None:
-            cmd += ["--seed", str(seed)]
-        if args.profile:
-            cmd += ["--profile-name", args.profile]
-        run(cmd)
-
-        # Arbeitsblatt for scales
-        run([sys.executable, HERE / "make_arbeitsblatt.py",
-             "--mode", "scales",
-             "--action", (cfg.get("worksheet", {}) or {}).get("scales", "hide"),
-             "--input", scales_out,
-             "--output", outdir / "Hoeren_scales_arbeitsblatt.musicxml"])
-
-    # ---------------- INTERVALS ----------------
-    intervals_in = inputs.get("intervals")
-    if intervals_in:
-        intervals_out = outdir / "Hoeren_intervals.musicxml"
-        cmd = [sys.executable, HERE / "generate_intervals.py",
-               "--input", intervals_in, "--output", intervals_out]
-        i_cfg = cfg.get("intervals", {}) or {}
-        if "set" in i_cfg:
-            cmd += ["--set", ",".join(i_cfg["set"])]
-        if "direction" in i_cfg:
-            cmd += ["--direction", i_cfg["direction"]]
-        if "accidental_tags" in i_cfg:
-            cmd += ["--accidental-tags", ",".join(i_cfg["accidental_tags"])]  # second-note filter
-        pos_tag = i_cfg.get("position_tag") or i_cfg.get("position")
-        if pos_tag:
-            cmd += ["--position-tag", str(pos_tag).strip().lower()]
-        if seed is not None:
-            cmd += ["--seed", str(seed)]
-        if args.profile:
-            cmd += ["--profile-name", args.profile]  # put profile label into <work-title> and <credit-words>
-        run(cmd)
-
-        # Arbeitsblatt for intervals
-        run([sys.executable, HERE / "make_arbeitsblatt.py",
-             "--mode", "intervals",
-             "--action", (cfg.get("worksheet", {}) or {}).get("intervals", "hide"),
-             "--input", intervals_out,
-             "--output", outdir / "Hoeren_intervals_arbeitsblatt.musicxml"])
-
-    # ---------------- CHORDS ----------------
-    chords_in = inputs.get("chords")
-    if chords_in:
-        chords_out = outdir / "Hoeren_chords.musicxml"
-        cmd = [sys.executable, HERE / "generate_chords.py",
-               "--input", chords_in, "--output", chords_out]
-        c_cfg = cfg.get("chords", {}) or {}
-        if seed is not None:
-            cmd += ["--seed", str(seed)]
-        run(cmd)
-
-        run([sys.executable, HERE / "make_arbeitsblatt.py",
-             "--mode", "chords",
-             "--action", (cfg.get("worksheet", {}) or {}).get("chords", "hide"),
-             "--input", chords_out,
-             "--output", outdir / "Hoeren_chords_arbeitsblatt.musicxml"])
-
-    # ---------------- RHYTHMS ----------------
-    rhythms_in = inputs.get("rhythms")
-    if rhythms_in:
-        rhythms_out = outdir / "Hoeren_rhythm.musicxml"
-        cmd = [sys.executable, HERE / "generate_rhythms.py",
-               "--input", rhythms_in, "--output", rhythms_out]
-        r_cfg = cfg.get("rhythms", {}) or {}
         if seed is not None:
             cmd += ["--seed", str(seed)]
-        run(cmd)
+        if profile and section in ("scales", "intervals"):
+            cmd += ["--profile-name", profile]  # put profile label into <credit-words>
+
+        ab_out = outdir / f"{OUTPUT_NAMES[section]}_arbeitsblatt.musicxml"
+        ab_cmd = ["--mode", section, "--action", worksheet.get(section, "hide"), "--input", out, "--output", ab_out]
+        jobs.append({"section": section, "script": f"generate_{section}.py", "args": [str(c) for c in cmd],
+                     "output": out, "arbeitsblatt_args": [str(c) for c in ab_cmd], "arbeitsblatt_output": ab_out,
+                     "arbeitsblatt_action": worksheet.get(section, "hide")})
+    return jobs
+
+def _run_main(script: str, argv: list):
+    mod = importlib.import_module(Path(script).stem)
+    with contextlib.redirect_stdout(io.StringIO()):
+        mod.main(argv)
+
+def section_files(cfg: dict, profile: str | None, folder: str = "", sections=SECTIONS, extra=None, mscz: bool = False,
+                  pdf: bool = False, answers: bool = False):
+    """Run the section jobs in-process and yield (name, bytes, meta) for every output file, one section at a time.
+    Names are folder + file name; nothing is written to disk. The generated sheet is parsed once per section: the
+    Arbeitsblatt is an Overlay on that tree, applied only while its MusicXML, .mscz and PDF are produced."""
+    from musicxml_utils import Overlay, captured_outputs, read_tree, write_tree
+    from make_arbeitsblatt import answer_key, overlay_for
+    for job in section_jobs(cfg, profile, Path(folder or "."), sections, extra):
+        section, out = job["section"], str(job["output"])
+        with captured_outputs() as files:
+            _run_main(job["script"], job["args"])
+            tree = read_tree(out)
+            root = tree.getroot()
+            ab, _ = overlay_for(root, section, job["arbeitsblatt_action"])
+            variants = ((Overlay(), ""), (ab, "_arbeitsblatt"))
+            with ab.applied():
+                write_tree(tree, str(job["arbeitsblatt_output"]))
+        meta = dict(section=section, seed=cfg.get("seed"))
+        stem = folder + OUTPUT_NAMES[section]
+        yield stem + ".musicxml", files[out], dict(meta, kind="uebungsblatt")
+        yield stem + "_arbeitsblatt.musicxml", files[str(job["arbeitsblatt_output"])], dict(meta, kind="arbeitsblatt")
+        if mscz:
+            from export_mscz import mscz_bytes
+            for ov, suffix in variants:
+                with ov.applied():
+                    data = mscz_bytes(root, OUTPUT_NAMES[section] + suffix)
+                yield stem + suffix + ".mscz", data, dict(meta, kind="mscz")
+        if pdf:
+            from render_sheet import engrave, pdf_bytes
+            for ov, suffix in variants:
+                with ov.applied():
+                    pages = engrave(root)
+                yield stem + suffix + ".pdf", pdf_bytes(pages), dict(meta, kind="pdf")
+        if answers:
+            key = "\n".join(answer_key(root, section)) + "\n"
+            yield stem + "_answers.txt", key.encode("utf-8"), dict(meta, kind="answers")
+
+def write_bundle(cfg: dict, profile: str | None, bundle: Path, variants: int = 1, mscz: bool = False,
+                 pdf: bool = False) -> int:
+    """Generate `variants` consecutive seeds in-process and stream every Übungsblatt, Arbeitsblatt and answer key
+    into one ZIP (plus manifest.json). Only one section's files are held in memory; nothing is written to outdir."""
+    first = cfg.get("seed")
+    if first is None:
+        first = draw_seed()
+    manifest = {"profile": profile or "", "seeds": [first, first + variants - 1], "files": []}
+    with zipfile.ZipFile(bundle, "w", zipfile.ZIP_DEFLATED) as zf:
+        for v in range(variants):
+            seed = first + v
+            folder = f"{profile or 'default'}_seed{seed}/" if variants > 1 else ""
+            for name, data, meta in section_files(dict(cfg, seed=seed), profile, folder, mscz=mscz, pdf=pdf, answers=True):
+                zf.writestr(name, data)
+                manifest["files"].append(dict(name=name, size=len(data), sha256=hashlib.sha256(data).hexdigest(), **meta))
+            print(f"{bundle}: seed {seed} done ({v + 1}/{variants})")
+        zf.writestr("manifest.json", json.dumps(manifest, indent=1, ensure_ascii=False))
+    return len(manifest["files"])
+
+def write_outdir(cfg: dict, profile: str | None, outdir: Path, sections=SECTIONS, extra=None, mscz: bool = False,
+                 pdf: bool = False, partial: bool = False) -> tuple:
+    """Publish every output through the content-addressed store in outdir and record the run's manifest.
+    partial: only some outputs were regenerated, so names missing from this run are kept.
+    Returns (manifest path, manifest entries)."""
+    from output_store import OutputStore
+    store = OutputStore(outdir)
+    entries = [store.publish(name, data, **meta)
+               for name, data, meta in section_files(cfg, profile, "", sections, extra, mscz=mscz, pdf=pdf)]
+    return store.commit_run(entries, partial, profile=profile or "", seed=cfg.get("seed")), entries
+
+def main():
+    ap = argparse.ArgumentParser(description="Übungsblatt generator (PyYAML edition).")
+    ap.add_argument("--config", required=True, help="Path to YAML config")
+    ap.add_argument("--profile", default=None, help="Optional profile name to apply (also embedded into titles)")
+    ap.add_argument("--regenerate", default=None, metavar="SECTION:K-M",
+                    help="Re-roll only measures K-M of one section in the existing output, e.g. intervals:3-5")
+    ap.add_argument("--salt", type=int, default=1, help="Seed-stream salt for --regenerate (bump to re-roll again)")
+    ap.add_argument("--bundle", default=None, metavar="OUT.zip",
+                    help="Stream all sheets, Arbeitsblätter, answer keys and a manifest into this ZIP instead of outdir")
+    ap.add_argument("--mscz", action="store_true", help="Also write MuseScore .mscz files (hidden objects stay hidden)")
+    ap.add_argument("--pdf", action="store_true", help="Also write print-ready PDFs (rendered without a notation program)")
+    ap.add_argument("--variants", type=int, default=1, help="With --bundle: one variant per seed, seed..seed+N-1 (e.g. one per student)")
+    args = ap.parse_args()
+    if args.bundle and args.regenerate:
+        ap.error("--bundle and --regenerate cannot be combined")
+
+    regen_section, regen_measures = None, None
+    if args.regenerate:
+        regen_section, _, regen_measures = args.regenerate.partition(":")
+        if regen_section not in SECTIONS or not regen_measures:
+            ap.error(f"--regenerate expects SECTION:K-M with SECTION in {','.join(SECTIONS)}")
+
+    # validate everything (all profiles, input files) before any output is touched
+    try:
+        cfg = apply_profile(load_cfg(Path(args.config)), args.profile)
+    except ConfigError as e:
+        sys.exit(f"{args.config}: invalid config\n  " + "\n  ".join(e.errors))
+    wanted = (regen_section,) if regen_section else SECTIONS
+    missing = [f"inputs.{s}: {p}" for s, p in (cfg.get("inputs") or {}).items() if s in wanted and not Path(p).is_file()]
+    if missing:
+        sys.exit("Input template(s) not found:\n  " + "\n  ".join(missing))
+
+    if args.bundle:
+        n = write_bundle(cfg, args.profile, Path(args.bundle), max(1, args.variants), args.mscz, args.pdf)
+        print(f"Done. {n} file(s) + manifest.json in {args.bundle}")
+        return
+
+    outdir = Path(cfg.get("outdir", "OUT"))
+    outdir.mkdir(parents=True, exist_ok=True)
 
-        run([sys.executable, HERE / "make_arbeitsblatt.py",
-             "--mode", "rhythms",
-             "--action", (cfg.get("worksheet", {}) or {}).get("rhythms", "hide"),
-             "--input", rhythms_out,
-             "--output", outdir / "Hoeren_rhythm_arbeitsblatt.musicxml"])
+    sections, extra = SECTIONS, None
+    if regen_section:
+        out = outdir / f"{OUTPUT_NAMES[regen_section]}.musicxml"
+        sections = (regen_section,)
+        extra = {regen_section: ["--base", out, "--measures", regen_measures, "--salt", str(args.salt)]}
 
-    print(f"Done. Files saved to {outdir}")
+    manifest, entries = write_outdir(cfg, args.profile, outdir, sections, extra, args.mscz, args.pdf, bool(regen_section))
+    changed = sum(e["relinked"] for e in entries)
+    print(f"Done. Files saved to {outdir} ({changed} changed, run manifest {manifest.relative_to(outdir)})")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# Config compiler for uebungsblatt.yaml: schema validation, case normalization and every profile deep-merged once.
+# The compiled result is cached as JSON in __pycache__ next to the YAML, keyed by the file's hash, so repeated runs
+# skip PyYAML and validation entirely.
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+FORMAT = b"uebungsblatt-config/5"  # bump when the schema or the compiled layout changes
+SECTIONS = ("scales", "intervals", "chords", "rhythms", "melodies")
+ACCIDENTAL_TAGS = ("natural", "sharp", "flat")
+
+class ConfigError(ValueError):
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("\n".join(self.errors))
+
+# --- schema: each spec is fn(value, path, errors) -> normalized value ---
+
+def _string(v, path, errors):
+    if isinstance(v, (dict, list)) or v is None:
+        errors.append(f"{path}: expected a string, got {type(v).__name__}")
+        return v
+    return str(v)
+
+def _boolean(v, path, errors):
+    if isinstance(v, bool):
+        return v
+    if str(v).strip().lower() in ("true", "false", "yes", "no"):
+        return str(v).strip().lower() in ("true", "yes")
+    errors.append(f"{path}: expected true or false, got {v!r}")
+    return v
+
+def _number(lo=None, hi=None, integer=False, nullable=False):
+    def check(v, path, errors):
+        if v is None and nullable:
+            return v
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or (integer and not isinstance(v, int)):
+            errors.append(f"{path}: expected {'an integer' if integer else 'a number'}, got {v!r}")
+        elif (lo is not None and v < lo) or (hi is not None and v > hi):
+            errors.append(f"{path}: {v} is outside {lo if lo is not None else '-inf'}..{hi if hi is not None else 'inf'}")
+        return v
+    return check
+
+def _enum(*choices, fold_case=True):
+    """One of choices; with fold_case, 'Up' is accepted and stored as 'up' (interval names like m2/M2 keep case)."""
+    def check(v, path, errors):
+        s = str(v).strip()
+        if fold_case:
+            s = s.lower()
+        if s not in choices:
+            hint = difflib.get_close_matches(s, choices, n=1)
+            errors.append(f"{path}: {v!r} is not one of {', '.join(choices)}" + (f" (did you mean {hint[0]!r}?)" if hint else ""))
+        return s
+    return check
+
+def _list(item):
+    """A YAML list, or a comma string as on the generators' command lines."""
+    def check(v, path, errors):
+        if isinstance(v, str):
+            v = [x.strip() for x in v.split(",") if x.strip()]
+        if not isinstance(v, list):
+            errors.append(f"{path}: expected a list, got {type(v).__name__}")
+            return v
+        return [item(x, f"{path}[{i}]", errors) for i, x in enumerate(v)]
+    return check
+
+def _pitch_name(v, path, errors):
+    m = re.fullmatch(r"\s*([A-Ga-g])(-?\d)\s*", str(v))
+    if not m:
+        errors.append(f"{path}: {v!r} is not a step+octave name like E4")
+        return v
+    return m.group(1).upper() + m.group(2)
+
+def _parsed(parse):
+    """A string the generator's own parser accepts (key names, note ranges); case is kept."""
+    def check(v, path, errors):
+        try:
+            parse(str(v))
+        except ValueError as e:
+            errors.append(f"{path}: {e}")
+        return str(v)
+    return check
+
+def _section(fields, aliases=None):
+    """Mapping with known keys only; aliases map old spellings onto their canonical key."""
+    def check(v, path, errors):
+        if v is None:
+            return {}
+        if not isinstance(v, dict):
+            errors.append(f"{path}: expected a mapping, got {type(v).__name__}")
+            return v
+        out = {}
+        for key, value in v.items():
+            key = (aliases or {}).get(key, key)
+            sub = f"{path}.{key}" if path else str(key)
+            if key not in fields:
+                hint = difflib.get_close_matches(str(key), list(fields), n=1)
+                errors.append(f"{sub}: unknown key" + (f" (did you mean {hint[0]!r}?)" if hint else ""))
+                continue
+            out[key] = fields[key](value, sub, errors)
+        return out
+    return check
+
+def schema():
+    # generator tables are the source of truth for the allowed names; only imported when a config is (re)compiled
+    from musicxml_utils import INTERVAL_TO_SEMITONES
+    from generate_chords import CHORD_SPELLINGS, INVERSIONS
+    from generate_melodies import parse_key, parse_range
+    tags = _list(_enum(*ACCIDENTAL_TAGS))
+    difficulty = dict(target_difficulty=_number(), difficulty_spread=_number(lo=0))
+    return {
+        "outdir": _string,
+        "seed": _number(integer=True, nullable=True),
+        "what": _string,  # reserved
+        "inputs": _section({s: _string for s in SECTIONS}),
+        "scales": _section(dict(placeholders=_list(_pitch_name), accidental_tags=tags, accidentals=tags,
+                                alter_count=_number(lo=0, integer=True), alter_ratio=_number(0, 1),
+                                stratify=_enum("none", "measure", "phrase"), phrase_measures=_number(lo=1, integer=True),
+                                hide_articulations=_boolean, **difficulty)),
+        "intervals": _section(dict(set=_list(_enum(*INTERVAL_TO_SEMITONES, fold_case=False)),
+                                   direction=_enum("up", "down", "both"), accidental_tags=tags,
+                                   position_tag=_enum("up", "down", "auto"), **difficulty),
+                              aliases={"position": "position_tag"}),
+        "chords": _section(dict(triads=_list(_enum(*CHORD_SPELLINGS)), inversion=_enum(*INVERSIONS, "random"),
+                                **difficulty)),
+        "rhythms": _section(dict(note_prob=_number(0, 1), difficulty=_number(1, 4))),
+        "melodies": _section({"key": _parsed(parse_key), "range": _parsed(parse_range), "difficulty": _number(1, 4)}),
+        "worksheet": _section({s: _enum("hide", "delete") for s in SECTIONS}),
+        "dedupe": _section(dict(store=_string, min_distance=_number(lo=0, integer=True),
+                                max_redraws=_number(lo=0, integer=True), require_unique=_boolean)),
+        "adaptive": _section({"results": _string, "class": _string, "mix": _number(0, 1)}),
+    }
+
+# --- compile ---
+
+def deep_merge(base: dict, over: dict) -> dict:
+    """Nested mappings merge key by key; anything else (lists included) is replaced."""
+    out = dict(base)
+    for k, v in over.items():
+        out[k] = deep_merge(out[k], v) if isinstance(v, dict) and isinstance(out.get(k), dict) else v
+    return out
+
+def compile_config(data) -> dict:
+    """Validated base config whose "profiles" maps each name to its fully merged config. Raises ConfigError."""
+    fields = schema()
+    errors = []
+    if not isinstance(data, dict):
+        raise ConfigError(["top level: expected a mapping"])
+    data = dict(data)
+    raw_profiles = data.pop("profiles", None) or {}
+    base = _section(fields)(data, "", errors)
+    profiles = {}
+    if not isinstance(raw_profiles, dict):
+        errors.append("profiles: expected a mapping of name -> overrides")
+        raw_profiles = {}
+    for name, over in raw_profiles.items():
+        over = _section(fields)(over, f"profiles.{name}", errors)
+        if isinstance(over, dict):
+            profiles[str(name)] = deep_merge(base, over)
+    if errors:
+        raise ConfigError(errors)
+    return dict(base, profiles=profiles)
+
+def _cache_path(path: Path, digest: str) -> Path:
+    return path.parent / "__pycache__" / f"{path.name}.{digest[:16]}.json"
+
+def load_cfg(path: Path) -> dict:
+    """Compiled config for a YAML file, from the hash-keyed cache when the file is unchanged."""
+    path = Path(path)
+    raw = path.read_bytes()
+    digest = hashlib.sha256(FORMAT + b"\0" + raw).hexdigest()
+    cache = _cache_path(path, digest)
+    try:
+        with cache.open("r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("sha256") == digest:
+            return cached["config"]
+    except (OSError, ValueError):
+        pass
+
+    try:
+        import yaml  # pip install pyyaml
+    except ImportError:
+        print("PyYAML is required. Install with: pip install pyyaml", file=sys.stderr)
+        sys.exit(1)
+    try:
+        data = yaml.safe_load(raw.decode("utf-8")) or {}
+    except yaml.YAMLError as e:
+        raise ConfigError([f"not valid YAML: {e}"])
+    cfg = compile_config(data)
+    try:
+        cache.parent.mkdir(exist_ok=True)
+        for old in cache.parent.glob(f"{path.name}.*.json"):
+            old.unlink()
+        tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"sha256": digest, "config": cfg}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # read-only checkout: compile again next time
+    return cfg
+
+def apply_profile(cfg: dict, profile_name: str | None) -> dict:
+    """The precompiled config of one profile (cfg as returned by load_cfg); unknown names raise ConfigError."""
+    if not profile_name:
+        return cfg
+    profiles = cfg.get("profiles") or {}
+    if profile_name not in profiles:
+        hint = difflib.get_close_matches(profile_name, list(profiles), n=1)
+        raise ConfigError([f"unknown profile {profile_name!r}" + (f" (did you mean {hint[0]!r}?)" if hint else "")])
+    return profiles[profile_name]
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate uebungsblatt.yaml and print the compiled (merged) config.")
+    ap.add_argument("config", nargs="?", default=str(Path(__file__).resolve().parent / "uebungsblatt.yaml"))
+    ap.add_argument("--profile", default=None, help="Print this profile's merged config instead of the base")
+    args = ap.parse_args()
+    try:
+        cfg = apply_profile(load_cfg(Path(args.config)), args.profile)
+    except ConfigError as e:
+        sys.exit(f"{args.config}: invalid config\n  " + "\n  ".join(e.errors))
+    print(json.dumps(cfg, indent=1, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from pathlib import Path
+
+from musicxml_utils import SEMITONES, pitch_to_midi
+
+ALTER_TO_ACCIDENTAL = {-2: "flat-flat", -1: "flat", 0: "natural", 1: "sharp", 2: "sharp-sharp"}
+SECTIONS = ("scales", "intervals", "chords", "rhythm", "melody")
+
+def section_of(path):
+    """(section, is_arbeitsblatt) from an output file name like Hoeren_intervals_arbeitsblatt.musicxml."""
+    name = Path(path).name.lower()
+    section = next((s for s in SECTIONS if s in name), None)
+    return section, "arbeitsblatt" in name
+
+def _int(text, default=None):
+    try:
+        return int(str(text).strip())
+    except Exception:
+        return default
+
+def _visible(el):
+    return (el.get("print-object") or "").strip().lower() != "no"
+
+def check_timing(part_id, mi, meas, measure_len, problems):
+    """Per-voice duration sums and <backup>/<forward> balance for one measure."""
+    cursor = 0; high = 0; per_voice = {}
+    where = f"part {part_id} measure {mi + 1}"
+    for el in meas:
+        if el.tag == "note":
+            if el.find("chord") is not None or el.find("grace") is not None:
+                continue
+            d = _int(el.findtext("duration"), 0)
+            v = (el.findtext("voice") or "1").strip()
+            per_voice[v] = per_voice.get(v, 0) + d
+            cursor += d
+        elif el.tag == "forward":
+            d = _int(el.findtext("duration"), 0)
+            v = (el.findtext("voice") or "").strip() or None
+            if v:
+                per_voice[v] = per_voice.get(v, 0) + d
+            cursor += d
+        elif el.tag == "backup":
+            cursor -= _int(el.findtext("duration"), 0)
+            if cursor < 0:
+                problems.append(("error", where, f"<backup> rewinds {-cursor} divisions before the start of the measure"))
+                cursor = 0
+        high = max(high, cursor)
+    if measure_len is None:
+        return
+    if high > measure_len:
+        problems.append(("error", where, f"content runs to {high} divisions, measure holds {measure_len}"))
+    elif high < measure_len and mi > 0:
+        problems.append(("warning", where, f"content ends at {high} of {measure_len} divisions"))
+    for v, total in sorted(per_voice.items()):
+        if total > measure_len:
+            problems.append(("error", where, f"voice {v} sums to {total} divisions, measure holds {measure_len}"))
+
+def check_pitch(where, note, problems):
+    p = note.find("pitch")
+    if p is None:
+        return
+    step = (p.findtext("step") or "").strip()
+    alter_t = p.findtext("alter")
+    octave = _int(p.findtext("octave"))
+    if step not in SEMITONES or octave is None:
+        problems.append(("error", where, f"malformed pitch step={step!r} octave={p.findtext('octave')!r}")); return
+    alter = 0
+    if alter_t is not None and alter_t.strip():
+        try:
+            af = float(alter_t)
+        except ValueError:
+            problems.append(("error", where, f"non-numeric <alter> {alter_t!r}")); return
+        if af != int(af) or not -2 <= af <= 2:
+            problems.append(("error", where, f"<alter> {alter_t} outside -2..2 semitone steps")); return
+        alter = int(af)
+    midi = pitch_to_midi(step, alter, octave)
+    if not 21 <= midi <= 108:
+        problems.append(("warning", where, f"{step}{octave} (alter {alter}) is outside the piano range"))
+    acc = note.find("accidental")
+    if acc is not None and (acc.text or "").strip() in ALTER_TO_ACCIDENTAL.values():
+        if (acc.text or "").strip() != ALTER_TO_ACCIDENTAL[alter]:
+            problems.append(("warning", where, f"<accidental>{acc.text}</accidental> disagrees with <alter>{alter}</alter>"))
+
+def check_visibility(section, part_id, mi, meas, problems):
+    """Arbeitsblatt modes must leave nothing visible that gives the answer away (hide or delete)."""
+    where = f"part {part_id} measure {mi + 1}"
+    for note in meas.findall("note"):
+        if not _visible(note):
+            continue
+        if section == "scales":
+            for acc in note.findall("accidental"):
+                if _visible(acc):
+                    problems.append(("error", where, f"visible <accidental>{acc.text}</accidental> on scales Arbeitsblatt"))
+            alt = _int(note.findtext("pitch/alter"), 0)
+            if alt and note.find("accidental") is None:
+                problems.append(("error", where, "altered note without an invisible <accidental> on scales Arbeitsblatt"))
+        elif section == "intervals" and (note.findtext("type") or "").strip() == "quarter":
+            problems.append(("error", where, "visible quarter (answer) note on intervals Arbeitsblatt"))
+        elif section == "chords":
+            staff = (note.findtext("staff") or "").strip()
+            if staff == "1" or (not staff and note.find("chord") is not None):
+                problems.append(("error", where, "visible upper-staff chord tone on chords Arbeitsblatt"))
+        elif section == "rhythm" and note.find("pitch") is not None:
+            problems.append(("error", where, "visible pitched note on rhythm Arbeitsblatt"))
+    if section == "rhythm" and meas.find("backup") is not None:
+        problems.append(("error", where, "<backup> left in rhythm Arbeitsblatt"))
+    if section == "melody":
+        shown = [n for n in meas.findall("note") if _visible(n) and n.find("pitch") is not None
+                 and n.find("tie[@type='stop']") is None]
+        if len(shown) > 3:
+            problems.append(("error", where, f"{len(shown)} visible notes on melody Arbeitsblatt (only first/last/apex anchors may show)"))
+
+def validate_file(path):
+    """Returns (path, [(level, where, message)])."""
+    problems = []
+    try:
+        root = ET.parse(path).getroot()
+    except Exception as e:
+        return str(path), [("error", "file", f"cannot parse: {e}")]
+    section, arbeitsblatt = section_of(path)
+    for part in root.findall("part"):
+        part_id = part.get("id") or "?"
+        divisions = None; beats = beat_type = None
+        for mi, meas in enumerate(part.findall("measure")):
+            at = meas.find("attributes")
+            if at is not None:
+                divisions = _int(at.findtext("divisions"), divisions)
+                if at.find("time") is not None:
+                    beats = _int(at.findtext("time/beats"), beats)
+                    beat_type = _int(at.findtext("time/beat-type"), beat_type)
+            measure_len = None
+            if divisions and beats and beat_type:
+                ml = Fraction(4 * beats * divisions, beat_type)
+                measure_len = int(ml) if ml.denominator == 1 else None
+            check_timing(part_id, mi, meas, measure_len, problems)
+            for note in meas.findall("note"):
+                check_pitch(f"part {part_id} measure {mi + 1}", note, problems)
+            if arbeitsblatt and section:
+                check_visibility(section, part_id, mi, meas, problems)
+    return str(path), problems
+
+def iter_files(paths):
+    for p in paths:
+        p = Path(p)
+        if p.is_file():
+            yield p
+            continue
+        for dirpath, dirnames, files in os.walk(p):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))  # skip OUT/.store, OUT/.runs
+            for fn in sorted(files):
+                if fn.lower().endswith((".musicxml", ".music.xml")):
+                    yield Path(dirpath) / fn
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate generated MusicXML (timing, backup/forward, Arbeitsblatt visibility, pitches).")
+    ap.add_argument("paths", nargs="+", help="Files or output folders")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--json", default=None, help="Also write the full report as JSON")
+    ap.add_argument("--strict", action="store_true", help="Treat warnings as failures")
+    args = ap.parse_args()
+
+    files = list(iter_files(args.paths))
+    report = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, problems in pool.map(validate_file, files, chunksize=16):
+            report[path] = problems
+
+    n_err = n_warn = 0
+    for path, problems in report.items():
+        for level, where, msg in problems:
+            print(f"{path}: {where}: {level}: {msg}")
+            n_err += level == "error"; n_warn += level == "warning"
+    bad = sum(1 for ps in report.values() if any(l == "error" or (args.strict and l == "warning") for l, _, _ in ps))
+    print(f"Checked {len(report)} file(s): {n_err} error(s), {n_warn} warning(s), {bad} failing file(s).")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({p: [dict(level=l, where=w, message=m) for l, w, m in ps] for p, ps in report.items()}, f, indent=1)
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()